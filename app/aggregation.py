@@ -0,0 +1,166 @@
+import numpy as np
+import pandas as pd
+
+from app.expression_matrix import ExpressionMatrix, group_rows
+from app.replicate_matrix import ReplicateMatrix
+
+
+def sample_group(sample: str) -> str:
+    return sample.rsplit("_", 1)[0]
+
+
+class RunningStatistics:
+    def __init__(self, n_rows: int = 0, count: int = 0):
+        self.count = np.full(n_rows, count, dtype=np.int32)
+        self.total = np.zeros(n_rows)
+        self.m2 = np.zeros(n_rows)
+
+    def __len__(self) -> int:
+        return len(self.count)
+
+    def grow(self, n_rows: int, count: int = 0):
+        extra = n_rows - len(self)
+        if extra <= 0:
+            return
+        self.count = np.concatenate([self.count, np.full(extra, count, np.int32)])
+        self.total = np.concatenate([self.total, np.zeros(extra)])
+        self.m2 = np.concatenate([self.m2, np.zeros(extra)])
+
+    def add(self, values: np.ndarray):
+        observed = ~np.isnan(values)
+        if observed.all():
+            self._update(slice(None), values)
+        else:
+            rows = np.flatnonzero(observed)
+            self._update(rows, values[rows])
+
+    def _update(self, rows, values: np.ndarray):
+        count = self.count[rows]
+        with np.errstate(invalid="ignore", divide="ignore"):
+            previous_mean = np.where(count > 0, self.total[rows] / count, 0)
+        count = count + 1
+        total = self.total[rows] + values
+        self.count[rows] = count
+        self.total[rows] = total
+        self.m2[rows] += (values - previous_mean) * (values - total / count)
+
+    def statistics(self) -> tuple:
+        with np.errstate(invalid="ignore", divide="ignore"):
+            mean = self.total / self.count
+            std = np.sqrt(self.m2 / (self.count - 1))
+        return mean, np.where(self.count > 1, std, np.nan)
+
+
+class _GroupStatistics:
+    def __init__(self, n_rows: int, n_genes: int):
+        self.samples = 0
+        self.isoforms = RunningStatistics(n_rows)
+        self.genes = RunningStatistics(n_genes)
+
+    def resize(self, n_rows: int, n_genes: int):
+        self.isoforms.grow(n_rows)
+        self.genes.grow(n_genes, self.samples)
+
+
+class StreamingAggregator:
+    def __init__(self, dtype=np.float64, keep_replicates: bool = False):
+        self._dtype = dtype
+        self._keep_replicates = keep_replicates
+        self._samples = []
+        self._sample_isoforms = []
+        self._sample_genes = []
+        self._rows = {}
+        self._row_genes = []
+        self._genes = {}
+        self._groups = {}
+
+        self._index = None
+        self._keep = None
+        self._positions = None
+        self._gene_codes = None
+        self._dense = False
+
+    def add_sample(self, name: str, tpm: pd.Series):
+        if self._index is None or not tpm.index.equals(self._index):
+            self._align(tpm.index)
+
+        values = tpm.to_numpy(dtype=np.float64)[self._keep]
+        if self._dense:
+            isoforms = values
+        else:
+            isoforms = np.full(len(self._rows), np.nan)
+            isoforms[self._positions] = values
+        observed = ~np.isnan(isoforms)
+        genes = np.bincount(self._gene_codes[observed], weights=isoforms[observed],
+                            minlength=len(self._genes))
+
+        group = self._groups.get(sample_group(name))
+        if group is None:
+            group = self._groups[sample_group(name)] = _GroupStatistics(
+                len(self._rows), len(self._genes))
+        group.resize(len(self._rows), len(self._genes))
+        group.isoforms.add(isoforms)
+        group.genes.add(genes)
+        group.samples += 1
+
+        if self._keep_replicates:
+            self._samples.append(name)
+            self._sample_isoforms.append(isoforms.astype(np.float32))
+            self._sample_genes.append(genes.astype(np.float32))
+
+    def _align(self, index: pd.Index):
+        keep = np.asarray(~index.str.contains("-") & index.str.startswith("A"))
+        positions = np.empty(keep.sum(), dtype=np.intp)
+        for i, label in enumerate(index[keep]):
+            position = self._rows.get(label)
+            if position is None:
+                position = self._rows[label] = len(self._rows)
+                gene = label.split(".", 1)[0]
+                self._row_genes.append(self._genes.setdefault(gene, len(self._genes)))
+            positions[i] = position
+
+        self._index = index
+        self._keep = keep
+        self._positions = positions
+        self._gene_codes = np.array(self._row_genes, dtype=np.intp)
+        self._dense = (len(positions) == len(self._rows)
+                       and bool((positions == np.arange(len(positions))).all()))
+
+    def result(self) -> ExpressionMatrix:
+        order = self._gene_order()
+        groups = sorted(self._groups)
+        rows = self._result_rows(order)
+
+        n_isoforms = len(self._rows)
+        values = np.empty((2, len(rows), len(groups)), dtype=self._dtype)
+        for j, name in enumerate(groups):
+            group = self._groups[name]
+            group.resize(n_isoforms, len(self._genes))
+            mean, std = group.isoforms.statistics()
+            values[0, :n_isoforms, j] = mean
+            values[1, :n_isoforms, j] = std
+            mean, std = group.genes.statistics()
+            values[0, n_isoforms:, j] = mean[order]
+            values[1, n_isoforms:, j] = std[order]
+        counts = np.array([self._groups[name].samples for name in groups],
+                          dtype=np.int64)
+        codes = np.concatenate([np.array(self._row_genes, dtype=np.intp), order])
+        return ExpressionMatrix(rows, pd.Index(groups, dtype=object), values, counts,
+                                group_rows(rows, codes, list(self._genes)))
+
+    def replicates(self) -> ReplicateMatrix:
+        order = self._gene_order()
+        matrix = ReplicateMatrix.from_columns(
+            self._result_rows(order), self._samples, self._sample_isoforms,
+            self._sample_genes, len(self._rows), order)
+        self._sample_isoforms, self._sample_genes = [], []
+        return matrix
+
+    def _gene_order(self) -> np.ndarray:
+        genes = list(self._genes)
+        return np.array(sorted(range(len(genes)), key=genes.__getitem__),
+                        dtype=np.intp)
+
+    def _result_rows(self, order: np.ndarray) -> pd.Index:
+        genes = list(self._genes)
+        return pd.Index(list(self._rows) + [genes[i] for i in order], dtype=object)
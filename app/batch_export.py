@@ -0,0 +1,127 @@
+import re
+import zipfile
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterable, Iterator
+
+from flask import Response, request, stream_with_context
+
+from app.data_loader import ExpressionDataManager
+from app.export import EXPORT_FORMATS, render_gene_image
+from app.figures import build_expression_figure
+from app.renderer import renderer_pool
+
+ZIP_COMPRESSION = {
+    "svg": zipfile.ZIP_DEFLATED,
+    "png": zipfile.ZIP_STORED,
+    "pdf": zipfile.ZIP_DEFLATED,
+}
+MAX_BATCH_GENES = 5000
+
+
+def parse_gene_list(text: str) -> list:
+    genes = []
+    seen = set()
+    for line in (text or "").splitlines():
+        line = line.split("#", 1)[0]
+        for token in re.split(r"[\s,;]+", line.strip()):
+            if token and token not in seen:
+                seen.add(token)
+                genes.append(token)
+    return genes
+
+
+def render_gene_images(data_manager, genes: Iterable[str], formats: list,
+                       workers: int = 2) -> Iterator[tuple]:
+    def render(gene):
+        if not data_manager.get_isoforms_for_gene(gene):
+            return gene, None
+        fig = build_expression_figure(data_manager, gene)
+        return gene, {
+            fmt: render_gene_image(data_manager, gene, fmt, fig=fig, cache=False,
+                                   wait=renderer_pool.timeout)
+            for fmt in formats
+        }
+
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        pending = deque()
+        for gene in genes:
+            pending.append(executor.submit(render, gene))
+            if len(pending) >= 2 * workers:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+class _ZipStream:
+    def __init__(self):
+        self._chunks = []
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def stream_zip(data_manager, genes: list, formats: list,
+               workers: int = 2) -> Iterator[bytes]:
+    unknown = [fmt for fmt in formats if fmt not in EXPORT_FORMATS]
+    if unknown or not formats:
+        raise ValueError(f"Formats must be a non-empty subset of "
+                         f"{sorted(EXPORT_FORMATS)}, got {formats}")
+
+    data_manager.load_expression_matrix()
+    buffer = _ZipStream()
+    missing = []
+    with zipfile.ZipFile(buffer, "w") as archive:
+        for gene, images in render_gene_images(data_manager, genes, formats,
+                                               workers):
+            if images is None:
+                missing.append(gene)
+                continue
+            for fmt, image in images.items():
+                archive.writestr(f"{fmt}/expression_plot_{gene}.{fmt}", image,
+                                 compress_type=ZIP_COMPRESSION[fmt])
+            yield buffer.drain()
+        if missing:
+            archive.writestr("missing_genes.txt", "\n".join(missing) + "\n")
+    yield buffer.drain()
+
+
+def register_batch_export(server, prefix: str = "/"):
+    @server.route(f"{prefix}export/batch", methods=["POST"])
+    def batch_export():
+        text = request.form.get("genes", "")
+        upload = request.files.get("gene_file")
+        if upload is not None:
+            text += "\n" + upload.read().decode("utf-8", errors="replace")
+        genes = parse_gene_list(text)
+        formats = request.form.getlist("formats") + [
+            fmt for fmt in EXPORT_FORMATS if request.form.get(f"format_{fmt}")
+        ]
+
+        if not genes:
+            return Response("No genes given.", status=400)
+        if len(genes) > MAX_BATCH_GENES:
+            return Response(f"At most {MAX_BATCH_GENES} genes can be exported at "
+                            f"once.", status=400)
+        if not formats or any(fmt not in EXPORT_FORMATS for fmt in formats):
+            return Response("Select at least one of svg, png or pdf.", status=400)
+
+        chunks = stream_zip(ExpressionDataManager(), genes, formats,
+                            workers=renderer_pool.size)
+        return Response(
+            stream_with_context(chunks),
+            mimetype="application/zip",
+            headers={"Content-Disposition":
+                     "attachment; filename=expression_plots.zip"},
+        )
+
+    return batch_export
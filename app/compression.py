@@ -0,0 +1,75 @@
+import gzip
+import hashlib
+from typing import Optional
+
+from flask import request
+
+from app.lru_cache import LRUCache
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESSIBLE_TYPES = ("text/", "application/json", "application/javascript",
+                      "image/svg+xml")
+MIN_SIZE = 1024
+DEFAULT_LEVEL = 6
+
+static_cache = LRUCache(max_entries=64, max_bytes=32 * 2**20)
+
+
+def available_encodings() -> tuple:
+    return ("br", "gzip") if brotli is not None else ("gzip",)
+
+
+def choose_encoding(accept_encodings) -> Optional[str]:
+    for encoding in available_encodings():
+        if accept_encodings[encoding]:
+            return encoding
+    return None
+
+
+def compress(data: bytes, encoding: str, level: int = DEFAULT_LEVEL) -> bytes:
+    if encoding == "br":
+        return brotli.compress(data, quality=level)
+    if encoding == "gzip":
+        return gzip.compress(data, compresslevel=level, mtime=0)
+    raise ValueError(f"Unsupported encoding: {encoding}")
+
+
+def _compressible(response, min_size: int) -> bool:
+    return (response.status_code == 200
+            and not response.direct_passthrough
+            and not response.is_streamed
+            and "Content-Encoding" not in response.headers
+            and (response.mimetype or "").startswith(COMPRESSIBLE_TYPES)
+            and (response.content_length or 0) >= min_size)
+
+
+def register_compression(server, level: int = DEFAULT_LEVEL,
+                         min_size: int = MIN_SIZE):
+    @server.after_request
+    def compress_response(response):
+        if not _compressible(response, min_size):
+            return response
+        response.vary.add("Accept-Encoding")
+        encoding = choose_encoding(request.accept_encodings)
+        if encoding is None:
+            return response
+
+        data = response.get_data()
+        if response.cache_control.max_age:
+            key = (request.full_path, encoding,
+                   hashlib.blake2b(data, digest_size=16).digest())
+            compressed = static_cache.get(key)
+            if compressed is None:
+                compressed = compress(data, encoding, level)
+                static_cache.put(key, compressed)
+        else:
+            compressed = compress(data, encoding, level)
+        response.set_data(compressed)
+        response.headers["Content-Encoding"] = encoding
+        return response
+
+    return compress_response
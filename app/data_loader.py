@@ -1,95 +1,417 @@
+import threading
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
-from typing import Optional
+from typing import Optional, Union
 
+import numpy as np
 import pandas as pd
 
+from app.aggregation import StreamingAggregator, sample_group
+from app.differential import differential_expression
+from app.expression_matrix import ExpressionMatrix
+from app.gene_search import GeneSearchIndex
+from app.gene_store import GeneStore, load_gene_store, store_gene_chunks
+from app.metrics import StageTimer, timed_stage
+from app.quant_cache import (
+    load_cached_counts,
+    load_cached_expression,
+    load_cached_replicates,
+    load_cached_sample_qc,
+    quant_fingerprint,
+    quant_sample_state,
+    store_cached_expression,
+    store_cached_sample_qc,
+)
+from app.replicate_matrix import ReplicateMatrix
+from app.sample_qc import SampleQC
+from app.shared_store import (
+    load_shared_matrix,
+    shared_store_lock,
+    store_shared_matrix,
+)
+
+
+def _read_quant_file(directory: Path) -> pd.Series:
+    quant_df = pd.read_csv(directory / "quant.sf", sep="\t", engine="c",
+                           usecols=["Name", "TPM"], index_col="Name")
+    return quant_df["TPM"].rename(directory.name)
+
+
+def _share_index(series_list) -> list:
+    shared = []
+    for series in series_list:
+        if shared and series.index.equals(shared[0].index):
+            series.index = shared[0].index
+        shared.append(series)
+    return shared
+
 
 class ExpressionDataManager:
     _instance: Optional['ExpressionDataManager'] = None
-    _expression_data: Optional[pd.DataFrame] = None
+    _lock = threading.RLock()
+    _matrix: Optional[Union[ExpressionMatrix, GeneStore]] = None
     _annotation_data: Optional[pd.DataFrame] = None
+    _search_index: Optional[GeneSearchIndex] = None
+    _fingerprint: Optional[str] = None
 
     _annotation_path: Optional[str] = None
     _quant_path: Optional[str] = None
+    _load_workers: int = 1
+    _cache_dir: Optional[str] = None
+    _compact: bool = False
+    _shared_store: Optional[str] = None
+    _gene_store: Optional[str] = None
+    _watch: bool = False
+    _replicates: Optional[pd.DataFrame] = None
+    _sample_state: Optional[dict] = None
+    _differential: Optional[dict] = None
+    _sample_qc: Optional[SampleQC] = None
+    _keep_replicates: bool = False
+    _replicate_matrix: Optional[ReplicateMatrix] = None
 
     def __new__(cls, *args, **kwargs):
         if cls._instance is None:
-            cls._instance = super().__new__(cls)
+            with cls._lock:
+                if cls._instance is None:
+                    cls._instance = super().__new__(cls)
         return cls._instance
 
     def __init__(self,
                  annotation_path: Optional[str] = None,
-                 quant_path: Optional[str] = None):
+                 quant_path: Optional[str] = None,
+                 load_workers: Optional[int] = None,
+                 cache_dir: Optional[str] = None,
+                 compact: Optional[bool] = None,
+                 shared_store: Optional[str] = None,
+                 watch: Optional[bool] = None,
+                 gene_store: Optional[str] = None,
+                 replicates: Optional[bool] = None):
         if self._annotation_path is None and annotation_path is not None:
             self._annotation_path = annotation_path
         if self._quant_path is None and quant_path is not None:
             self._quant_path = quant_path
+        if load_workers is not None:
+            self._load_workers = load_workers
+        if self._cache_dir is None and cache_dir is not None:
+            self._cache_dir = cache_dir
+        if compact is not None:
+            self._compact = compact
+        if self._shared_store is None and shared_store is not None:
+            self._shared_store = shared_store
+        if watch is not None:
+            self._watch = watch
+        if self._gene_store is None and gene_store is not None:
+            self._gene_store = gene_store
+        if replicates is not None:
+            self._keep_replicates = replicates
 
     def load_annotation_data(self) -> pd.DataFrame:
         if self._annotation_path is None:
             raise ValueError("Path to annotation data is not set.")
 
         if self._annotation_data is None:
-            df = pd.read_csv(self._annotation_path, delimiter=';')
-            required_cols = {"AGI", "Name"}
-            if not required_cols.issubset(df.columns):
-                raise ValueError(f"CSV must contain columns: {required_cols}")
-            self._annotation_data = df
+            with self._lock:
+                if self._annotation_data is None:
+                    df = pd.read_csv(self._annotation_path, delimiter=';')
+                    required_cols = {"AGI", "Name"}
+                    if not required_cols.issubset(df.columns):
+                        raise ValueError(f"CSV must contain columns: {required_cols}")
+                    self._annotation_data = df
 
         return self._annotation_data
 
+    def search_genes(self, query: str, limit: int = 50) -> list:
+        if self._search_index is None:
+            with self._lock:
+                if self._search_index is None:
+                    self._search_index = GeneSearchIndex(self.load_annotation_data())
+        return self._search_index.search(query, limit)
+
 
     def load_quant_data(self) -> pd.DataFrame:
+        return self.load_expression_matrix().frame
+
+    def load_expression_matrix(self) -> Union[ExpressionMatrix, GeneStore]:
         if self._quant_path is None:
             raise ValueError("Path to quantification data is not set.")
 
-        if self._expression_data is None:
+        if self._matrix is None:
+            with self._lock:
+                if self._matrix is None:
+                    self._load_matrix()
+
+        return self._matrix
+
+    def _load_matrix(self) -> None:
+        with timed_stage("fingerprint"):
+            state = quant_sample_state(self._quant_path) if self._watch else None
+            fingerprint = quant_fingerprint(self._quant_path, self._annotation_path,
+                                            self._variant)
+        replicate_matrix = replicates = None
+        if self._gene_store is not None:
+            matrix = self._attach_store(self._gene_store, fingerprint,
+                                        load_gene_store, store_gene_chunks)
+        elif self._shared_store is not None:
+            matrix = self._attach_store(self._shared_store, fingerprint,
+                                        load_shared_matrix, store_shared_matrix)
+        else:
+            matrix, replicate_matrix, replicates = self._build_matrix(fingerprint)
+        self._matrix = matrix
+        self._replicate_matrix = replicate_matrix
+        self._replicates = replicates
+        self._sample_qc = None
+        self._fingerprint = fingerprint
+        self._sample_state = state
+
+    def _attach_store(self, store_dir: str, fingerprint: str, load, store):
+        matrix = load(store_dir, fingerprint)
+        if matrix is not None:
+            return matrix
+
+        with shared_store_lock(store_dir):
+            matrix = load(store_dir, fingerprint)
+            if matrix is None:
+                store(store_dir, fingerprint, self._build_matrix(fingerprint)[0])
+                matrix = load(store_dir, fingerprint)
+        return matrix
+
+    def _build_matrix(self, fingerprint: str) -> tuple:
+        if self._cache_dir is not None:
+            with timed_stage("cache_load"):
+                frame = load_cached_expression(self._cache_dir, fingerprint)
+                counts = load_cached_counts(self._cache_dir, fingerprint)
+                replicates = (load_cached_replicates(self._cache_dir, fingerprint)
+                              if self._retain_replicates else None)
+            if frame is not None and counts is not None and (
+                    replicates is not None or not self._retain_replicates):
+                replicate_matrix = (ReplicateMatrix.from_frame(replicates)
+                                    if replicates is not None else None)
+                return (ExpressionMatrix.from_frame(frame, self._dtype, counts),
+                        replicate_matrix, None)
+
+        matrix, replicate_matrix, replicates = self._aggregate_quant_data()
+        self._store_cache(fingerprint, matrix, replicate_matrix)
+        return matrix, replicate_matrix, replicates
+
+    def _store_cache(self, fingerprint: str, matrix: ExpressionMatrix,
+                     replicate_matrix: Optional[ReplicateMatrix]):
+        if self._cache_dir is None:
+            return
+        with timed_stage("cache_store"):
+            store_cached_expression(
+                self._cache_dir, fingerprint, matrix.frame,
+                replicate_matrix.frame if replicate_matrix is not None else None,
+                matrix.count_series)
+            self._store_sample_qc(self._cache_dir, fingerprint)
+
+    def _store_sample_qc(self, directory: str, fingerprint: str):
+        if self._sample_qc is not None:
+            store_cached_sample_qc(directory, fingerprint, self._sample_qc.frame)
+
+    def _load_sample_qc(self, fingerprint: str) -> Optional[SampleQC]:
+        for directory in self._qc_directories:
+            frame = load_cached_sample_qc(directory, fingerprint)
+            if frame is not None:
+                return SampleQC.from_frame(frame)
+        return None
+
+
+    def _aggregate_quant_data(self) -> tuple:
+        directories = self._sample_directories()
+        replicate_matrix = None
+        if self._incremental:
+            with timed_stage("read"):
+                replicates = self._read_replicates(directories)
+            with timed_stage("aggregate"):
+                matrix = self._aggregate_replicates(replicates)
+                if self._retain_replicates:
+                    replicate_matrix = ReplicateMatrix.from_replicates(replicates,
+                                                                       matrix.rows)
+            return matrix, replicate_matrix, replicates
+
+        timer = StageTimer()
+        aggregator = StreamingAggregator(self._dtype, self._retain_replicates)
+        samples = self._iter_quant_files(directories)
+        while True:
+            with timer.stage("read"):
+                tpm = next(samples, None)
+            if tpm is None:
+                break
+            with timer.stage("aggregate"):
+                aggregator.add_sample(tpm.name, tpm)
+        with timer.stage("finalize"):
+            matrix = aggregator.result()
+            if self._retain_replicates:
+                replicate_matrix = aggregator.replicates()
+        timer.observe()
+        return matrix, replicate_matrix, None
+
+    def _sample_directories(self) -> list:
+        return sorted(path.parent
+                      for path in Path(self._quant_path).glob("*/quant.sf"))
+
+    def _read_replicates(self, directories: list) -> pd.DataFrame:
+        dfs = self._read_quant_files(directories)
+        df = pd.concat(dfs, axis=1)
+        del dfs
+
+        return df.loc[~df.index.str.contains("-") & df.index.str.startswith("A")]
+
+    def _aggregate_replicates(self, df: pd.DataFrame,
+                              previous: Optional[ExpressionMatrix] = None,
+                              changed_groups: frozenset = frozenset()
+                              ) -> ExpressionMatrix:
+        groups = pd.Index([sample_group(c) for c in df.columns]).unique().sort_values()
+        if previous is None:
+            update = groups
+        else:
+            update = groups[groups.isin(list(changed_groups))
+                            | ~groups.isin(previous.groups)]
+            if update.empty:
+                columns = previous.groups.get_indexer(groups)
+                return ExpressionMatrix(previous.rows, groups,
+                                        previous.values[:, :, columns],
+                                        previous.counts[columns],
+                                        previous.isoform_index)
+
+        aggregator = StreamingAggregator(self._dtype)
+        for sample in df.columns[df.columns.map(sample_group).isin(update)]:
+            aggregator.add_sample(sample, df[sample])
+        matrix = aggregator.result()
+        if previous is None:
+            return matrix
+
+        values = np.empty((2, len(matrix.rows), len(groups)), dtype=self._dtype)
+        counts = np.empty(len(groups), dtype=np.int64)
+        kept = groups.difference(update)
+        values[:, :, groups.get_indexer(kept)] = \
+            previous.values[:, :, previous.groups.get_indexer(kept)]
+        counts[groups.get_indexer(kept)] = \
+            previous.counts[previous.groups.get_indexer(kept)]
+        values[:, :, groups.get_indexer(matrix.groups)] = matrix.values
+        counts[groups.get_indexer(matrix.groups)] = matrix.counts
+        return ExpressionMatrix(matrix.rows, groups, values, counts,
+                                matrix.isoform_index)
 
-            dfs = []
-            path = Path(self._quant_path)
-            for directory in path.iterdir():
-                quant_file = directory / "quant.sf"
-                quant_df = pd.read_csv(quant_file, sep="\t")
+    def reload_changed_samples(self) -> dict:
+        with self._lock:
+            if self._matrix is None:
+                return {}
 
-                quant_df = quant_df[["Name", "TPM"]].set_index("Name")
+            state = quant_sample_state(self._quant_path)
+            previous_state = self._sample_state or {}
+            changes = {
+                "added": sorted(state.keys() - previous_state.keys()),
+                "removed": sorted(previous_state.keys() - state.keys()),
+                "modified": sorted(name for name in state.keys() & previous_state.keys()
+                                   if state[name] != previous_state[name]),
+            }
+            if not any(changes.values()):
+                return {}
 
-                quant_df.rename(columns={"TPM": directory.name}, inplace=True)
-                dfs.append(quant_df)
+            matrix = None
+            if self._incremental and self._replicates is not None:
+                matrix = self._update_replicates(changes)
+            if matrix is None:
+                self._load_matrix()
+                return changes
 
-            df = pd.concat(dfs, axis=1)
+            fingerprint = quant_fingerprint(self._quant_path, self._annotation_path,
+                                            self._variant)
+            replicate_matrix = None
+            if self._retain_replicates:
+                replicate_matrix = ReplicateMatrix.from_replicates(self._replicates,
+                                                                   matrix.rows)
+            self._update_sample_qc(changes)
+            self._store_cache(fingerprint, matrix, replicate_matrix)
+            self._matrix = matrix
+            self._replicate_matrix = replicate_matrix
+            self._fingerprint = fingerprint
+            self._sample_state = state
+            return changes
 
-            df = df.loc[~df.index.str.contains("-") & df.index.str.startswith("A")]
+    def _update_replicates(self, changes: dict) -> Optional[ExpressionMatrix]:
+        replicates = self._replicates.drop(
+            columns=changes["removed"] + changes["modified"])
+        reread = changes["added"] + changes["modified"]
+        if reread:
+            new = self._read_replicates([Path(self._quant_path) / name
+                                         for name in reread])
+            if not new.index.isin(replicates.index).all():
+                return None
+            replicates = pd.concat([replicates, new.reindex(replicates.index)], axis=1)
+        replicates = replicates[sorted(replicates.columns)]
+        if replicates.columns.empty or replicates.isna().all(axis=1).any():
+            return None
 
-            gene_index = df.index.to_series().str.split(r"[.]", n=1).str[0]
+        changed_groups = frozenset(sample_group(name)
+                                   for names in changes.values() for name in names)
+        matrix = self._aggregate_replicates(replicates, self._matrix, changed_groups)
+        self._replicates = replicates
+        return matrix
 
-            gene_df = df.groupby(gene_index).sum()
-            expanded_df = pd.concat([df, gene_df])
+    def get_sample_qc(self) -> SampleQC:
+        if self._quant_path is None:
+            raise ValueError("Path to quantification data is not set.")
 
-            sample_groups = [c.rsplit("_", 1)[0] for c in expanded_df.columns]
+        if self._sample_qc is None:
+            with self._lock:
+                if self._sample_qc is None:
+                    self.load_expression_matrix()
+                    sample_qc = self._load_sample_qc(self._fingerprint)
+                    if sample_qc is None:
+                        sample_qc = SampleQC()
+                        self._add_qc_samples(sample_qc, self._sample_directories())
+                    self._sample_qc = sample_qc
+                    if self._qc_directories:
+                        self._store_sample_qc(self._qc_directories[0],
+                                              self._fingerprint)
+        return self._sample_qc
 
-            grouper = pd.Series(sample_groups, index=expanded_df.columns)
+    def _update_sample_qc(self, changes: dict):
+        if self._sample_qc is None:
+            return
+        self._sample_qc.remove_samples(changes["removed"])
+        self._add_qc_samples(self._sample_qc,
+                             [Path(self._quant_path) / name
+                              for name in changes["added"] + changes["modified"]])
 
-            expanded_df = (expanded_df.T
-                                     .groupby(grouper)
-                                     .agg(['mean', 'std'])
-                                     .T)
-            self._expression_data = expanded_df
+    def _add_qc_samples(self, sample_qc: SampleQC, directories: list):
+        if self._replicates is not None:
+            for directory in directories:
+                sample_qc.add_sample(directory.name, self._replicates[directory.name])
+            return
+        if self._replicate_matrix is not None:
+            for directory in directories:
+                sample_qc.add_sample(directory.name,
+                                     self._replicate_matrix.isoform_tpm(directory.name))
+            return
+        for tpm in self._iter_quant_files(directories):
+            sample_qc.add_sample(tpm.name, tpm)
 
-        return self._expression_data
+    def _read_quant_files(self, directories: list) -> list:
+        return _share_index(self._iter_quant_files(directories))
 
+    def _iter_quant_files(self, directories: list):
+        if self._load_workers <= 1 or len(directories) <= 1:
+            yield from map(_read_quant_file, directories)
+            return
+
+        chunksize = max(1, len(directories) // (self._load_workers * 4))
+        with ProcessPoolExecutor(max_workers=self._load_workers) as executor:
+            yield from executor.map(_read_quant_file, directories, chunksize=chunksize)
 
     def get_isoforms_for_gene(self, gene_name: str) -> list:
-        if self._expression_data is None:
+        if self._matrix is None:
             return []
 
-        matching_isoforms = []
-        for index in self._expression_data.index:
-            if index[1] == 'mean' and index[0].startswith(f"{gene_name}"):
-                matching_isoforms.append(index[0])
-        return matching_isoforms
+        return list(self._matrix.isoform_index.get(gene_name, []))
+
+    def get_expression_block(self, isoforms: list) -> tuple:
+        return self._matrix.block(isoforms)
 
     def get_sample_groups(self) -> list:
-        return self._expression_data.columns
+        return self._matrix.groups
 
     def get_groups_by_genotype(self) -> dict:
         groups_by_type = {}
@@ -100,10 +422,89 @@ class ExpressionDataManager:
             groups_by_type[genotype].append(col)
         return groups_by_type
 
+    def get_replicate_counts(self) -> dict:
+        matrix = self.load_expression_matrix()
+        if matrix.counts is None:
+            raise ValueError("Replicate counts are missing from the expression data.")
+        return dict(zip(matrix.groups, matrix.counts.tolist()))
+
+    def get_differential_expression(self, group: str,
+                                    reference: str) -> pd.DataFrame:
+        matrix = self.load_expression_matrix()
+        key = (self._fingerprint, group, reference)
+        if self._differential is None or key not in self._differential:
+            with self._lock:
+                if self._differential is None or key not in self._differential:
+                    self._differential = {
+                        cached_key: result
+                        for cached_key, result in (self._differential or {}).items()
+                        if cached_key[0] == self._fingerprint
+                    }
+                    self._differential[key] = self._compute_differential(
+                        matrix, group, reference)
+        return self._differential[key]
+
+    def _compute_differential(self, matrix, group: str,
+                              reference: str) -> pd.DataFrame:
+        columns = matrix.groups.get_indexer([group, reference])
+        if (columns < 0).any():
+            raise KeyError(f"Unknown sample groups: {group}, {reference}")
+        genes = sorted(matrix.isoform_index)
+        means, stds = matrix.block(genes)
+        counts = self.get_replicate_counts()
+        names = None
+        if self._annotation_data is not None:
+            names = dict(zip(self._annotation_data["AGI"],
+                             self._annotation_data["Name"]))
+        return differential_expression(
+            genes, means[:, columns], stds[:, columns],
+            np.array([counts[group], counts[reference]]), names)
+
+
+    @property
+    def _qc_directories(self) -> list:
+        return [directory for directory in
+                (self._cache_dir, self._gene_store, self._shared_store)
+                if directory is not None]
+
+    @property
+    def _incremental(self) -> bool:
+        return (self._watch and self._shared_store is None
+                and self._gene_store is None)
+
+    @property
+    def _retain_replicates(self) -> bool:
+        return (self._keep_replicates and self._shared_store is None
+                and self._gene_store is None)
+
+    @property
+    def _variant(self) -> str:
+        variant = np.dtype(self._dtype).name
+        return f"{variant}+replicates" if self._retain_replicates else variant
+
+    @property
+    def _dtype(self):
+        return np.float32 if self._compact else np.float64
+
+    @property
+    def quant_path(self) -> Optional[str]:
+        return self._quant_path
 
     @property
     def expression_data(self) -> Optional[pd.DataFrame]:
-        return self._expression_data
+        return self._matrix.frame if self._matrix is not None else None
+
+    @property
+    def expression_matrix(self) -> Optional[ExpressionMatrix]:
+        return self._matrix
+
+    @property
+    def replicate_matrix(self) -> Optional[ReplicateMatrix]:
+        return self._replicate_matrix
+
+    @property
+    def fingerprint(self) -> Optional[str]:
+        return self._fingerprint
 
     @property
     def annotation_data(self) -> Optional[pd.DataFrame]:
@@ -0,0 +1,154 @@
+from math import lgamma
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+REFERENCE_GENOTYPES = ("wt", "col0", "col-0", "col")
+PSEUDOCOUNT = 1.0
+MAX_ITERATIONS = 300
+EPSILON = 1e-15
+TINY = 1e-300
+DE_COLUMNS = ("gene", "name", "mean", "reference_mean", "log2_fold_change",
+              "t", "df", "p_value", "q_value")
+
+
+_lgamma = np.vectorize(lgamma, otypes=[float])
+
+
+def _log_beta(a, b):
+    return _lgamma(a) + _lgamma(b) - _lgamma(a + b)
+
+
+def _beta_fraction(a, b, x):
+    qab, qap, qam = a + b, a + 1, a - 1
+    c = np.ones_like(x)
+    d = 1 - qab * x / qap
+    d = np.where(np.abs(d) < TINY, TINY, d)
+    d = 1 / d
+    h = d.copy()
+    done = np.zeros(x.shape, dtype=bool)
+    for m in range(1, MAX_ITERATIONS + 1):
+        m2 = 2 * m
+        aa = m * (b - m) * x / ((qam + m2) * (a + m2))
+        d = 1 + aa * d
+        d = np.where(np.abs(d) < TINY, TINY, d)
+        c = 1 + aa / c
+        c = np.where(np.abs(c) < TINY, TINY, c)
+        d = 1 / d
+        h = np.where(done, h, h * d * c)
+
+        aa = -(a + m) * (qab + m) * x / ((a + m2) * (qap + m2))
+        d = 1 + aa * d
+        d = np.where(np.abs(d) < TINY, TINY, d)
+        c = 1 + aa / c
+        c = np.where(np.abs(c) < TINY, TINY, c)
+        d = 1 / d
+        delta = d * c
+        h = np.where(done, h, h * delta)
+        done |= np.abs(delta - 1) < EPSILON
+        if done.all():
+            break
+    return h
+
+
+def regularized_beta(a, b, x) -> np.ndarray:
+    a, b, x = np.broadcast_arrays(*(np.asarray(v, dtype=np.float64) for v in (a, b, x)))
+    result = np.full(x.shape, np.nan)
+    valid = (a > 0) & (b > 0) & (x >= 0) & (x <= 1)
+    result[valid & (x == 0)] = 0.0
+    result[valid & (x == 1)] = 1.0
+
+    inner = valid & (x > 0) & (x < 1)
+    if not inner.any():
+        return result
+    a, b, x = a[inner], b[inner], x[inner]
+    front = np.exp(a * np.log(x) + b * np.log1p(-x) - _log_beta(a, b))
+    direct = x < (a + 1) / (a + b + 2)
+    values = np.empty(x.shape)
+    values[direct] = (front[direct] / a[direct]
+                      * _beta_fraction(a[direct], b[direct], x[direct]))
+    flip = ~direct
+    values[flip] = 1 - (front[flip] / b[flip]
+                        * _beta_fraction(b[flip], a[flip], 1 - x[flip]))
+    result[inner] = values
+    return result
+
+
+def t_test_p_values(t, df) -> np.ndarray:
+    t, df = np.broadcast_arrays(np.asarray(t, dtype=np.float64),
+                                np.asarray(df, dtype=np.float64))
+    with np.errstate(invalid="ignore", divide="ignore"):
+        x = df / (df + t * t)
+    return regularized_beta(df / 2, 0.5, x)
+
+
+def welch_t_test(mean_a, std_a, n_a, mean_b, std_b, n_b) -> tuple:
+    with np.errstate(invalid="ignore", divide="ignore"):
+        var_a = np.square(std_a) / n_a
+        var_b = np.square(std_b) / n_b
+        se2 = var_a + var_b
+        t = (mean_a - mean_b) / np.sqrt(se2)
+        df = se2 ** 2 / (var_a ** 2 / (n_a - 1) + var_b ** 2 / (n_b - 1))
+    t = np.where(se2 > 0, t, np.nan)
+    df = np.where(se2 > 0, df, np.nan)
+    return t, df, t_test_p_values(t, df)
+
+
+def benjamini_hochberg(p_values) -> np.ndarray:
+    p_values = np.asarray(p_values, dtype=np.float64)
+    q_values = np.full(p_values.shape, np.nan)
+    observed = np.flatnonzero(~np.isnan(p_values))
+    if not len(observed):
+        return q_values
+    order = observed[np.argsort(p_values[observed], kind="stable")]
+    ranked = p_values[order] * len(order) / np.arange(1, len(order) + 1)
+    q_values[order] = np.minimum(1, np.minimum.accumulate(ranked[::-1])[::-1])
+    return q_values
+
+
+def reference_genotype(genotypes) -> Optional[str]:
+    genotypes = list(genotypes)
+    for genotype in genotypes:
+        if genotype.lower() in REFERENCE_GENOTYPES:
+            return genotype
+    return sorted(genotypes)[0] if genotypes else None
+
+
+def genotype_comparisons(groups_by_genotype: dict) -> list:
+    reference = reference_genotype(groups_by_genotype)
+    if reference is None:
+        return []
+
+    def line(group):
+        return group.split("_", 1)[1] if "_" in group else ""
+
+    reference_groups = {line(group): group for group in groups_by_genotype[reference]}
+    comparisons = []
+    for genotype, groups in groups_by_genotype.items():
+        if genotype == reference:
+            continue
+        for group in groups:
+            if line(group) in reference_groups:
+                comparisons.append((group, reference_groups[line(group)]))
+    return comparisons
+
+
+def differential_expression(genes: list, means: np.ndarray, stds: np.ndarray,
+                            counts: np.ndarray,
+                            names: Optional[dict] = None) -> pd.DataFrame:
+    mean_a, mean_b = means[:, 0].astype(np.float64), means[:, 1].astype(np.float64)
+    t, df, p_values = welch_t_test(mean_a, stds[:, 0], counts[0],
+                                   mean_b, stds[:, 1], counts[1])
+    names = names or {}
+    return pd.DataFrame({
+        "gene": genes,
+        "name": [names.get(gene, "") for gene in genes],
+        "mean": mean_a,
+        "reference_mean": mean_b,
+        "log2_fold_change": np.log2((mean_a + PSEUDOCOUNT) / (mean_b + PSEUDOCOUNT)),
+        "t": t,
+        "df": df,
+        "p_value": p_values,
+        "q_value": benjamini_hochberg(p_values),
+    }, columns=list(DE_COLUMNS))
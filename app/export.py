@@ -0,0 +1,96 @@
+from typing import Optional
+
+import orjson
+from flask import Response, abort, request
+
+from app.data_loader import ExpressionDataManager
+from app.figures import (
+    build_expression_figure,
+    expression_cache_key,
+    expression_view,
+    figure_cache,
+)
+from app.lru_cache import LRUCache
+from app.metrics import instrumented, observe_payload
+from app.renderer import RendererQueueFull, renderer_pool
+
+EXPORT_WIDTH = 1000
+EXPORT_HEIGHT = 400
+EXPORT_FORMATS = {
+    "svg": {"mimetype": "image/svg+xml", "scale": 1},
+    "png": {"mimetype": "image/png", "scale": 2},
+    "pdf": {"mimetype": "application/pdf", "scale": 1},
+}
+
+image_cache = LRUCache(max_entries=128, max_bytes=128 * 2**20)
+
+
+def export_figure(data_manager, gene: str, show_replicates: bool = False,
+                  view: Optional[dict] = None):
+    view = expression_view() if view is None else view
+    cached = figure_cache.get(expression_cache_key(gene, data_manager.fingerprint,
+                                                   show_replicates, view))
+    if cached is not None:
+        return orjson.loads(cached)
+    return build_expression_figure(data_manager, gene, show_replicates, **view)
+
+
+def view_from_args(args) -> tuple:
+    rows = args.get("rows")
+    genotypes = args.get("genotypes")
+    view = expression_view(
+        log_y=args.get("log") == "1",
+        error=args.get("error", "sd"),
+        rows=None if rows is None else [row for row in rows.split(",") if row],
+        genotypes=(None if genotypes is None
+                   else [genotype for genotype in genotypes.split(",") if genotype]),
+    )
+    return args.get("replicates") == "1", view
+
+
+def render_gene_image(data_manager, gene: str, fmt: str, fig=None, cache: bool = True,
+                      wait: Optional[float] = None, show_replicates: bool = False,
+                      view: Optional[dict] = None) -> Optional[bytes]:
+    data_manager.load_expression_matrix()
+    if not data_manager.get_isoforms_for_gene(gene):
+        return None
+
+    show_replicates = show_replicates and data_manager.replicate_matrix is not None
+    view = expression_view() if view is None else view
+    scale = EXPORT_FORMATS[fmt]["scale"]
+    cache_key = expression_cache_key(gene, data_manager.fingerprint, show_replicates,
+                                     view) + (fmt, EXPORT_WIDTH, EXPORT_HEIGHT, scale)
+    image = image_cache.get(cache_key)
+    if image is None:
+        if fig is None:
+            fig = export_figure(data_manager, gene, show_replicates, view)
+        image = renderer_pool.render(fig, format=fmt, width=EXPORT_WIDTH,
+                                     height=EXPORT_HEIGHT, scale=scale, wait=wait)
+        if cache:
+            image_cache.put(cache_key, image)
+    return image
+
+
+def register_downloads(server, prefix: str = "/"):
+    @server.route(f"{prefix}download/<fmt>/<gene>")
+    def download(fmt, gene):
+        if fmt not in EXPORT_FORMATS:
+            abort(404)
+        render = instrumented(f"download_{fmt}")(render_gene_image)
+        show_replicates, view = view_from_args(request.args)
+        try:
+            image = render(ExpressionDataManager(), gene, fmt,
+                           show_replicates=show_replicates, view=view)
+        except RendererQueueFull as err:
+            return Response(str(err), status=503, headers={"Retry-After": "5"})
+        if image is None:
+            abort(404)
+        observe_payload(f"download_{fmt}", len(image))
+        return Response(
+            image,
+            mimetype=EXPORT_FORMATS[fmt]["mimetype"],
+            headers={"Content-Disposition":
+                     f"attachment; filename=expression_plot_{gene}.{fmt}"},
+        )
+
+    return download
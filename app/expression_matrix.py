@@ -0,0 +1,88 @@
+from functools import cached_property
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+STATISTICS = ("mean", "std")
+
+
+def group_rows(rows: pd.Index, codes: np.ndarray, genes: list) -> dict:
+    order = np.argsort(codes, kind="stable")
+    bounds = np.searchsorted(codes[order], np.arange(len(genes) + 1))
+    labels = rows.to_numpy()[order]
+    return {gene: labels[start:stop].tolist()
+            for gene, start, stop in zip(genes, bounds[:-1], bounds[1:])}
+
+
+def build_isoform_index(rows: pd.Index) -> dict:
+    isoform_index = {}
+    for label in rows:
+        isoform_index.setdefault(label.split(".", 1)[0], []).append(label)
+    return isoform_index
+
+
+class ExpressionMatrix:
+    def __init__(self, rows: pd.Index, groups: pd.Index, values: np.ndarray,
+                 counts: Optional[np.ndarray] = None,
+                 isoform_index: Optional[dict] = None):
+        if values.shape != (len(STATISTICS), len(rows), len(groups)):
+            raise ValueError(f"Expected values of shape "
+                             f"{(len(STATISTICS), len(rows), len(groups))}, "
+                             f"got {values.shape}")
+        if counts is not None and len(counts) != len(groups):
+            raise ValueError(f"Expected {len(groups)} sample counts, "
+                             f"got {len(counts)}")
+        self.rows = rows
+        self.groups = groups
+        self.values = values
+        self.counts = counts
+        self.isoform_index = (build_isoform_index(rows) if isoform_index is None
+                              else isoform_index)
+
+    @property
+    def mean(self) -> np.ndarray:
+        return self.values[0]
+
+    @property
+    def std(self) -> np.ndarray:
+        return self.values[1]
+
+    @property
+    def nbytes(self) -> int:
+        return self.values.nbytes
+
+    @classmethod
+    def from_frame(cls, frame: pd.DataFrame, dtype=np.float64,
+                   counts: Optional[pd.Series] = None) -> 'ExpressionMatrix':
+        mean = frame.xs("mean", level=1)
+        std = frame.xs("std", level=1).reindex(mean.index)
+        values = np.stack([mean.to_numpy(dtype=dtype), std.to_numpy(dtype=dtype)])
+        if counts is not None:
+            counts = counts.reindex(frame.columns).fillna(0).to_numpy(dtype=np.int64)
+        return cls(mean.index, frame.columns, values, counts)
+
+    @property
+    def count_series(self) -> Optional[pd.Series]:
+        if self.counts is None:
+            return None
+        return pd.Series(self.counts, index=self.groups)
+
+    @cached_property
+    def frame(self) -> pd.DataFrame:
+        n_rows = len(self.rows)
+        index = pd.MultiIndex(
+            levels=[self.rows, list(STATISTICS)],
+            codes=[np.tile(np.arange(n_rows), len(STATISTICS)),
+                   np.repeat(np.arange(len(STATISTICS)), n_rows)],
+            verify_integrity=False,
+        )
+        return pd.DataFrame(self.values.reshape(-1, len(self.groups)), index=index,
+                            columns=self.groups, copy=False)
+
+    def block(self, labels: list) -> tuple:
+        positions = self.rows.get_indexer(labels)
+        if (positions < 0).any():
+            missing = [label for label, pos in zip(labels, positions) if pos < 0]
+            raise KeyError(f"Unknown rows: {missing}")
+        return self.mean[positions], self.std[positions]
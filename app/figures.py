@@ -0,0 +1,411 @@
+import numpy as np
+import pandas as pd
+import plotly.graph_objects as go
+from dash import Patch
+
+from app.lru_cache import LRUCache
+
+figure_cache = LRUCache(max_entries=256, max_bytes=64 * 2**20)
+
+HEATMAP_SCALES = {
+    "linear": "mean TPM",
+    "log": "log2(mean TPM + 1)",
+    "zscore": "z-score of mean TPM",
+}
+MAX_HEATMAP_ROWS = 400
+REPLICATE_JITTER = 0.3
+ERROR_TYPES = {"sd": "SD", "sem": "SEM"}
+EXPRESSION_ROWS = ("isoforms", "gene")
+EXPRESSION_TOGGLES = ("log_y", "error", "rows", "genotypes")
+COLORS = ['#1f77b4', '#ff7f0e', '#2ca02c', '#d62728', '#9467bd',
+          '#8c564b', '#e377c2', '#7f7f7f', '#bcbd22', '#17becf']
+
+
+def expression_view(log_y=False, error="sd", rows=EXPRESSION_ROWS,
+                    genotypes=None) -> dict:
+    return {
+        "log_y": bool(log_y),
+        "error": error if error in ERROR_TYPES else "sd",
+        "rows": tuple(sorted(EXPRESSION_ROWS if rows is None else rows)),
+        "genotypes": None if genotypes is None else tuple(genotypes),
+    }
+
+
+def expression_cache_key(selected_gene, fingerprint, show_replicates=False,
+                         view=None) -> tuple:
+    view = expression_view() if view is None else view
+    cache_key = (selected_gene, fingerprint)
+    if show_replicates:
+        cache_key += ("replicates",)
+    if view != expression_view():
+        cache_key += tuple(view.items())
+    return cache_key
+
+
+def build_expression_figure(data_manager, selected_gene, show_replicates=False,
+                            log_y=False, error="sd", rows=EXPRESSION_ROWS,
+                            genotypes=None):
+    data = _ExpressionData(data_manager, selected_gene, show_replicates, error)
+    if not data.isoforms:
+        return empty_figure(f"No expression data found for {selected_gene}")
+
+    x_values = np.array([data.x_positions[group] for group in data.ordered_groups])
+    visible = data.visible(rows, genotypes)
+    legend = data.legend(visible)
+    traces = []
+    for i, isoform in enumerate(data.isoforms):
+        for j, (start, end) in enumerate(zip(data.offsets[:-1], data.offsets[1:])):
+            traces.append(go.Scatter(
+                x=x_values[start:end],
+                y=data.means[i, start:end],
+                error_y=dict(
+                    type='data',
+                    array=data.errors[i, start:end],
+                    visible=True
+                ),
+                mode='lines+markers',
+                line=dict(width=2, color=COLORS[i % len(COLORS)]),
+                marker=dict(size=8),
+                name=isoform,
+                showlegend=bool(legend[i, j]),
+                legendgroup=isoform,
+                visible=bool(visible[i, j])
+            ))
+    if data.replicates is not None:
+        traces.extend(_replicate_traces(data, visible))
+    fig = go.Figure(data=traces)
+
+    fig.update_layout(
+        title=f'Expression Profile: {selected_gene}',
+        yaxis_title=f"mean/{ERROR_TYPES[error]} TPM",
+        height=500,
+        showlegend=True,
+        yaxis=dict(
+            showgrid=True,
+            gridcolor="lightgray",
+            zeroline=True,
+            color='black',
+            zerolinecolor="lightgray",
+            zerolinewidth=1,
+            **_y_axis(data, visible, log_y)
+        ),
+        xaxis=dict(
+            tickvals=[data.x_positions[s] for s in data.sample_groups],
+            ticktext=data.sample_groups,
+            tickangle=45,
+            showgrid=True,
+            gridcolor="lightgray",
+            zeroline=False,
+        ),
+        legend=dict(
+            yanchor="top",
+            y=0.99,
+            xanchor="left",
+            x=1.01
+        ),
+        paper_bgcolor="white",
+        plot_bgcolor="white"
+    )
+
+    return fig
+
+
+def build_expression_patch(data_manager, selected_gene, show_replicates=False,
+                           log_y=False, error="sd", rows=EXPRESSION_ROWS,
+                           genotypes=None, changed=None):
+    changed = set(EXPRESSION_TOGGLES) if changed is None else set(changed)
+    data = _ExpressionData(data_manager, selected_gene, show_replicates, error)
+    if not data.isoforms:
+        return None
+
+    patch = Patch()
+    visible = data.visible(rows, genotypes)
+    if changed & {"rows", "genotypes"}:
+        for index, flag in enumerate(data.trace_visibility(visible)):
+            patch["data"][index]["visible"] = flag
+    if "genotypes" in changed:
+        for index, flag in enumerate(data.legend(visible).ravel().tolist()):
+            patch["data"][index]["showlegend"] = flag
+    if "error" in changed:
+        n_genotypes = len(data.offsets) - 1
+        for i in range(len(data.isoforms)):
+            for j, (start, end) in enumerate(zip(data.offsets[:-1], data.offsets[1:])):
+                patch["data"][i * n_genotypes + j]["error_y"]["array"] = \
+                    data.errors[i, start:end].tolist()
+        patch["layout"]["yaxis"]["title"]["text"] = f"mean/{ERROR_TYPES[error]} TPM"
+    if "log_y" in changed or not log_y:
+        for key, value in _y_axis(data, visible, log_y).items():
+            patch["layout"]["yaxis"][key] = value
+        if log_y:
+            del patch["layout"]["yaxis"]["range"]
+    return patch
+
+
+class _ExpressionData:
+    def __init__(self, data_manager, selected_gene, show_replicates=False,
+                 error="sd"):
+        data_manager.load_expression_matrix()
+        self.gene = selected_gene
+        self.isoforms = data_manager.get_isoforms_for_gene(selected_gene)
+        self.replicates = None
+        if not self.isoforms:
+            return
+
+        self.sample_groups = data_manager.get_sample_groups()
+        self.groups_by_type = data_manager.get_groups_by_genotype()
+        self.x_positions = _get_x_positions(self.groups_by_type)
+        self.ordered_groups = [group for cols in self.groups_by_type.values()
+                               for group in cols]
+        self.offsets = np.cumsum([0] + [len(cols)
+                                        for cols in self.groups_by_type.values()])
+
+        columns = pd.Index(self.sample_groups).get_indexer(self.ordered_groups)
+        means, errors = data_manager.get_expression_block(self.isoforms)
+        self.means, self.errors = means[:, columns], errors[:, columns]
+        if error == "sem":
+            counts = data_manager.get_replicate_counts()
+            self.errors = self.errors / np.sqrt(
+                [max(1, counts[group]) for group in self.ordered_groups])
+
+        if show_replicates and data_manager.replicate_matrix is not None:
+            self._load_replicates(data_manager.replicate_matrix)
+
+    def _load_replicates(self, replicates):
+        try:
+            values = replicates.block(self.isoforms)
+        except KeyError:
+            return
+        positions = pd.Index(self.ordered_groups).get_indexer(replicates.groups)
+        genotype = np.searchsorted(self.offsets, positions, side="right") - 1
+        x_values = np.array([self.x_positions[group] for group in self.ordered_groups])
+        self.replicates = replicates
+        self.replicate_values = values
+        self.replicate_x = (x_values[positions]
+                            + REPLICATE_JITTER * replicates.spread)
+        self.replicate_columns = [np.flatnonzero((positions >= 0) & (genotype == j))
+                                  for j in range(len(self.offsets) - 1)]
+
+    def visible(self, rows=EXPRESSION_ROWS, genotypes=None) -> np.ndarray:
+        rows = EXPRESSION_ROWS if rows is None else rows
+        is_gene = np.array([isoform == self.gene for isoform in self.isoforms])
+        shown_rows = np.where(is_gene, "gene" in rows, "isoforms" in rows)
+        shown_genotypes = np.array([genotypes is None or genotype in genotypes
+                                    for genotype in self.groups_by_type])
+        return np.outer(shown_rows, shown_genotypes)
+
+    def legend(self, visible) -> np.ndarray:
+        first = np.where(visible.any(axis=1), visible.argmax(axis=1), 0)
+        return np.arange(visible.shape[1]) == first[:, None]
+
+    def trace_visibility(self, visible) -> list:
+        flags = visible.ravel().tolist()
+        if self.replicates is not None:
+            flags += flags
+        return flags
+
+
+def _y_axis(data, visible, log_y) -> dict:
+    if log_y:
+        return dict(type="log", autorange=True)
+
+    columns = np.repeat(visible, np.diff(data.offsets), axis=1)
+    values = [data.means[columns] + data.errors[columns],
+              data.means[columns] - data.errors[columns]]
+    if data.replicates is not None:
+        for j, samples in enumerate(data.replicate_columns):
+            values.append(data.replicate_values[np.ix_(visible[:, j], samples)].ravel())
+    values = np.concatenate(values).astype(np.float64)
+    values = values[np.isfinite(values)]
+    upper = np.max(values, initial=0)
+    lower = np.min(values, initial=0)
+    ymax = max(0, upper * 1.1)
+    ymin = min(0 - upper * 0.05, lower * 1.1)
+    return dict(type="linear", autorange=False, range=[float(ymin), float(ymax)])
+
+
+def _replicate_traces(data, visible):
+    names = data.replicates.samples.to_numpy()
+    traces = []
+    for i, isoform in enumerate(data.isoforms):
+        for j, samples in enumerate(data.replicate_columns):
+            traces.append(go.Scatter(
+                x=data.replicate_x[samples],
+                y=data.replicate_values[i, samples],
+                mode='markers',
+                marker=dict(size=5, color=COLORS[i % len(COLORS)], opacity=0.5),
+                name=f'{isoform} replicates',
+                text=names[samples],
+                hovertemplate='%{text}<br>%{y:.3g} TPM<extra></extra>',
+                showlegend=False,
+                legendgroup=isoform,
+                visible=bool(visible[i, j])
+            ))
+    return traces
+
+
+def build_heatmap_figure(data_manager, genes, scale="linear",
+                         max_rows=MAX_HEATMAP_ROWS):
+    data_manager.load_expression_matrix()
+
+    genes = list(dict.fromkeys(genes))
+    found = [gene for gene in genes if data_manager.get_isoforms_for_gene(gene)]
+    if not found:
+        return empty_figure("No expression data found for the selected genes")
+
+    sample_groups = data_manager.get_sample_groups()
+    ordered_groups = [group for cols in data_manager.get_groups_by_genotype().values()
+                      for group in cols]
+    columns = pd.Index(sample_groups).get_indexer(ordered_groups)
+    means, _ = data_manager.get_expression_block(found)
+    values = _scale_heatmap(np.asarray(means[:, columns], dtype=np.float64), scale)
+    values, labels = _downsample_rows(values, found, max_rows)
+
+    fig = go.Figure(go.Heatmap(
+        z=values.astype(np.float32),
+        x=ordered_groups,
+        y=labels,
+        colorscale="RdBu_r" if scale == "zscore" else "Viridis",
+        zmid=0 if scale == "zscore" else None,
+        colorbar=dict(title=HEATMAP_SCALES[scale]),
+        hovertemplate="%{y}<br>%{x}<br>%{z:.3g}<extra></extra>",
+        hoverongaps=False,
+    ))
+
+    title = f"Expression Heatmap: {len(found)} genes"
+    if len(found) < len(genes):
+        title += f" ({len(genes) - len(found)} not found)"
+    if len(labels) < len(found):
+        title += f", averaged into {len(labels)} rows"
+    fig.update_layout(
+        title=title,
+        height=min(1200, max(400, 14 * len(labels) + 200)),
+        xaxis=dict(tickangle=45),
+        yaxis=dict(autorange="reversed", showticklabels=len(labels) <= 100),
+        paper_bgcolor="white",
+        plot_bgcolor="white"
+    )
+    return fig
+
+
+def _scale_heatmap(values, scale):
+    if scale not in HEATMAP_SCALES:
+        raise ValueError(f"Scale must be one of {sorted(HEATMAP_SCALES)}")
+    if scale == "log":
+        return np.log2(values + 1)
+    if scale == "zscore":
+        observed = ~np.isnan(values)
+        count = observed.sum(axis=1, keepdims=True)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            mean = np.where(observed, values, 0).sum(axis=1, keepdims=True) / count
+            squares = np.where(observed, (values - mean) ** 2, 0)
+            std = np.sqrt(squares.sum(axis=1, keepdims=True) / count)
+            return np.where(std > 0, (values - mean) / std,
+                            np.where(observed, 0.0, np.nan))
+    return values
+
+
+def _downsample_rows(values, labels, max_rows):
+    if len(labels) <= max_rows:
+        return values, labels
+
+    starts = np.linspace(0, len(labels), max_rows, endpoint=False).astype(np.intp)
+    observed = ~np.isnan(values)
+    totals = np.add.reduceat(np.where(observed, values, 0), starts, axis=0)
+    counts = np.add.reduceat(observed, starts, axis=0)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        binned = np.where(counts > 0, totals / counts, np.nan)
+    stops = np.append(starts[1:], len(labels))
+    binned_labels = [f"{labels[start]} … {labels[stop - 1]} ({stop - start} genes)"
+                     for start, stop in zip(starts, stops)]
+    return binned, binned_labels
+
+
+def build_correlation_figure(qc_result):
+    samples = qc_result["samples"]
+    if len(samples) < 2:
+        return empty_figure("At least two samples are needed for QC")
+
+    order = np.argsort(samples, kind="stable")
+    labels = [samples[i] for i in order]
+    correlation = qc_result["correlation"][np.ix_(order, order)]
+    fig = go.Figure(go.Heatmap(
+        z=correlation.astype(np.float32),
+        x=labels,
+        y=labels,
+        colorscale="Viridis",
+        colorbar=dict(title="Pearson r"),
+        hovertemplate="%{y}<br>%{x}<br>r = %{z:.4f}<extra></extra>",
+    ))
+    fig.update_layout(
+        title="Sample Correlation (log1p gene TPM)",
+        height=600,
+        xaxis=dict(showticklabels=len(labels) <= 60, tickangle=45),
+        yaxis=dict(autorange="reversed", showticklabels=len(labels) <= 60),
+        paper_bgcolor="white",
+        plot_bgcolor="white"
+    )
+    return fig
+
+
+def build_pca_figure(qc_result, x_component=0, y_component=1):
+    samples = qc_result["samples"]
+    scores = qc_result["scores"]
+    explained = qc_result["explained_variance"]
+    if scores.shape[1] <= max(x_component, y_component):
+        return empty_figure("Not enough samples for a PCA")
+
+    genotypes = pd.Series([sample.split("_")[0] for sample in samples])
+    traces = []
+    for i, (genotype, rows) in enumerate(genotypes.groupby(genotypes).groups.items()):
+        rows = np.asarray(rows)
+        traces.append(go.Scatter(
+            x=scores[rows, x_component],
+            y=scores[rows, y_component],
+            mode="markers",
+            marker=dict(size=9, color=COLORS[i % len(COLORS)]),
+            name=genotype,
+            text=[samples[row] for row in rows],
+            hovertemplate="%{text}<extra></extra>",
+        ))
+    fig = go.Figure(data=traces)
+    fig.update_layout(
+        title="Sample PCA (log1p gene TPM)",
+        height=600,
+        xaxis=dict(title=f"PC{x_component + 1} "
+                         f"({explained[x_component]:.1%} variance)",
+                   showgrid=True, gridcolor="lightgray", zeroline=False),
+        yaxis=dict(title=f"PC{y_component + 1} "
+                         f"({explained[y_component]:.1%} variance)",
+                   showgrid=True, gridcolor="lightgray", zeroline=False),
+        paper_bgcolor="white",
+        plot_bgcolor="white"
+    )
+    return fig
+
+
+def _get_x_positions(groups_by_type):
+    x_positions_map = {}
+    current_pos = 1
+    inner_spacing = 0.5
+    group_spacing = 0.25
+    for _, cols in groups_by_type.items():
+        for i, sample in enumerate(cols):
+            x_positions_map[sample] = current_pos + i * inner_spacing
+        current_pos += len(cols) * inner_spacing + group_spacing
+    return x_positions_map
+
+
+def empty_figure(message: str = "No data to display"):
+    fig = go.Figure()
+    fig.add_annotation(
+        text=message,
+        xref="paper", yref="paper",
+        x=0.5, y=0.5, xanchor='center', yanchor='middle',
+        showarrow=False, font_size=16
+    )
+    fig.update_layout(
+        xaxis=dict(visible=False),
+        yaxis=dict(visible=False),
+        height=500
+    )
+    return fig
@@ -0,0 +1,75 @@
+import re
+
+import numpy as np
+import pandas as pd
+
+
+def gene_labels(annotation_data: pd.DataFrame) -> pd.Series:
+    agi = annotation_data["AGI"].astype(str)
+    names = annotation_data["Name"].fillna("Unknown").astype(str)
+    return agi + "; " + names
+
+
+def gene_options(annotation_data: pd.DataFrame) -> list:
+    if annotation_data.empty:
+        return []
+    return [{"label": label, "value": value}
+            for label, value in zip(gene_labels(annotation_data),
+                                    annotation_data["AGI"])]
+
+
+class GeneSearchIndex:
+    def __init__(self, annotation_data: pd.DataFrame):
+        labels = gene_labels(annotation_data)
+        agi = annotation_data["AGI"].astype(str).str.lower()
+        names = annotation_data["Name"].fillna("").astype(str).str.lower()
+
+        self._values = annotation_data["AGI"].to_numpy(dtype=object)
+        self._labels = labels.to_numpy(dtype=object)
+
+        self._agi_order = np.argsort(agi.to_numpy(dtype=str), kind="stable")
+        self._sorted_agi = agi.to_numpy(dtype=str)[self._agi_order]
+        self._name_order = np.argsort(names.to_numpy(dtype=str), kind="stable")
+        self._sorted_names = names.to_numpy(dtype=str)[self._name_order]
+
+        keys = (agi + "\t" + names).tolist()
+        self._haystack = "\n".join(keys)
+        self._key_starts = np.cumsum([0] + [len(key) + 1 for key in keys[:-1]])
+
+    def __len__(self) -> int:
+        return len(self._values)
+
+    def search(self, query: str, limit: int = 50) -> list:
+        query = (query or "").strip().lower()
+        if not query or "\n" in query or "\t" in query:
+            return []
+
+        rows = []
+        seen = set()
+
+        def add(candidates):
+            for row in candidates:
+                if len(rows) >= limit:
+                    return
+                if row not in seen:
+                    seen.add(row)
+                    rows.append(row)
+
+        add(self._prefix_matches(self._sorted_agi, self._agi_order, query, limit))
+        add(self._prefix_matches(self._sorted_names, self._name_order, query, limit))
+        if len(rows) < limit:
+            add(self._substring_matches(query))
+
+        return [{"label": self._labels[row], "value": self._values[row]}
+                for row in rows]
+
+    @staticmethod
+    def _prefix_matches(sorted_keys, order, query, limit):
+        start = np.searchsorted(sorted_keys, query, side="left")
+        stop = np.searchsorted(sorted_keys, query + "\U0010ffff", side="left")
+        return order[start:min(stop, start + limit)].tolist()
+
+    def _substring_matches(self, query):
+        for match in re.finditer(re.escape(query), self._haystack):
+            row = np.searchsorted(self._key_starts, match.start(), side="right") - 1
+            yield int(row)
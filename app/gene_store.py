@@ -0,0 +1,129 @@
+import os
+import threading
+from functools import cached_property
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+import tables
+
+from app.expression_matrix import ExpressionMatrix
+from app.quant_cache import fingerprint_name, remove_stale_files
+
+STORE_VERSION = 2
+CHUNK_ROWS = 64
+
+
+def _gene_store_file(store_dir, fingerprint: str) -> Path:
+    return Path(store_dir) / fingerprint_name("genes", fingerprint, ".h5")
+
+
+def _encode(labels) -> np.ndarray:
+    return np.array([str(label).encode() for label in labels])
+
+
+def _decode(array: np.ndarray) -> list:
+    return [label.decode() for label in array]
+
+
+class GeneStore:
+    def __init__(self, path):
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        self._file: Optional[tables.File] = None
+        self._pid: Optional[int] = None
+
+        root = self._handle().root
+        self.fingerprint = root._v_attrs.fingerprint
+        self.version = root._v_attrs.version
+        self.rows = pd.Index(_decode(root.rows.read()), dtype=object)
+        self.groups = pd.Index(_decode(root.groups.read()), dtype=object)
+        self.counts = root.counts.read() if "counts" in root else None
+        self._genes = _decode(root.genes.read())
+        self._offsets = root.offsets.read()
+        rows = self.rows.tolist()
+        self.isoform_index = {gene: rows[start:stop] for gene, start, stop
+                              in zip(self._genes, self._offsets[:-1],
+                                     self._offsets[1:])}
+
+    def _handle(self) -> tables.File:
+        if self._file is None or self._pid != os.getpid():
+            self._file = tables.open_file(str(self.path), mode="r")
+            self._pid = os.getpid()
+        return self._file
+
+    def block(self, labels: list) -> tuple:
+        positions = self.rows.get_indexer(labels)
+        if (positions < 0).any():
+            missing = [label for label, pos in zip(labels, positions) if pos < 0]
+            raise KeyError(f"Unknown rows: {missing}")
+        if not len(positions):
+            empty = np.empty((0, len(self.groups)))
+            return empty, empty
+
+        start, stop = positions.min(), positions.max() + 1
+        with self._lock:
+            values = self._handle().root.values[start:stop]
+        values = values[positions - start]
+        return values[:, 0], values[:, 1]
+
+    @cached_property
+    def frame(self) -> pd.DataFrame:
+        with self._lock:
+            values = self._handle().root.values.read()
+        return ExpressionMatrix(self.rows, self.groups,
+                                np.ascontiguousarray(values.transpose(1, 0, 2)),
+                                self.counts, self.isoform_index).frame
+
+    def close(self):
+        with self._lock:
+            if self._file is not None and self._pid == os.getpid():
+                self._file.close()
+            self._file = None
+
+
+def load_gene_store(store_dir, fingerprint: str) -> Optional[GeneStore]:
+    path = _gene_store_file(store_dir, fingerprint)
+    if not path.exists():
+        return None
+    try:
+        store = GeneStore(path)
+    except (OSError, AttributeError, tables.NoSuchNodeError):
+        return None
+    if (store.version != STORE_VERSION or store.fingerprint != fingerprint
+            or store.counts is None):
+        store.close()
+        return None
+    return store
+
+
+def store_gene_chunks(store_dir, fingerprint: str, matrix: ExpressionMatrix) -> Path:
+    store_dir = Path(store_dir)
+    store_dir.mkdir(parents=True, exist_ok=True)
+    path = _gene_store_file(store_dir, fingerprint)
+
+    isoform_index = matrix.isoform_index
+    genes = sorted(isoform_index)
+    labels = [label for gene in genes for label in isoform_index[gene]]
+    offsets = np.cumsum([0] + [len(isoform_index[gene]) for gene in genes])
+    values = matrix.values[:, matrix.rows.get_indexer(labels)].transpose(1, 0, 2)
+    chunkshape = (max(1, min(CHUNK_ROWS, len(labels))),) + values.shape[1:]
+
+    tmp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    with tables.open_file(str(tmp_path), mode="w") as h5:
+        h5.create_carray("/", "values", obj=np.ascontiguousarray(values),
+                         chunkshape=chunkshape,
+                         filters=tables.Filters(complevel=1, complib="blosc:lz4"))
+        h5.create_array("/", "rows", _encode(labels))
+        h5.create_array("/", "genes", _encode(genes))
+        h5.create_array("/", "offsets", offsets)
+        h5.create_array("/", "groups", _encode(matrix.groups))
+        if matrix.counts is not None:
+            h5.create_array("/", "counts", np.asarray(matrix.counts, dtype=np.int64))
+        h5.root._v_attrs.fingerprint = fingerprint
+        h5.root._v_attrs.version = STORE_VERSION
+    os.replace(tmp_path, path)
+
+    remove_stale_files(store_dir, "genes", fingerprint, (path,), "*.h5")
+    return path
@@ -0,0 +1,40 @@
+from typing import Callable, Optional
+
+from gunicorn.app.base import BaseApplication
+
+
+class GunicornApplication(BaseApplication):
+    def __init__(self, application, options: Optional[dict] = None):
+        self.application = application
+        self.options = options or {}
+        super().__init__()
+
+    def load_config(self):
+        for key, value in self.options.items():
+            if key in self.cfg.settings and value is not None:
+                self.cfg.set(key, value)
+
+    def load(self):
+        return self.application
+
+
+def gunicorn_options(host: str, port: int, workers: int = 1, threads: int = 1,
+                     timeout: int = 120,
+                     post_fork: Optional[Callable[[], None]] = None) -> dict:
+    options = {
+        "bind": f"{host}:{port}",
+        "workers": workers,
+        "threads": threads,
+        "worker_class": "gthread",
+        "preload_app": True,
+        "timeout": timeout,
+    }
+    if post_fork is not None:
+        options["post_fork"] = lambda server, worker: post_fork()
+    return options
+
+
+def serve(application, host: str, port: int, workers: int = 1, threads: int = 1,
+          timeout: int = 120, post_fork: Optional[Callable[[], None]] = None):
+    options = gunicorn_options(host, port, workers, threads, timeout, post_fork)
+    GunicornApplication(application, options).run()
@@ -1,31 +1,89 @@
 import base64
 
 import dash_bootstrap_components as dbc
-import pandas as pd
-import plotly.graph_objects as go
+import orjson
 import plotly.io as pio
-from dash import Input, Output, State, callback, dcc, html
+from dash import (
+    ClientsideFunction,
+    Input,
+    Output,
+    State,
+    callback,
+    clientside_callback,
+    ctx,
+    dash_table,
+    dcc,
+    html,
+    no_update,
+)
+from dash.dash_table.Format import Format, Scheme
+from dash.exceptions import MissingCallbackContextException
 
+from app.batch_export import parse_gene_list
 from app.data_loader import ExpressionDataManager
-
-
-def create_layout(annotation_path, expression_path):
+from app.differential import genotype_comparisons
+from app.export import EXPORT_FORMATS
+from app.figures import (
+    ERROR_TYPES,
+    EXPRESSION_ROWS,
+    HEATMAP_SCALES,
+    build_correlation_figure,
+    build_expression_figure,
+    build_expression_patch,
+    build_heatmap_figure,
+    build_pca_figure,
+    empty_figure,
+    expression_cache_key,
+    expression_view,
+    figure_cache,
+)
+from app.gene_search import gene_options
+from app.metrics import instrumented, observe_payload
+
+COMPARISON_SEPARATOR = "|"
+EXPRESSION_TOGGLE_IDS = {
+    "log-scale": "log_y",
+    "error-type": "error",
+    "expression-rows": "rows",
+    "genotype-filter": "genotypes",
+}
+DE_PAGE_SIZE = 20
+DE_TABLE_COLUMNS = [
+    {"name": "Gene", "id": "gene"},
+    {"name": "Name", "id": "name"},
+    {"name": "Mean TPM", "id": "mean", "type": "numeric",
+     "format": Format(precision=3, scheme=Scheme.decimal_or_exponent)},
+    {"name": "Reference TPM", "id": "reference_mean", "type": "numeric",
+     "format": Format(precision=3, scheme=Scheme.decimal_or_exponent)},
+    {"name": "log2 FC", "id": "log2_fold_change", "type": "numeric",
+     "format": Format(precision=2, scheme=Scheme.fixed)},
+    {"name": "t", "id": "t", "type": "numeric",
+     "format": Format(precision=2, scheme=Scheme.fixed)},
+    {"name": "p", "id": "p_value", "type": "numeric",
+     "format": Format(precision=2, scheme=Scheme.exponent)},
+    {"name": "q", "id": "q_value", "type": "numeric",
+     "format": Format(precision=2, scheme=Scheme.exponent)},
+]
+
+
+def create_layout(annotation_path, expression_path, server_search=False,
+                  search_limit=50, url_prefix="/"):
     data_manager = ExpressionDataManager(
         annotation_path=annotation_path,
         quant_path=expression_path
     )
     annotation_data = data_manager.load_annotation_data()
-    data_manager.load_quant_data()
-
-    fig = _empty_fig()
-    dropdown_options = [
-        {
-            "label":
-                f"{row['AGI']}; {row['Name'] if pd.notna(row['Name']) else 'Unknown'}",
-            "value": row['AGI']
-        }
-        for _, row in annotation_data.iterrows()
-    ]
+    data_manager.load_expression_matrix()
+    groups_by_genotype = data_manager.get_groups_by_genotype()
+    comparisons = genotype_comparisons(groups_by_genotype)
+    genotypes = list(groups_by_genotype)
+
+    fig = empty_figure()
+    if server_search:
+        data_manager.search_genes("", search_limit)
+        dropdown_options = []
+    else:
+        dropdown_options = gene_options(annotation_data)
 
     layout = html.Div([
         dbc.NavbarSimple(
@@ -49,6 +107,48 @@ def create_layout(annotation_path, expression_path):
                                 placeholder="Type to search genes...",
                                 className="mb-0"
                             ),
+                            dcc.Store(id="gene-search-config",
+                                      data={"server_search": server_search,
+                                            "limit": search_limit}),
+                            html.Label("Plot Options",
+                                       className="form-label fw-bold mb-2 mt-2"),
+                            dbc.Switch(
+                                id="show-replicates",
+                                label="Show replicates",
+                                value=False,
+                                disabled=data_manager.replicate_matrix is None,
+                                className="mb-0"
+                            ),
+                            dbc.Switch(
+                                id="log-scale",
+                                label="Log scale",
+                                value=False,
+                                className="mb-0"
+                            ),
+                            dbc.Checklist(
+                                id="expression-rows",
+                                options=[{"label": "Isoforms", "value": "isoforms"},
+                                         {"label": "Gene total", "value": "gene"}],
+                                value=list(EXPRESSION_ROWS),
+                                inline=True,
+                                className="mb-0"
+                            ),
+                            dbc.RadioItems(
+                                id="error-type",
+                                options=[{"label": label, "value": value}
+                                         for value, label in ERROR_TYPES.items()],
+                                value="sd",
+                                inline=True,
+                                className="mb-0"
+                            ),
+                            dbc.Checklist(
+                                id="genotype-filter",
+                                options=[{"label": genotype, "value": genotype}
+                                         for genotype in genotypes],
+                                value=genotypes,
+                                inline=True,
+                                className="mb-0"
+                            ),
                             html.Label("Export Options",
                                        className="form-label fw-bold mb-2 mt-2"),
                             html.Div(
@@ -57,6 +157,8 @@ def create_layout(annotation_path, expression_path):
                                         [html.I(className="fas fa-download me-2"),
                                          "SVG"],
                                         id="download-svg-btn",
+                                        download="expression_plot.svg",
+                                        external_link=True,
                                         color="outline-primary",
                                         size="sm",
                                         className="mb-2 w-100",
@@ -66,6 +168,8 @@ def create_layout(annotation_path, expression_path):
                                         [html.I(className="fas fa-download me-2"),
                                          "PNG"],
                                         id="download-png-btn",
+                                        download="expression_plot.png",
+                                        external_link=True,
                                         color="outline-secondary",
                                         size="sm",
                                         className="mb-2 w-100",
@@ -75,6 +179,8 @@ def create_layout(annotation_path, expression_path):
                                         [html.I(className="fas fa-download me-2"),
                                          "PDF"],
                                         id="download-pdf-btn",
+                                        download="expression_plot.pdf",
+                                        external_link=True,
                                         color="outline-success",
                                         size="sm",
                                         className="mb-2 w-100",
@@ -82,9 +188,47 @@ def create_layout(annotation_path, expression_path):
                                     ),
                                 ], size="sm"),
                             ),
-                            dcc.Download(id="download-svg"),
-                            dcc.Download(id="download-png"),
-                            dcc.Download(id="download-pdf"),
+                            html.Label("Batch Export",
+                                       className="form-label fw-bold mb-2 mt-2"),
+                            html.Form([
+                                dcc.Textarea(
+                                    id="batch-genes",
+                                    name="genes",
+                                    placeholder="Paste gene IDs, one per line...",
+                                    className="form-control form-control-sm mb-2",
+                                    style={"height": "90px"}
+                                ),
+                                dcc.Upload(
+                                    id="batch-gene-upload",
+                                    children=html.Small(
+                                        ["Drop or ", html.A("select"),
+                                         " a gene list file"]),
+                                    className="border rounded text-center "
+                                              "text-muted p-1 mb-2",
+                                    max_size=5 * 2**20
+                                ),
+                                html.Div([
+                                    dbc.Checkbox(
+                                        id=f"batch-format-{fmt}",
+                                        name=f"format_{fmt}",
+                                        label=fmt.upper(),
+                                        value=fmt == "svg",
+                                        className="form-check-inline"
+                                    )
+                                    for fmt in EXPORT_FORMATS
+                                ], className="mb-2"),
+                                dbc.Button(
+                                    [html.I(className="fas fa-file-archive me-2"),
+                                     "Download ZIP"],
+                                    id="batch-export-btn",
+                                    type="submit",
+                                    color="outline-dark",
+                                    size="sm",
+                                    className="w-100"
+                                ),
+                            ], id="batch-export-form",
+                               action=f"{url_prefix}export/batch",
+                               method="POST"),
                         ])
                     ], className="shadow-sm border-0")
                 ], width=12, lg=3, className="mb-3"),
@@ -119,224 +263,372 @@ def create_layout(annotation_path, expression_path):
                 ], width=12, lg=9)
             ], className="g-3"),
 
+            dbc.Tabs([
+                dbc.Tab(label="Heatmap", tab_id="heatmap", children=[
+                    dbc.Row([
+                        dbc.Col([
+                            dbc.Card([
+                                dbc.CardBody([
+                                    html.Label("Heatmap Genes",
+                                               className="form-label fw-bold mb-2"),
+                                    dcc.Textarea(
+                                        id="heatmap-genes",
+                                        placeholder="Paste gene IDs, one per line...",
+                                        className="form-control form-control-sm mb-2",
+                                        style={"height": "150px"}
+                                    ),
+                                    dbc.RadioItems(
+                                        id="heatmap-scale",
+                                        options=[{"label": label, "value": value}
+                                                 for value, label in {
+                                                     "linear": "TPM",
+                                                     "log": "log2(TPM + 1)",
+                                                     "zscore": "z-score",
+                                                 }.items()],
+                                        value="linear",
+                                        className="mb-2"
+                                    ),
+                                    dbc.Button(
+                                        [html.I(className="fas fa-th me-2"),
+                                         "Show Heatmap"],
+                                        id="heatmap-btn",
+                                        color="outline-primary",
+                                        size="sm",
+                                        className="w-100"
+                                    ),
+                                ])
+                            ], className="shadow-sm border-0")
+                        ], width=12, lg=3, className="mb-3"),
+
+                        dbc.Col([
+                            dbc.Card([
+                                dbc.CardBody([
+                                    dcc.Loading(
+                                        children=[
+                                            dcc.Graph(
+                                                id="heatmap-plot",
+                                                figure=fig,
+                                                config={'displaylogo': False},
+                                            )
+                                        ],
+                                        color="#007bff",
+                                        type="default"
+                                    )
+                                ], className="p-1")
+                            ], className="shadow-sm border-0")
+                        ], width=12, lg=9)
+                    ], className="g-3 mt-3"),
+                ]),
+                dbc.Tab(label="Differential Expression", tab_id="de", children=[
+                    dbc.Row([
+                        dbc.Col([
+                            dbc.Card([
+                                dbc.CardBody([
+                                    html.Label("Comparison",
+                                               className="form-label fw-bold mb-2"),
+                                    dcc.Dropdown(
+                                        id="de-comparison",
+                                        options=[{"label": f"{group} vs {reference}",
+                                                  "value": COMPARISON_SEPARATOR.join(
+                                                      [group, reference])}
+                                                 for group, reference in comparisons],
+                                        value=(COMPARISON_SEPARATOR.join(comparisons[0])
+                                               if comparisons else None),
+                                        clearable=False,
+                                        placeholder="Select a comparison...",
+                                        className="mb-2"
+                                    ),
+                                    dash_table.DataTable(
+                                        id="de-table",
+                                        columns=DE_TABLE_COLUMNS,
+                                        data=[],
+                                        page_action="custom",
+                                        page_current=0,
+                                        page_size=DE_PAGE_SIZE,
+                                        page_count=0,
+                                        sort_action="custom",
+                                        sort_mode="single",
+                                        sort_by=[{"column_id": "p_value",
+                                                  "direction": "asc"}],
+                                        style_table={"overflowX": "auto"},
+                                        style_cell={"fontSize": "0.85rem",
+                                                    "padding": "2px 6px"},
+                                        style_data_conditional=[
+                                            {"if": {"column_id": "gene"},
+                                             "cursor": "pointer",
+                                             "textDecoration": "underline"},
+                                        ],
+                                    ),
+                                ])
+                            ], className="shadow-sm border-0")
+                        ], width=12)
+                    ], className="g-3 mt-3"),
+                ]),
+                dbc.Tab(label="Sample QC", tab_id="qc", children=[
+                    dbc.Row([
+                        dbc.Col([
+                            dbc.Card([
+                                dbc.CardBody([
+                                    dcc.Loading(
+                                        children=[
+                                            dcc.Graph(id="qc-correlation",
+                                                      figure=fig,
+                                                      config={'displaylogo': False})
+                                        ],
+                                        color="#007bff",
+                                        type="default"
+                                    )
+                                ], className="p-1")
+                            ], className="shadow-sm border-0")
+                        ], width=12, lg=6),
+                        dbc.Col([
+                            dbc.Card([
+                                dbc.CardBody([
+                                    dcc.Loading(
+                                        children=[
+                                            dcc.Graph(id="qc-pca",
+                                                      figure=fig,
+                                                      config={'displaylogo': False})
+                                        ],
+                                        color="#007bff",
+                                        type="default"
+                                    )
+                                ], className="p-1")
+                            ], className="shadow-sm border-0")
+                        ], width=12, lg=6)
+                    ], className="g-3 mt-3"),
+                ]),
+            ], id="analysis-tabs", active_tab="heatmap", className="mt-3"),
+
             html.Div(style={"height": "20px"})
         ], fluid=True, className="px-3")
     ])
     return layout
 
+@callback(
+    Output("gene-selector", "options"),
+    Input("gene-selector", "search_value"),
+    State("gene-selector", "value"),
+    State("gene-search-config", "data"),
+    prevent_initial_call=True,
+)
+def search_genes(search_value, selected_gene, search_config):
+    if not search_config or not search_config["server_search"] or not search_value:
+        return no_update
+
+    data_manager = ExpressionDataManager()
+    options = data_manager.search_genes(search_value, search_config["limit"])
+    if selected_gene and all(opt["value"] != selected_gene for opt in options):
+        options += data_manager.search_genes(selected_gene, 1)
+    return options
+
+
 @callback(
     Output("expression-plot", "figure"),
-    Input("gene-selector", "value")
+    Input("gene-selector", "value"),
+    Input("show-replicates", "value"),
+    State("log-scale", "value"),
+    State("error-type", "value"),
+    State("expression-rows", "value"),
+    State("genotype-filter", "value"),
 )
-def update_expression_plot(selected_gene):
+@instrumented("update_expression_plot")
+def update_expression_plot(selected_gene, show_replicates=False, log_y=False,
+                           error="sd", rows=EXPRESSION_ROWS, genotypes=None):
     if not selected_gene:
-        return _empty_fig()
+        return empty_figure()
 
     data_manager = ExpressionDataManager()
-    expression_data = data_manager.load_quant_data()
-
-    matching_isoforms = data_manager.get_isoforms_for_gene(selected_gene)
-
-    if not matching_isoforms:
-        return _empty_fig(f"No expression data found for {selected_gene}")
-
-    fig = go.Figure()
-
-    sample_groups = data_manager.get_sample_groups()
-
-    colors = ['#1f77b4', '#ff7f0e', '#2ca02c', '#d62728', '#9467bd',
-              '#8c564b', '#e377c2', '#7f7f7f', '#bcbd22', '#17becf']
-
-    groups_by_type = data_manager.get_groups_by_genotype()
-
-    x_positions_map = _get_x_positions(groups_by_type)
-
-    all_y = []
-    for i, isoform in enumerate(matching_isoforms):
-        first_of_type = True
-        for _, cols in groups_by_type.items():
-            x_values = []
-            y_values = []
-            error_values = []
-            for group in cols:
-                mean = expression_data.loc[(isoform, "mean"), group]
-                error = expression_data.loc[(isoform, "std"), group]
-                all_y.extend([mean + error, mean - error])
-                x_values.append(x_positions_map[group])
-                y_values.append(mean)
-                error_values.append(error)
-
-            fig.add_trace(go.Scatter(
-                x=x_values,
-                y=y_values,
-                error_y=dict(
-                    type='data',
-                    array=error_values,
-                    visible=True
-                ),
-                mode='lines+markers',
-                line=dict(width=2, color=colors[i % len(colors)]),
-                marker=dict(size=8),
-                name=isoform,
-                showlegend=first_of_type,
-                legendgroup=isoform
-            ))
-            first_of_type = False
-
-    ymax = max(0, max(all_y) * 1.1)
-    ymin = min(0 - max(all_y) * 0.05, min(all_y) * 1.1)
-    fig.update_layout(
-        title=f'Expression Profile: {selected_gene}',
-        yaxis_title="mean/SD TPM",
-        height=500,
-        showlegend=True,
-        yaxis=dict(
-            showgrid=True,
-            gridcolor="lightgray",
-            zeroline=True,
-            color='black',
-            zerolinecolor="lightgray",
-            zerolinewidth=1,
-            autorange=False,
-            range=[ymin, ymax]
-        ),
-        xaxis=dict(
-            tickvals=[x_positions_map[s] for s in sample_groups],
-            ticktext=sample_groups,
-            tickangle=45,
-            showgrid=True,
-            gridcolor="lightgray",
-            zeroline=False,
-        ),
-        legend=dict(
-            yanchor="top",
-            y=0.99,
-            xanchor="left",
-            x=1.01
-        ),
-        paper_bgcolor="white",
-        plot_bgcolor="white"
-    )
-
-    return fig
-
-def _get_x_positions(groups_by_type):
-    x_positions_map = {}
-    current_pos = 1
-    inner_spacing = 0.5
-    group_spacing = 0.25
-    for _, cols in groups_by_type.items():
-        for i, sample in enumerate(cols):
-            x_positions_map[sample] = current_pos + i * inner_spacing
-        current_pos += len(cols) * inner_spacing + group_spacing
-    return x_positions_map
-
-
-def _empty_fig(message: str = "No data to display"):
-    fig = go.Figure()
-    fig.add_annotation(
-        text=message,
-        xref="paper", yref="paper",
-        x=0.5, y=0.5, xanchor='center', yanchor='middle',
-        showarrow=False, font_size=16
-    )
-    fig.update_layout(
-        xaxis=dict(visible=False),
-        yaxis=dict(visible=False),
-        height=500
-    )
-    return fig
+    show_replicates = (bool(show_replicates)
+                       and data_manager.replicate_matrix is not None)
+    view = expression_view(log_y, error, rows, genotypes)
+    cache_key = expression_cache_key(selected_gene, data_manager.fingerprint,
+                                     show_replicates, view)
+    cached = figure_cache.get(cache_key)
+    if cached is not None:
+        observe_payload("update_expression_plot", len(cached))
+        return _figure_response(cached)
+
+    fig = build_expression_figure(data_manager, selected_gene, show_replicates,
+                                  **view)
+    payload = pio.to_json(fig, engine="orjson").encode()
+    observe_payload("update_expression_plot", len(payload))
+    figure_cache.put(cache_key, payload)
+    return _figure_response(payload, fig)
 
 
 @callback(
-    Output("download-svg", "data"),
-    Input("download-svg-btn", "n_clicks"),
-    State("expression-plot", "figure"),
+    Output("expression-plot", "figure", allow_duplicate=True),
+    Input("log-scale", "value"),
+    Input("error-type", "value"),
+    Input("expression-rows", "value"),
+    Input("genotype-filter", "value"),
     State("gene-selector", "value"),
+    State("show-replicates", "value"),
     prevent_initial_call=True,
-    running=[
-        (Output("download-svg-btn", "disabled"), True, False),
-        (Output("download-svg-btn", "children"),
-         [dbc.Spinner(size="sm", color="primary"),
-          html.Span("Downloading...")],
-         [html.I(className="fas fa-download me-2"), "SVG"]),
-    ],
 )
-def download_svg(n_clicks, figure, selected_gene):
-    if n_clicks and figure:
-        fig = go.Figure(figure)
+@instrumented("restyle_expression_plot")
+def restyle_expression_plot(log_y, error, rows, genotypes, selected_gene,
+                            show_replicates=False):
+    if not selected_gene:
+        return no_update
 
-        svg_string = pio.to_image(fig, format="svg", width=1000, height=400)
-        svg_b64 = base64.b64encode(svg_string).decode('utf-8')
+    data_manager = ExpressionDataManager()
+    show_replicates = (bool(show_replicates)
+                       and data_manager.replicate_matrix is not None)
+    changed = EXPRESSION_TOGGLE_IDS.get(_triggered_id())
+    patch = build_expression_patch(
+        data_manager, selected_gene, show_replicates,
+        changed=None if changed is None else [changed],
+        **expression_view(log_y, error, rows, genotypes))
+    if patch is None:
+        return no_update
+    payload = orjson.dumps(patch.to_plotly_json())
+    observe_payload("restyle_expression_plot", len(payload))
+    return _figure_response(payload, patch)
 
-        filename = f"expression_plot_{selected_gene or 'plot'}.svg"
 
-        return dict(content=svg_b64, filename=filename, type="image/svg+xml",
-                    base64=True)
+def _triggered_id():
+    try:
+        return ctx.triggered_id
+    except MissingCallbackContextException:
+        return None
 
 
-@callback(
-    Output("download-pdf", "data"),
-    Input("download-pdf-btn", "n_clicks"),
-    State("expression-plot", "figure"),
-    State("gene-selector", "value"),
-    prevent_initial_call=True,
-    running=[
-        (Output("download-pdf-btn", "disabled"), True, False),
-        (Output("download-pdf-btn", "children"),
-         [dbc.Spinner(size="sm", color="primary"),
-          html.Span("Downloading...")],
-         [html.I(className="fas fa-download me-2"), "PDF"]),
-    ],
-)
-def download_pdf(n_clicks, figure, selected_gene):
-    if n_clicks and figure:
-        fig = go.Figure(figure)
+def _in_callback() -> bool:
+    try:
+        return ctx.outputs_list is not None
+    except MissingCallbackContextException:
+        return False
 
-        pdf_bytes = pio.to_image(fig, format="pdf", width=1000, height=400)
-        pdf_b64 = base64.b64encode(pdf_bytes).decode('utf-8')
 
-        filename = f"expression_plot_{selected_gene or 'plot'}.pdf"
-
-        return dict(content=pdf_b64, filename=filename, type="application/pdf",
-                    base64=True)
+def _figure_response(payload: bytes, fig=None):
+    if _in_callback():
+        return orjson.Fragment(payload)
+    return orjson.loads(payload) if fig is None else fig
 
 
 @callback(
-    Output("download-png", "data"),
-    Input("download-png-btn", "n_clicks"),
-    State("expression-plot", "figure"),
-    State("gene-selector", "value"),
+    Output("heatmap-plot", "figure"),
+    Input("heatmap-btn", "n_clicks"),
+    Input("heatmap-scale", "value"),
+    State("heatmap-genes", "value"),
     prevent_initial_call=True,
-    running=[
-        (Output("download-png-btn", "disabled"), True, False),
-        (Output("download-png-btn", "children"),
-         [dbc.Spinner(size="sm", color="primary"),
-          html.Span("Downloading...")],
-         [html.I(className="fas fa-download me-2"), "PNG"]),
-    ],
 )
-def download_png(n_clicks, figure, selected_gene):
-    if n_clicks and figure:
-        fig = go.Figure(figure)
+@instrumented("update_heatmap")
+def update_heatmap(n_clicks, scale, gene_text):
+    genes = parse_gene_list(gene_text)
+    if not genes:
+        return empty_figure("Paste gene IDs to show a heatmap")
+    if scale not in HEATMAP_SCALES:
+        scale = "linear"
 
-        png_bytes = pio.to_image(fig, format="png", width=1000, height=400, scale=2)
-        png_b64 = base64.b64encode(png_bytes).decode('utf-8')
+    data_manager = ExpressionDataManager()
+    cache_key = ("heatmap", tuple(genes), scale, data_manager.fingerprint)
+    cached = figure_cache.get(cache_key)
+    if cached is not None:
+        observe_payload("update_heatmap", len(cached))
+        return _figure_response(cached)
 
-        filename = f"expression_plot_{selected_gene or 'plot'}.png"
+    fig = build_heatmap_figure(data_manager, genes, scale)
+    payload = pio.to_json(fig, engine="orjson").encode()
+    observe_payload("update_heatmap", len(payload))
+    figure_cache.put(cache_key, payload)
+    return _figure_response(payload, fig)
 
-        return dict(content=png_b64, filename=filename, type="image/png", base64=True)
 
+@callback(
+    Output("de-table", "data"),
+    Output("de-table", "page_count"),
+    Input("de-comparison", "value"),
+    Input("de-table", "page_current"),
+    Input("de-table", "page_size"),
+    Input("de-table", "sort_by"),
+)
+@instrumented("update_de_table")
+def update_de_table(comparison, page_current, page_size, sort_by):
+    if not comparison or COMPARISON_SEPARATOR not in comparison:
+        return [], 0
+
+    group, reference = comparison.split(COMPARISON_SEPARATOR, 1)
+    results = ExpressionDataManager().get_differential_expression(group, reference)
+    if sort_by:
+        results = results.sort_values(
+            sort_by[0]["column_id"], ascending=sort_by[0]["direction"] == "asc",
+            na_position="last", kind="stable")
+
+    page_size = page_size or DE_PAGE_SIZE
+    start = (page_current or 0) * page_size
+    page = results.iloc[start:start + page_size]
+    page = page.astype(object).where(page.notna(), None)
+    return page.to_dict("records"), -(-len(results) // page_size)
+
+
+clientside_callback(
+    ClientsideFunction(namespace="htv", function_name="selectDeGene"),
+    Output("gene-selector", "value"),
+    Output("gene-selector", "options", allow_duplicate=True),
+    Input("de-table", "active_cell"),
+    State("de-table", "data"),
+    State("gene-search-config", "data"),
+    prevent_initial_call=True,
+)
 
 
 @callback(
+    Output("qc-correlation", "figure"),
+    Output("qc-pca", "figure"),
+    Input("analysis-tabs", "active_tab"),
+    prevent_initial_call=True,
+)
+@instrumented("update_sample_qc")
+def update_sample_qc(active_tab):
+    if active_tab != "qc":
+        return no_update, no_update
+
+    data_manager = ExpressionDataManager()
+    sample_qc = data_manager.get_sample_qc()
+    cache_key = ("qc", data_manager.fingerprint, sample_qc.version)
+    cached = figure_cache.get(cache_key)
+    if cached is not None:
+        observe_payload("update_sample_qc", len(cached))
+        return tuple(orjson.loads(cached))
+
+    result = sample_qc.result()
+    figures = build_correlation_figure(result), build_pca_figure(result)
+    payloads = [pio.to_json(fig, engine="orjson").encode() for fig in figures]
+    payload = orjson.dumps([orjson.Fragment(part) for part in payloads])
+    observe_payload("update_sample_qc", len(payload))
+    figure_cache.put(("qc", data_manager.fingerprint, result["version"]), payload)
+    return tuple(_figure_response(part, fig) for part, fig in zip(payloads, figures))
+
+
+clientside_callback(
+    ClientsideFunction(namespace="htv", function_name="toggleDownloadButtons"),
     Output("download-svg-btn", "disabled"),
     Output("download-png-btn", "disabled"),
     Output("download-pdf-btn", "disabled"),
-    Input("gene-selector", "value")
+    Output("download-svg-btn", "href"),
+    Output("download-png-btn", "href"),
+    Output("download-pdf-btn", "href"),
+    Input("gene-selector", "value"),
+    Input("show-replicates", "value"),
+    Input("log-scale", "value"),
+    Input("error-type", "value"),
+    Input("expression-rows", "value"),
+    Input("genotype-filter", "value"),
 )
-def toggle_download_buttons(selected_gene):
-    if not selected_gene:
-        return True, True, True
-    return False, False, False
 
+
+@callback(
+    Output("batch-genes", "value"),
+    Input("batch-gene-upload", "contents"),
+    State("batch-genes", "value"),
+    prevent_initial_call=True,
+)
+def load_batch_gene_file(contents, current_genes):
+    if not contents:
+        return no_update
+    _, encoded = contents.split(",", 1)
+    text = base64.b64decode(encoded).decode("utf-8", errors="replace")
+    return "\n".join(parse_gene_list(f"{current_genes or ''}\n{text}"))
@@ -0,0 +1,386 @@
+import bisect
+import functools
+import math
+import os
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Callable, Optional
+
+import orjson
+from flask import Response
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+                   1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+SIZE_BUCKETS = (1024, 4096, 16384, 65536, 262144, 2**20, 4 * 2**20, 16 * 2**20)
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _format_labels(labelnames: tuple, values: tuple, extra: str = "") -> str:
+    pairs = [f'{name}="{value}"' for name, value in zip(labelnames, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value))
+
+
+def _alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _with_label(line: str, label: str) -> str:
+    name, _, value = line.rpartition(" ")
+    if "{" in name:
+        return f"{name.replace('{', '{' + label + ',', 1)} {value}"
+    return f"{name}{{{label}}} {value}"
+
+
+def _process_families(processes: dict) -> list:
+    families = {}
+    for pid, lines in processes.items():
+        samples = None
+        for line in lines:
+            if line.startswith("#"):
+                headers, samples = families.setdefault(line.split()[2], ([], []))
+                if line not in headers:
+                    headers.append(line)
+            elif samples is not None:
+                samples.append(_with_label(line, f'pid="{pid}"'))
+    return [line for headers, samples in families.values()
+            for line in headers + samples]
+
+
+class Counter:
+    def __init__(self, name: str, documentation: str, labelnames: tuple = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def inc(self, amount: float = 1, **labels):
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(tuple(str(labels[name]) for name in self.labelnames), 0)
+
+    def snapshot(self) -> list:
+        with self._lock:
+            return [[list(key), value] for key, value in self._values.items()]
+
+    def collect(self, snapshots: Optional[list] = None) -> list:
+        lines = [f"# HELP {self.name} {self.documentation}",
+                 f"# TYPE {self.name} counter"]
+        if snapshots is None:
+            snapshots = [self.snapshot()]
+        values = {}
+        for snapshot in snapshots:
+            for key, value in snapshot:
+                values[tuple(key)] = values.get(tuple(key), 0) + value
+        items = sorted(values.items())
+        for key, value in items:
+            lines.append(f"{self.name}{_format_labels(self.labelnames, key)} "
+                         f"{_format_value(value)}")
+        return lines
+
+    def clear(self):
+        with self._lock:
+            self._values.clear()
+
+
+class Histogram:
+    def __init__(self, name: str, documentation: str, labelnames: tuple = (),
+                 buckets: tuple = LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self.buckets = tuple(buckets)
+        self._lock = threading.Lock()
+        self._series = {}
+
+    def observe(self, value: float, **labels):
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += value
+
+    def count(self, **labels) -> int:
+        series = self._series.get(tuple(str(labels[name]) for name in self.labelnames))
+        return sum(series[0]) if series else 0
+
+    def snapshot(self) -> list:
+        with self._lock:
+            return [[list(key), list(counts), total]
+                    for key, (counts, total) in self._series.items()]
+
+    def collect(self, snapshots: Optional[list] = None) -> list:
+        lines = [f"# HELP {self.name} {self.documentation}",
+                 f"# TYPE {self.name} histogram"]
+        if snapshots is None:
+            snapshots = [self.snapshot()]
+        series = {}
+        for snapshot in snapshots:
+            for key, counts, total in snapshot:
+                merged = series.setdefault(tuple(key), [[0] * len(counts), 0.0])
+                merged[0] = [a + b for a, b in zip(merged[0], counts)]
+                merged[1] += total
+        items = sorted(series.items())
+        for key, (counts, total) in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (math.inf,), counts):
+                cumulative += count
+                le = f'le="{_format_value(bound)}"'
+                lines.append(f"{self.name}_bucket"
+                             f"{_format_labels(self.labelnames, key, le)} {cumulative}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+    def clear(self):
+        with self._lock:
+            self._series.clear()
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+        self._collectors = {}
+        self._lock = threading.Lock()
+        self.directory = None
+        self.interval = 1.0
+        self._pid = os.getpid()
+        self._writer_pid = None
+        self._written = None
+
+    def configure(self, directory=None, interval: float = 1.0):
+        self.directory = None if directory is None else Path(directory)
+        self.interval = interval
+        self._pid = os.getpid()
+        self._written = None
+        if self.directory is None:
+            return
+        self.directory.mkdir(parents=True, exist_ok=True)
+        for path in self.directory.glob("*.json"):
+            if path.stem.isdigit() and not _alive(int(path.stem)):
+                path.unlink(missing_ok=True)
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def set_collector(self, name: str, collector: Callable[[], list]):
+        self._collectors[name] = collector
+
+    def _collected(self) -> list:
+        return [line for collector in self._collectors.values()
+                for line in collector()]
+
+    def _snapshot(self, collectors: list) -> bytes:
+        return orjson.dumps({
+            "metrics": {metric.name: metric.snapshot() for metric in self._metrics},
+            "collectors": collectors,
+        })
+
+    def _write_file(self, pid: int, data: bytes):
+        partial = self.directory / f"{pid}.{os.getpid()}.tmp"
+        partial.write_bytes(data)
+        os.replace(partial, self.directory / f"{pid}.json")
+
+    def write(self):
+        data = self._snapshot(self._collected())
+        with self._lock:
+            if data != self._written:
+                self._write_file(os.getpid(), data)
+                self._written = data
+
+    def start_writer(self):
+        with self._lock:
+            if self.directory is None or self._writer_pid == os.getpid():
+                return
+            forked = self._pid != os.getpid()
+            inherited = forked and self._writer_pid is None
+            self._writer_pid = os.getpid()
+            self._written = None
+        if inherited:
+            self._write_file(self._pid, self._snapshot([]))
+        if forked:
+            self.clear()
+        threading.Thread(target=self._run_writer, daemon=True).start()
+
+    def _run_writer(self):
+        while True:
+            time.sleep(self.interval)
+            if self.directory is None:
+                self._writer_pid = None
+                return
+            try:
+                self.write()
+            except OSError:
+                continue
+
+    def _read_processes(self) -> dict:
+        processes = {}
+        for path in self.directory.glob("*.json"):
+            if not path.stem.isdigit():
+                continue
+            try:
+                processes[int(path.stem)] = orjson.loads(path.read_bytes())
+            except (OSError, orjson.JSONDecodeError):
+                continue
+        return dict(sorted(processes.items()))
+
+    def render(self) -> str:
+        lines = []
+        if self.directory is None:
+            for metric in self._metrics:
+                lines.extend(metric.collect())
+            lines.extend(self._collected())
+            return "\n".join(lines) + "\n"
+
+        self.write()
+        processes = self._read_processes()
+        for metric in self._metrics:
+            lines.extend(metric.collect([process["metrics"].get(metric.name, [])
+                                         for process in processes.values()]))
+        lines.extend(_process_families({
+            pid: process["collectors"] for pid, process in processes.items()
+            if _alive(pid)}))
+        return "\n".join(lines) + "\n"
+
+    def clear(self):
+        for metric in self._metrics:
+            metric.clear()
+
+
+registry = Registry()
+
+callback_latency = registry.register(Histogram(
+    "htv_callback_duration_seconds", "Latency of Dash callbacks", ("callback",)))
+callback_errors = registry.register(Counter(
+    "htv_callback_errors_total", "Dash callbacks that raised", ("callback",)))
+callback_payload = registry.register(Histogram(
+    "htv_callback_payload_bytes", "Size of the payload returned by Dash callbacks",
+    ("callback",), SIZE_BUCKETS))
+loader_stage = registry.register(Histogram(
+    "htv_loader_stage_duration_seconds", "Time spent per expression loader stage",
+    ("stage",)))
+
+
+def instrumented(name: str):
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            except Exception:
+                callback_errors.inc(callback=name)
+                raise
+            finally:
+                callback_latency.observe(time.perf_counter() - start, callback=name)
+        return wrapper
+    return decorator
+
+
+def observe_payload(name: str, nbytes: int):
+    callback_payload.observe(nbytes, callback=name)
+
+
+@contextmanager
+def timed_stage(stage: str):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        loader_stage.observe(time.perf_counter() - start, stage=stage)
+
+
+class StageTimer:
+    def __init__(self):
+        self.durations = {}
+
+    @contextmanager
+    def stage(self, stage: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.durations[stage] = (self.durations.get(stage, 0.0)
+                                     + time.perf_counter() - start)
+
+    def observe(self):
+        for stage, seconds in self.durations.items():
+            loader_stage.observe(seconds, stage=stage)
+
+
+def _gauge_lines(name: str, documentation: str, samples: list,
+                 metric_type: str = "gauge") -> list:
+    lines = [f"# HELP {name} {documentation}", f"# TYPE {name} {metric_type}"]
+    for labels, value in samples:
+        lines.append(f"{name}{labels} {_format_value(value)}")
+    return lines
+
+
+def cache_collector(caches: dict) -> Callable[[], list]:
+    def collect() -> list:
+        stats = {name: cache.stats() for name, cache in caches.items()}
+        lines = []
+        for key, metric_type, documentation in (
+                ("hits", "counter", "Cache lookups that found an entry"),
+                ("misses", "counter", "Cache lookups that found no entry"),
+                ("entries", "gauge", "Entries held by the cache"),
+                ("bytes", "gauge", "Bytes held by the cache")):
+            suffix = "_total" if metric_type == "counter" else ""
+            lines.extend(_gauge_lines(
+                f"htv_cache_{key}{suffix}", documentation,
+                [(f'{{cache="{name}"}}', cache_stats[key])
+                 for name, cache_stats in stats.items()], metric_type))
+        return lines
+    return collect
+
+
+def renderer_collector(pool) -> Callable[[], list]:
+    def collect() -> list:
+        stats = pool.stats()
+        lines = []
+        for key in ("in_flight", "queued"):
+            lines.extend(_gauge_lines(f"htv_renderer_{key}",
+                                      f"Exports {key.replace('_', ' ')}",
+                                      [("", stats[key])]))
+        for key in ("rendered", "rejected", "errors"):
+            lines.extend(_gauge_lines(f"htv_renderer_{key}_total",
+                                      f"Exports {key}", [("", stats[key])], "counter"))
+        return lines
+    return collect
+
+
+def register_metrics(server, caches: dict, pool=None, directory=None):
+    registry.set_collector("caches", cache_collector(caches))
+    if pool is not None:
+        registry.set_collector("renderer", renderer_collector(pool))
+    registry.configure(directory)
+    if directory is not None:
+        server.before_request(registry.start_writer)
+
+    @server.route("/metrics")
+    def metrics():
+        return Response(registry.render(), content_type=CONTENT_TYPE)
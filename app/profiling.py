@@ -0,0 +1,239 @@
+import cProfile
+import hmac
+import html
+import io
+import logging
+import marshal
+import os
+import pstats
+import re
+import secrets
+import sys
+import threading
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Optional
+
+import orjson
+from flask import Response, abort, g, request, send_from_directory
+
+PROFILE_HEADER = "X-HTV-Profile"
+PROFILE_PARAM = "profile"
+PROFILE_COOKIE = "htv_profile"
+SAMPLE_INTERVAL = 0.001
+
+
+def _request_label(req) -> str:
+    payload = req.get_json(silent=True) if req.is_json else None
+    if not isinstance(payload, dict) or "output" not in payload:
+        return req.path
+    values = [str(item.get("value")) for item in payload.get("inputs", [])
+              + payload.get("state", []) if isinstance(item, dict)
+              and isinstance(item.get("value"), (str, int, float))]
+    return " ".join([payload["output"].strip("."), *values])
+
+
+class ThreadSampler:
+    def __init__(self, thread_id: int, interval: float = SAMPLE_INTERVAL):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stats = {}
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._last = 0.0
+
+    def enable(self):
+        self._last = time.perf_counter()
+        self._thread.start()
+
+    def disable(self):
+        self._stop.set()
+        self._thread.join()
+        self._sample()
+
+    def dump_stats(self, path):
+        with open(path, "wb") as output:
+            marshal.dump(self.stats, output)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self._sample()
+
+    def _sample(self):
+        now = time.perf_counter()
+        elapsed, self._last = now - self._last, now
+        frame = sys._current_frames().get(self.thread_id)
+        stack = []
+        while frame is not None:
+            code = frame.f_code
+            stack.append((code.co_filename, code.co_firstlineno, code.co_name))
+            frame = frame.f_back
+        seen = set()
+        for depth, function in enumerate(stack):
+            calls, _, own, total, callers = self.stats.get(function, (0, 0, 0, 0, {}))
+            if depth == 0:
+                own += elapsed
+            if function not in seen:
+                seen.add(function)
+                calls += 1
+                total += elapsed
+            if depth + 1 < len(stack):
+                caller = stack[depth + 1]
+                edge = callers.get(caller, (0, 0, 0.0, 0.0))
+                callers[caller] = (edge[0] + 1, edge[1] + 1,
+                                   edge[2] + (elapsed if depth == 0 else 0.0),
+                                   edge[3] + elapsed)
+            self.stats[function] = (calls, calls, own, total, callers)
+
+
+class RequestProfiler:
+    def __init__(self, directory, keep: int = 100, token: Optional[str] = None,
+                 sampling: Optional[bool] = None):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.keep = keep
+        self.token = token or secrets.token_urlsafe(16)
+        self.sampling = sys.version_info >= (3, 12) if sampling is None else sampling
+        self._lock = threading.Lock()
+        self._counter = 0
+        if token is None:
+            logging.warning("Profiling token: %s", self.token)
+
+    def authorized(self, value: Optional[str]) -> bool:
+        return value is not None and hmac.compare_digest(value.encode(),
+                                                         self.token.encode())
+
+    def requested(self, req) -> bool:
+        if PROFILE_HEADER in req.headers:
+            return self.authorized(req.headers[PROFILE_HEADER])
+        if PROFILE_PARAM in req.args:
+            return self.authorized(req.args[PROFILE_PARAM])
+        return self.authorized(req.cookies.get(PROFILE_COOKIE))
+
+    def start(self) -> Optional[tuple]:
+        if not self._lock.acquire(blocking=False):
+            return None
+        if self.sampling:
+            profile = ThreadSampler(threading.get_ident())
+        else:
+            profile = cProfile.Profile()
+        start = time.perf_counter()
+        profile.enable()
+        return profile, start
+
+    def finish(self, session: tuple, label: str, path: str) -> dict:
+        profile, start = session
+        try:
+            profile.disable()
+            duration = time.perf_counter() - start
+            self._counter += 1
+            name = self._profile_name(label)
+            profile.dump_stats(self.directory / f"{name}.prof")
+        finally:
+            self._lock.release()
+
+        record = {
+            "name": name,
+            "label": label,
+            "path": path,
+            "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "duration_ms": duration * 1000,
+        }
+        (self.directory / f"{name}.json").write_bytes(orjson.dumps(record))
+        self._prune()
+        return record
+
+    def _profile_name(self, label: str) -> str:
+        slug = re.sub(r"[^A-Za-z0-9]+", "-", label).strip("-")[:60] or "request"
+        stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S")
+        return f"{stamp}_{os.getpid()}_{self._counter:05d}_{slug}"
+
+    def _prune(self):
+        records = sorted(self.directory.glob("*.json"), key=os.path.getmtime)
+        for stale in records[:max(0, len(records) - self.keep)]:
+            stale.unlink(missing_ok=True)
+            stale.with_suffix(".prof").unlink(missing_ok=True)
+
+    def records(self) -> list:
+        records = []
+        for path in self.directory.glob("*.json"):
+            try:
+                records.append(orjson.loads(path.read_bytes()))
+            except (OSError, orjson.JSONDecodeError):
+                continue
+        return records
+
+    def report(self, name: str, limit: int = 40) -> str:
+        stream = io.StringIO()
+        stats = pstats.Stats(str(self.directory / f"{name}.prof"), stream=stream)
+        stats.sort_stats("cumulative").print_stats(limit)
+        return stream.getvalue()
+
+
+def _summary_page(records: list, limit: int, url_prefix: str = "/") -> str:
+    rows = "".join(
+        f"<tr><td>{record['duration_ms']:.1f}</td>"
+        f"<td>{html.escape(record['label'])}</td>"
+        f"<td>{html.escape(record['timestamp'])}</td>"
+        f"<td><a href='{url_prefix}profile/{record['name']}'>report</a> "
+        f"<a href='{url_prefix}profile/{record['name']}?format=pstats'>pstats</a>"
+        "</td></tr>"
+        for record in sorted(records, key=lambda r: r["duration_ms"],
+                             reverse=True)[:limit]
+    )
+    return ("<html><head><title>Slowest requests</title></head><body>"
+            "<h1>Slowest profiled requests</h1>"
+            "<table><tr><th>ms</th><th>request</th><th>time</th><th></th></tr>"
+            f"{rows}</table></body></html>")
+
+
+def register_profiler(server, directory, keep: int = 100,
+                      token: Optional[str] = None, prefix: str = "/",
+                      url_prefix: Optional[str] = None) -> RequestProfiler:
+    profiler = RequestProfiler(directory, keep, token)
+    url_prefix = prefix if url_prefix is None else url_prefix
+
+    @server.before_request
+    def start_profile():
+        if (not request.path.startswith(f"{prefix}profile")
+                and profiler.requested(request)):
+            g.htv_profile = profiler.start()
+
+    @server.after_request
+    def toggle_profile_cookie(response):
+        toggle = request.args.get(PROFILE_PARAM)
+        if toggle is not None:
+            if profiler.authorized(toggle):
+                response.set_cookie(PROFILE_COOKIE, toggle, httponly=True,
+                                    samesite="Strict")
+            else:
+                response.delete_cookie(PROFILE_COOKIE)
+        return response
+
+    @server.teardown_request
+    def finish_profile(exc):
+        session = g.pop("htv_profile", None)
+        if session is not None:
+            profiler.finish(session, _request_label(request), request.path)
+
+    @server.route(f"{prefix}profile")
+    def profile_summary():
+        if not profiler.requested(request):
+            abort(403)
+        limit = request.args.get("limit", 50, type=int)
+        return Response(_summary_page(profiler.records(), limit, url_prefix),
+                        mimetype="text/html")
+
+    @server.route(f"{prefix}profile/<name>")
+    def profile_report(name):
+        if not profiler.requested(request):
+            abort(403)
+        if not (profiler.directory / f"{name}.prof").is_file():
+            abort(404)
+        if request.args.get("format") == "pstats":
+            return send_from_directory(profiler.directory.resolve(), f"{name}.prof",
+                                       as_attachment=True)
+        return Response(profiler.report(name), mimetype="text/plain")
+
+    return profiler
@@ -0,0 +1,112 @@
+import hashlib
+import os
+from pathlib import Path
+from typing import Optional
+
+import pandas as pd
+
+CACHE_VERSION = 2
+CACHE_KEY = "expression_data"
+REPLICATES_KEY = "replicates"
+COUNTS_KEY = "sample_counts"
+SAMPLE_QC_KEY = "sample_qc"
+
+
+def quant_fingerprint(quant_path, annotation_path=None, variant: str = "") -> str:
+    quant_path = Path(quant_path).resolve()
+    scope = hashlib.sha256(
+        f"{quant_path}\0{annotation_path}\0{variant}".encode()).hexdigest()
+    digest = hashlib.sha256(f"{CACHE_VERSION}\0{scope}\0".encode())
+    for quant_file in sorted(quant_path.glob("*/quant.sf")):
+        stat = quant_file.stat()
+        digest.update(f"{quant_file}\0{stat.st_size}\0{stat.st_mtime_ns}\n".encode())
+    return f"{scope[:16]}-{digest.hexdigest()}"
+
+
+def fingerprint_name(prefix: str, fingerprint: str, suffix: str = "") -> str:
+    scope, _, content = fingerprint.partition("-")
+    return f"{prefix}_{scope[:16]}_{content[:32]}{suffix}"
+
+
+def remove_stale_files(directory, prefix: str, fingerprint: str, keep,
+                       pattern: str = "*") -> None:
+    scope = fingerprint.partition("-")[0][:16]
+    for stale in Path(directory).glob(f"{prefix}_{scope}_{pattern}"):
+        if stale not in keep:
+            stale.unlink(missing_ok=True)
+
+
+def quant_sample_state(quant_path) -> dict:
+    state = {}
+    for quant_file in Path(quant_path).glob("*/quant.sf"):
+        stat = quant_file.stat()
+        state[quant_file.parent.name] = (stat.st_size, stat.st_mtime_ns)
+    return state
+
+
+def _cache_file(cache_dir, fingerprint: str) -> Path:
+    return Path(cache_dir) / fingerprint_name("expression", fingerprint, ".h5")
+
+
+def _read_cached(path: Path, key: str):
+    if not path.exists():
+        return None
+    try:
+        return pd.read_hdf(path, key)
+    except (OSError, KeyError, ValueError):
+        return None
+
+
+def load_cached_expression(cache_dir, fingerprint: str) -> Optional[pd.DataFrame]:
+    return _read_cached(_cache_file(cache_dir, fingerprint), CACHE_KEY)
+
+
+def load_cached_replicates(cache_dir, fingerprint: str) -> Optional[pd.DataFrame]:
+    return _read_cached(_cache_file(cache_dir, fingerprint), REPLICATES_KEY)
+
+
+def load_cached_counts(cache_dir, fingerprint: str) -> Optional[pd.Series]:
+    return _read_cached(_cache_file(cache_dir, fingerprint), COUNTS_KEY)
+
+
+def store_cached_expression(cache_dir, fingerprint: str, df: pd.DataFrame,
+                            replicates: Optional[pd.DataFrame] = None,
+                            counts: Optional[pd.Series] = None) -> Path:
+    cache_dir = Path(cache_dir)
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    path = _cache_file(cache_dir, fingerprint)
+
+    tmp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    df.to_hdf(tmp_path, key=CACHE_KEY, mode="w", format="fixed",
+              complevel=1, complib="blosc:lz4")
+    if replicates is not None:
+        replicates.to_hdf(tmp_path, key=REPLICATES_KEY, mode="a", format="fixed",
+                          complevel=1, complib="blosc:lz4")
+    if counts is not None:
+        counts.to_hdf(tmp_path, key=COUNTS_KEY, mode="a", format="fixed")
+    os.replace(tmp_path, path)
+
+    remove_stale_files(cache_dir, "expression", fingerprint, (path,), "*.h5")
+    return path
+
+
+def _sample_qc_file(directory, fingerprint: str) -> Path:
+    return Path(directory) / fingerprint_name("sample_qc", fingerprint, ".h5")
+
+
+def load_cached_sample_qc(directory, fingerprint: str) -> Optional[pd.DataFrame]:
+    return _read_cached(_sample_qc_file(directory, fingerprint), SAMPLE_QC_KEY)
+
+
+def store_cached_sample_qc(directory, fingerprint: str, df: pd.DataFrame) -> Path:
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+    path = _sample_qc_file(directory, fingerprint)
+
+    tmp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    df.to_hdf(tmp_path, key=SAMPLE_QC_KEY, mode="w", format="fixed",
+              complevel=1, complib="blosc:lz4")
+    os.replace(tmp_path, path)
+
+    remove_stale_files(directory, "sample_qc", fingerprint, (path,), "*.h5")
+    return path
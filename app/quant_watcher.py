@@ -0,0 +1,58 @@
+import logging
+import threading
+from typing import Optional
+
+from watchdog.events import FileSystemEventHandler
+from watchdog.observers import Observer
+
+IGNORED_EVENTS = ("opened", "closed_no_write")
+
+
+class QuantWatcher(FileSystemEventHandler):
+    def __init__(self, data_manager, debounce: float = 5.0):
+        self._data_manager = data_manager
+        self._debounce = debounce
+        self._lock = threading.Lock()
+        self._timer: Optional[threading.Timer] = None
+        self._observer: Optional[Observer] = None
+
+    def on_any_event(self, event):
+        if event.event_type not in IGNORED_EVENTS:
+            self.schedule_reload()
+
+    def schedule_reload(self):
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+            self._timer = threading.Timer(self._debounce, self.reload)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def reload(self) -> dict:
+        try:
+            changes = self._data_manager.reload_changed_samples()
+        except Exception:
+            logging.exception("Reloading quantification data failed")
+            return {}
+        if changes:
+            logging.info("Reloaded quantification data: %s", ", ".join(
+                f"{len(names)} {kind}" for kind, names in changes.items()))
+        return changes
+
+    def start(self):
+        if self._observer is not None:
+            return
+        self._observer = Observer()
+        self._observer.daemon = True
+        self._observer.schedule(self, self._data_manager.quant_path, recursive=True)
+        self._observer.start()
+
+    def stop(self):
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+        if self._observer is not None:
+            self._observer.stop()
+            self._observer.join()
+            self._observer = None
@@ -0,0 +1,157 @@
+import asyncio
+import threading
+import time
+from collections import deque
+from typing import Optional
+
+import numpy as np
+import plotly.io as pio
+
+WARMUP_FIGURE = {"data": [{"type": "scatter", "x": [0], "y": [0]}], "layout": {}}
+
+
+class RendererQueueFull(RuntimeError):
+    pass
+
+
+class RendererPool:
+    def __init__(self, size: int = 2, max_queue: int = 8, timeout: float = 90):
+        self.size = size
+        self.max_queue = max_queue
+        self.timeout = timeout
+        self._slots = threading.BoundedSemaphore(size + max_queue)
+        self._lock = threading.Lock()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._kaleido = None
+        self._pending = 0
+        self._rendered = 0
+        self._rejected = 0
+        self._errors = 0
+        self._latencies = deque(maxlen=512)
+
+    @property
+    def running(self) -> bool:
+        return self._kaleido is not None
+
+    def configure(self, size: Optional[int] = None, max_queue: Optional[int] = None,
+                  timeout: Optional[float] = None):
+        if self.running:
+            raise RuntimeError("Cannot reconfigure a running renderer pool.")
+        if size is not None:
+            self.size = size
+        if max_queue is not None:
+            self.max_queue = max_queue
+        if timeout is not None:
+            self.timeout = timeout
+        self._slots = threading.BoundedSemaphore(self.size + self.max_queue)
+
+    def start(self, warm: bool = True):
+        if self.running:
+            return
+        import kaleido
+
+        async def open_renderer():
+            renderer = kaleido.Kaleido(n=self.size, timeout=self.timeout)
+            await renderer.open()
+            return renderer
+
+        loop = asyncio.new_event_loop()
+        thread = threading.Thread(target=loop.run_forever, name="renderer-pool",
+                                  daemon=True)
+        thread.start()
+        try:
+            renderer = asyncio.run_coroutine_threadsafe(open_renderer(), loop).result()
+        except BaseException:
+            loop.call_soon_threadsafe(loop.stop)
+            thread.join()
+            loop.close()
+            raise
+        self._loop, self._thread, self._kaleido = loop, thread, renderer
+
+        if warm:
+            warmups = [self._submit(WARMUP_FIGURE, dict(format="svg", width=10,
+                                                        height=10))
+                       for _ in range(self.size)]
+            for future in warmups:
+                future.result()
+
+    def stop(self):
+        if not self.running:
+            return
+        asyncio.run_coroutine_threadsafe(self._kaleido.close(), self._loop).result()
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._loop.close()
+        self._loop, self._thread, self._kaleido = None, None, None
+
+    def render(self, fig, format: str, width: int, height: int,
+               scale: float = 1, wait: Optional[float] = None) -> bytes:
+        if wait is None:
+            acquired = self._slots.acquire(blocking=False)
+        else:
+            acquired = self._slots.acquire(timeout=wait)
+        if not acquired:
+            with self._lock:
+                self._rejected += 1
+            raise RendererQueueFull(
+                f"Renderer queue is full ({self.size + self.max_queue} requests)."
+            )
+
+        with self._lock:
+            self._pending += 1
+        start = time.perf_counter()
+        try:
+            if self._kaleido is None:
+                image = pio.to_image(fig, format=format, width=width, height=height,
+                                     scale=scale)
+            else:
+                fig_dict = fig.to_dict() if hasattr(fig, "to_dict") else fig
+                image = self._submit(fig_dict, dict(format=format, width=width,
+                                                    height=height,
+                                                    scale=scale)).result()
+        except Exception:
+            with self._lock:
+                self._errors += 1
+            raise
+        else:
+            with self._lock:
+                self._rendered += 1
+            return image
+        finally:
+            elapsed = time.perf_counter() - start
+            with self._lock:
+                self._pending -= 1
+                self._latencies.append(elapsed)
+            self._slots.release()
+
+    def stats(self) -> dict:
+        with self._lock:
+            latencies = np.array(self._latencies) * 1000
+            pending = self._pending
+            stats = {
+                "running": self.running,
+                "size": self.size,
+                "max_queue": self.max_queue,
+                "in_flight": min(pending, self.size),
+                "queued": max(0, pending - self.size),
+                "rendered": self._rendered,
+                "rejected": self._rejected,
+                "errors": self._errors,
+            }
+        if len(latencies):
+            stats["latency_ms"] = {
+                "mean": float(latencies.mean()),
+                "p50": float(np.percentile(latencies, 50)),
+                "p95": float(np.percentile(latencies, 95)),
+                "max": float(latencies.max()),
+            }
+        return stats
+
+    def _submit(self, fig_dict: dict, opts: dict):
+        return asyncio.run_coroutine_threadsafe(
+            self._kaleido.calc_fig(fig_dict, opts=opts), self._loop
+        )
+
+
+renderer_pool = RendererPool()
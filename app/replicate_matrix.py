@@ -0,0 +1,82 @@
+from functools import cached_property
+
+import numpy as np
+import pandas as pd
+
+
+class ReplicateMatrix:
+    def __init__(self, rows: pd.Index, samples: pd.Index, values: np.ndarray):
+        if values.shape != (len(rows), len(samples)):
+            raise ValueError(f"Expected values of shape {(len(rows), len(samples))}, "
+                             f"got {values.shape}")
+        self.rows = rows
+        self.samples = samples
+        self.values = values
+
+    @property
+    def nbytes(self) -> int:
+        return self.values.nbytes
+
+    @classmethod
+    def from_columns(cls, rows: pd.Index, samples: list, isoforms: list, genes: list,
+                     n_isoforms: int, gene_order: np.ndarray,
+                     dtype=np.float32) -> 'ReplicateMatrix':
+        values = np.empty((len(rows), len(samples)), dtype=dtype)
+        values[:n_isoforms] = np.nan
+        values[n_isoforms:] = 0
+        gene_rows = values[n_isoforms:]
+        for j, (isoform_values, gene_values) in enumerate(zip(isoforms, genes)):
+            values[:len(isoform_values), j] = isoform_values
+            available = gene_order < len(gene_values)
+            gene_rows[available, j] = gene_values[gene_order[available]]
+        return cls(rows, pd.Index(samples, dtype=object), values)
+
+    @classmethod
+    def from_replicates(cls, replicates: pd.DataFrame, rows: pd.Index,
+                        dtype=np.float32) -> 'ReplicateMatrix':
+        genes = replicates.index.str.split(".", n=1).str[0]
+        gene_sums = replicates.groupby(genes, sort=False).sum(min_count=0)
+        frame = pd.concat([replicates, gene_sums]).reindex(rows)
+        return cls(rows, pd.Index(replicates.columns, dtype=object),
+                   frame.to_numpy(dtype=dtype))
+
+    @classmethod
+    def from_frame(cls, frame: pd.DataFrame, dtype=np.float32) -> 'ReplicateMatrix':
+        return cls(pd.Index(frame.index, dtype=object),
+                   pd.Index(frame.columns, dtype=object), frame.to_numpy(dtype=dtype))
+
+    @cached_property
+    def frame(self) -> pd.DataFrame:
+        return pd.DataFrame(self.values, index=self.rows, columns=self.samples,
+                            copy=False)
+
+    @cached_property
+    def groups(self) -> pd.Index:
+        return pd.Index(self.samples.str.rsplit("_", n=1).str[0], dtype=object)
+
+    @cached_property
+    def spread(self) -> np.ndarray:
+        codes, uniques = pd.factorize(self.groups)
+        order = np.argsort(codes, kind="stable")
+        sizes = np.bincount(codes, minlength=len(uniques))
+        starts = np.cumsum(sizes) - sizes
+        rank = np.empty(len(codes), dtype=np.intp)
+        rank[order] = np.arange(len(codes)) - starts[codes[order]]
+        return (rank + 0.5) / sizes[codes] - 0.5
+
+    @cached_property
+    def _isoform_rows(self) -> tuple:
+        isoforms = self.rows.str.contains(".", regex=False)
+        return np.flatnonzero(isoforms), self.rows[isoforms]
+
+    def block(self, labels: list) -> np.ndarray:
+        positions = self.rows.get_indexer(labels)
+        if (positions < 0).any():
+            missing = [label for label, pos in zip(labels, positions) if pos < 0]
+            raise KeyError(f"Unknown rows: {missing}")
+        return self.values[positions]
+
+    def isoform_tpm(self, sample: str) -> pd.Series:
+        positions, labels = self._isoform_rows
+        return pd.Series(self.values[positions, self.samples.get_loc(sample)],
+                         index=labels, name=sample)
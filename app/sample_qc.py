@@ -0,0 +1,196 @@
+import threading
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+N_COMPONENTS = 10
+OVERSAMPLING = 10
+POWER_ITERATIONS = 4
+
+
+def randomized_eigh(matrix: np.ndarray, k: int, oversampling: int = OVERSAMPLING,
+                    iterations: int = POWER_ITERATIONS, seed: int = 0) -> tuple:
+    n = len(matrix)
+    k = min(k, n)
+    if n <= k + oversampling:
+        eigenvalues, eigenvectors = np.linalg.eigh(matrix)
+        order = np.argsort(eigenvalues)[::-1][:k]
+        return eigenvalues[order], eigenvectors[:, order]
+
+    rng = np.random.default_rng(seed)
+    basis, _ = np.linalg.qr(matrix @ rng.standard_normal((n, k + oversampling)))
+    for _ in range(iterations):
+        basis, _ = np.linalg.qr(matrix @ basis)
+    eigenvalues, eigenvectors = np.linalg.eigh(basis.T @ matrix @ basis)
+    order = np.argsort(eigenvalues)[::-1][:k]
+    return eigenvalues[order], basis @ eigenvectors[:, order]
+
+
+class SampleQC:
+    def __init__(self, components: int = N_COMPONENTS):
+        self.components = components
+        self.version = 0
+        self._lock = threading.RLock()
+        self._samples = {}
+        self._genes = {}
+        self._values = np.zeros((0, 0), dtype=np.float32)
+        self._sums = np.zeros(0)
+        self._gram = np.zeros((0, 0))
+        self._pending = set()
+        self._result: Optional[dict] = None
+
+        self._index = None
+        self._keep = None
+        self._codes = None
+
+    @classmethod
+    def from_frame(cls, frame: pd.DataFrame,
+                   components: int = N_COMPONENTS) -> "SampleQC":
+        sample_qc = cls(components)
+        sample_qc._samples = {name: row for row, name in enumerate(frame.index)}
+        sample_qc._genes = {gene: code for code, gene in enumerate(frame.columns)}
+        sample_qc._values = frame.to_numpy(dtype=np.float32, copy=True)
+        sample_qc._sums = sample_qc._values.sum(axis=1, dtype=np.float64)
+        sample_qc._pending = set(range(len(frame)))
+        return sample_qc
+
+    def __len__(self) -> int:
+        return len(self._samples)
+
+    @property
+    def samples(self) -> list:
+        return list(self._samples)
+
+    @property
+    def n_genes(self) -> int:
+        return len(self._genes)
+
+    @property
+    def frame(self) -> pd.DataFrame:
+        with self._lock:
+            return pd.DataFrame(self._values[:len(self._samples), :len(self._genes)],
+                                index=pd.Index(list(self._samples), dtype=object),
+                                columns=pd.Index(list(self._genes), dtype=object))
+
+    def add_sample(self, name: str, tpm: pd.Series):
+        with self._lock:
+            if self._index is None or not tpm.index.equals(self._index):
+                self._align(tpm.index)
+            values = tpm.to_numpy(dtype=np.float64)[self._keep]
+            observed = ~np.isnan(values)
+            self._set_row(name, np.log1p(np.bincount(self._codes[observed],
+                                                     weights=values[observed],
+                                                     minlength=len(self._genes))))
+
+    def _set_row(self, name: str, genes: np.ndarray):
+        row = self._samples.get(name)
+        if row is None:
+            row = self._samples[name] = len(self._samples)
+        self._reserve(len(self._samples), len(self._genes))
+        self._values[row, :len(genes)] = genes
+        self._values[row, len(genes):] = 0
+        self._sums[row] = genes.sum()
+        self._pending.add(row)
+        self._changed()
+
+    def remove_samples(self, names: list):
+        with self._lock:
+            rows = [self._samples[name] for name in names if name in self._samples]
+            if not rows:
+                return
+            keep = np.setdiff1d(np.arange(len(self._samples)), rows)
+            remap = {old: new for new, old in enumerate(keep)}
+            known = keep[keep < len(self._gram)]
+            self._values = np.ascontiguousarray(self._values[keep])
+            self._sums = self._sums[keep]
+            self._gram = self._gram[np.ix_(known, known)]
+            self._pending = {remap[row] for row in self._pending if row in remap}
+            self._samples = {name: remap[row] for name, row in self._samples.items()
+                             if row in remap}
+            self._changed()
+
+    def _align(self, index: pd.Index):
+        keep = np.asarray(~index.str.contains("-") & index.str.startswith("A"))
+        codes = np.empty(keep.sum(), dtype=np.intp)
+        for i, label in enumerate(index[keep]):
+            gene = label.split(".", 1)[0]
+            codes[i] = self._genes.setdefault(gene, len(self._genes))
+        self._index = index
+        self._keep = keep
+        self._codes = codes
+
+    def _reserve(self, n_rows: int, n_genes: int):
+        rows, genes = self._values.shape
+        if n_rows <= rows and n_genes <= genes:
+            return
+        values = np.zeros((max(n_rows, 2 * rows), max(n_genes, genes)),
+                          dtype=np.float32)
+        values[:rows, :genes] = self._values
+        self._values = values
+        sums = np.zeros(len(values))
+        sums[:len(self._sums)] = self._sums
+        self._sums = sums
+
+    def _changed(self):
+        self.version += 1
+        self._result = None
+
+    def _update_gram(self):
+        n = len(self._samples)
+        if not self._pending and len(self._gram) == n:
+            return
+        values = self._values[:n]
+        gram = np.zeros((n, n))
+        known = min(len(self._gram), n)
+        gram[:known, :known] = self._gram[:known, :known]
+        rows = np.array(sorted(self._pending | set(range(known, n))), dtype=np.intp)
+        if len(rows):
+            block = (values[rows] @ values.T).astype(np.float64)
+            gram[rows] = block
+            gram[:, rows] = block.T
+        self._gram = gram
+        self._pending = set()
+
+    def correlation(self) -> np.ndarray:
+        with self._lock:
+            self._update_gram()
+            n_genes = max(1, len(self._genes))
+            sums = self._sums[:len(self._samples)]
+            covariance = self._gram / n_genes - np.outer(sums, sums) / n_genes ** 2
+            scale = np.sqrt(np.clip(np.diag(covariance), 0, None))
+            with np.errstate(invalid="ignore", divide="ignore"):
+                correlation = covariance / np.outer(scale, scale)
+            return np.clip(correlation, -1, 1)
+
+    def pca(self) -> tuple:
+        with self._lock:
+            self._update_gram()
+            n = len(self._samples)
+            if n < 2:
+                return np.zeros((n, 0)), np.zeros(0)
+            row_means = self._gram.mean(axis=1, keepdims=True)
+            centered = (self._gram - row_means - row_means.T + self._gram.mean())
+            eigenvalues, eigenvectors = randomized_eigh(
+                centered, min(self.components, n - 1))
+            eigenvalues = np.clip(eigenvalues, 0, None)
+            largest = np.abs(eigenvectors).argmax(axis=0)
+            signs = np.sign(eigenvectors[largest, np.arange(eigenvectors.shape[1])])
+            eigenvectors = eigenvectors * np.where(signs == 0, 1, signs)
+            total = np.trace(centered)
+            scores = eigenvectors * np.sqrt(eigenvalues)
+            explained = eigenvalues / total if total > 0 else np.zeros_like(eigenvalues)
+            return scores, explained
+
+    def result(self) -> dict:
+        with self._lock:
+            if self._result is None:
+                scores, explained = self.pca()
+                self._result = {
+                    "samples": self.samples,
+                    "correlation": self.correlation(),
+                    "scores": scores,
+                    "explained_variance": explained,
+                    "version": self.version,
+                }
+            return self._result
@@ -0,0 +1,79 @@
+import os
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+import orjson
+import pandas as pd
+
+from app.expression_matrix import ExpressionMatrix
+from app.quant_cache import fingerprint_name, remove_stale_files
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+STORE_VERSION = 2
+
+
+def _store_files(store_dir, fingerprint: str) -> tuple:
+    stem = fingerprint_name("matrix", fingerprint)
+    return Path(store_dir) / f"{stem}.npy", Path(store_dir) / f"{stem}.json"
+
+
+def load_shared_matrix(store_dir, fingerprint: str) -> Optional[ExpressionMatrix]:
+    values_path, index_path = _store_files(store_dir, fingerprint)
+    if not index_path.exists() or not values_path.exists():
+        return None
+    try:
+        index = orjson.loads(index_path.read_bytes())
+        if (index["version"] != STORE_VERSION or index["fingerprint"] != fingerprint
+                or index["counts"] is None):
+            return None
+        values = np.load(values_path, mmap_mode="r")
+        return ExpressionMatrix(pd.Index(index["rows"], dtype=object),
+                                pd.Index(index["groups"], dtype=object), values,
+                                np.array(index["counts"]))
+    except (OSError, KeyError, ValueError):
+        return None
+
+
+def store_shared_matrix(store_dir, fingerprint: str, matrix: ExpressionMatrix) -> Path:
+    store_dir = Path(store_dir)
+    store_dir.mkdir(parents=True, exist_ok=True)
+    values_path, index_path = _store_files(store_dir, fingerprint)
+    suffix = f".{os.getpid()}.tmp"
+
+    tmp_values = values_path.with_name(values_path.name + suffix)
+    with open(tmp_values, "wb") as f:
+        np.save(f, np.ascontiguousarray(matrix.values))
+    os.replace(tmp_values, values_path)
+
+    tmp_index = index_path.with_name(index_path.name + suffix)
+    tmp_index.write_bytes(orjson.dumps({
+        "version": STORE_VERSION,
+        "fingerprint": fingerprint,
+        "rows": matrix.rows.tolist(),
+        "groups": matrix.groups.tolist(),
+        "counts": None if matrix.counts is None else matrix.counts.tolist(),
+    }))
+    os.replace(tmp_index, index_path)
+
+    remove_stale_files(store_dir, "matrix", fingerprint, (values_path, index_path))
+    return values_path
+
+
+@contextmanager
+def shared_store_lock(store_dir):
+    store_dir = Path(store_dir)
+    store_dir.mkdir(parents=True, exist_ok=True)
+    with open(store_dir / "matrix.lock", "wb") as lock_file:
+        if fcntl is not None:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
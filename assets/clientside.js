@@ -0,0 +1,52 @@
+function htvRelativePath(path) {
+    const config = document.getElementById("_dash-config");
+    const prefix = config ? JSON.parse(config.textContent).requests_pathname_prefix
+        : "/";
+    return prefix.replace(/\/$/, "") + path;
+}
+
+window.dash_clientside = Object.assign({}, window.dash_clientside, {
+    htv: {
+        toggleDownloadButtons: function (selectedGene, showReplicates, logY, error,
+                                         rows, genotypes) {
+            const disabled = !selectedGene;
+            const params = new URLSearchParams();
+            if (showReplicates) {
+                params.set("replicates", "1");
+            }
+            if (logY) {
+                params.set("log", "1");
+            }
+            if (error) {
+                params.set("error", error);
+            }
+            if (rows) {
+                params.set("rows", rows.join(","));
+            }
+            if (genotypes) {
+                params.set("genotypes", genotypes.join(","));
+            }
+            const query = params.toString() ? "?" + params.toString() : "";
+            const hrefs = ["svg", "png", "pdf"].map(function (fmt) {
+                return disabled ? null : htvRelativePath(
+                    "/download/" + fmt + "/" + encodeURIComponent(selectedGene)
+                    + query);
+            });
+            return [disabled, disabled, disabled].concat(hrefs);
+        },
+
+        selectDeGene: function (activeCell, rows, searchConfig) {
+            const noUpdate = window.dash_clientside.no_update;
+            if (!activeCell || !rows || activeCell.row >= rows.length) {
+                return [noUpdate, noUpdate];
+            }
+
+            const row = rows[activeCell.row];
+            if (searchConfig && searchConfig.server_search) {
+                const label = row.gene + "; " + (row.name || "Unknown");
+                return [row.gene, [{label: label, value: row.gene}]];
+            }
+            return [row.gene, noUpdate];
+        }
+    }
+});
@@ -0,0 +1,40 @@
+import argparse
+import tempfile
+import time
+from pathlib import Path
+
+from app.data_loader import ExpressionDataManager
+from app.layout import update_expression_plot
+from benchmarks.synthetic import transcript_names, write_quant_dataset
+
+
+def time_figure(gene: str, repeat: int) -> float:
+    update_expression_plot(gene)
+    start = time.perf_counter()
+    for _ in range(repeat):
+        update_expression_plot(gene)
+    return (time.perf_counter() - start) / repeat
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark figure build per gene")
+    parser.add_argument("--isoforms-per-gene", type=int, nargs="+", default=[1, 5, 20])
+    parser.add_argument("--lines-per-genotype", type=int, default=30)
+    parser.add_argument("--replicates", type=int, default=2)
+    parser.add_argument("--genes", type=int, default=50)
+    parser.add_argument("--repeat", type=int, default=20)
+
+    args = parser.parse_args()
+    n_samples = 2 * args.lines_per_genotype * args.replicates
+    print(f"{'isoforms':>9} {'groups':>7} {'build [ms]':>11}")
+    for isoforms in args.isoforms_per_gene:
+        n_transcripts = args.genes * isoforms
+        with tempfile.TemporaryDirectory() as tmp:
+            quant_path = write_quant_dataset(Path(tmp), n_samples, n_transcripts,
+                                             isoforms, args.lines_per_genotype)
+            ExpressionDataManager._instance = None
+            ExpressionDataManager(quant_path=str(quant_path)).load_quant_data()
+            gene = transcript_names(isoforms, isoforms)[0].split(".")[0]
+            elapsed = time_figure(gene, args.repeat)
+            ExpressionDataManager._instance = None
+        print(f"{isoforms:>9} {2 * args.lines_per_genotype:>7} {elapsed * 1000:>11.1f}")
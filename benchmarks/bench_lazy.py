@@ -0,0 +1,47 @@
+import argparse
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+from app.data_loader import ExpressionDataManager
+from app.figures import build_expression_figure
+from benchmarks.synthetic import transcript_names, write_quant_dataset
+
+
+def first_page(quant_path: Path, gene: str, **options) -> tuple:
+    ExpressionDataManager._instance = None
+    tracemalloc.start()
+    start = time.perf_counter()
+    manager = ExpressionDataManager(quant_path=str(quant_path), **options)
+    manager.load_expression_matrix()
+    build_expression_figure(manager, gene)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    ExpressionDataManager._instance = None
+    return elapsed, peak / 2**20
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark time to first page")
+    parser.add_argument("--samples", type=int, nargs="+", default=[64, 512])
+    parser.add_argument("--transcripts", type=int, default=20000)
+    parser.add_argument("--replicates", type=int, default=4,
+                        help="Replicates per line, more samples add more lines")
+
+    args = parser.parse_args()
+    gene = transcript_names(1)[0].split(".")[0]
+    print(f"{'samples':>8} {'mode':>10} {'first page [s]':>15} {'peak [MB]':>10}")
+    for n_samples in args.samples:
+        with tempfile.TemporaryDirectory() as tmp:
+            lines = max(1, n_samples // (2 * args.replicates))
+            quant_path = write_quant_dataset(Path(tmp) / "quant", n_samples,
+                                             args.transcripts,
+                                             lines_per_genotype=lines)
+            modes = (("cache", {"cache_dir": str(Path(tmp) / "cache")}),
+                     ("gene-store", {"gene_store": str(Path(tmp) / "genes")}))
+            for mode, options in modes:
+                first_page(quant_path, gene, **options)
+                elapsed, peak = first_page(quant_path, gene, **options)
+                print(f"{n_samples:>8} {mode:>10} {elapsed:>15.3f} {peak:>10.1f}")
@@ -0,0 +1,42 @@
+import argparse
+import os
+import tempfile
+import time
+from pathlib import Path
+
+from app.data_loader import ExpressionDataManager
+from benchmarks.synthetic import write_quant_dataset
+
+
+def time_load(quant_path: Path, load_workers: int) -> tuple:
+    ExpressionDataManager._instance = None
+    manager = ExpressionDataManager(quant_path=str(quant_path),
+                                    load_workers=load_workers)
+    directories = sorted(quant_path.iterdir())
+
+    start = time.perf_counter()
+    manager._read_quant_files(directories)
+    read = time.perf_counter() - start
+
+    start = time.perf_counter()
+    manager.load_quant_data()
+    total = time.perf_counter() - start
+
+    ExpressionDataManager._instance = None
+    return read, total
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark quant.sf ingestion")
+    parser.add_argument("--samples", type=int, nargs="+", default=[16, 128, 512])
+    parser.add_argument("--transcripts", type=int, default=20000)
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+
+    args = parser.parse_args()
+    print(f"{'samples':>8} {'mode':>10} {'read [s]':>10} {'load [s]':>10}")
+    for n_samples in args.samples:
+        with tempfile.TemporaryDirectory() as tmp:
+            quant_path = write_quant_dataset(Path(tmp), n_samples, args.transcripts)
+            for mode, workers in (("serial", 1), ("parallel", args.workers)):
+                read, total = time_load(quant_path, workers)
+                print(f"{n_samples:>8} {mode:>10} {read:>10.2f} {total:>10.2f}")
@@ -0,0 +1,53 @@
+import argparse
+import gc
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+from app.data_loader import ExpressionDataManager
+from benchmarks.synthetic import write_quant_dataset
+
+
+def measure_load(quant_path: Path, **options) -> dict:
+    ExpressionDataManager._instance = None
+    gc.collect()
+    tracemalloc.start()
+    baseline, _ = tracemalloc.get_traced_memory()
+
+    start = time.perf_counter()
+    manager = ExpressionDataManager(quant_path=str(quant_path), **options)
+    manager.load_quant_data()
+    elapsed = time.perf_counter() - start
+
+    gc.collect()
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    ExpressionDataManager._instance = None
+    return {
+        "seconds": elapsed,
+        "steady_mb": (current - baseline) / 2**20,
+        "peak_mb": (peak - baseline) / 2**20,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure loader memory")
+    parser.add_argument("--samples", type=int, default=500)
+    parser.add_argument("--transcripts", type=int, default=20000)
+    parser.add_argument("--modes", nargs="+",
+                        default=["default", "compact", "shared", "attach"])
+
+    args = parser.parse_args()
+    with tempfile.TemporaryDirectory() as tmp, tempfile.TemporaryDirectory() as store:
+        quant_path = write_quant_dataset(Path(tmp), args.samples, args.transcripts)
+        print(f"{'mode':>8} {'load [s]':>9} {'steady [MB]':>12} {'peak [MB]':>10}")
+        for mode in args.modes:
+            options = {}
+            if mode == "compact":
+                options["compact"] = True
+            elif mode in ("shared", "attach"):
+                options["shared_store"] = store
+            result = measure_load(quant_path, **options)
+            print(f"{mode:>8} {result['seconds']:>9.1f} {result['steady_mb']:>12.1f} "
+                  f"{result['peak_mb']:>10.1f}")
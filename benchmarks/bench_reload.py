@@ -0,0 +1,43 @@
+import argparse
+import shutil
+import tempfile
+import time
+from pathlib import Path
+
+from app.data_loader import ExpressionDataManager
+from benchmarks.synthetic import sample_names, write_quant_dataset
+
+
+def time_reload(manager: ExpressionDataManager) -> float:
+    start = time.perf_counter()
+    changes = manager.reload_changed_samples()
+    elapsed = time.perf_counter() - start
+    assert any(changes.values())
+    return elapsed
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark incremental reloads")
+    parser.add_argument("--samples", type=int, default=500)
+    parser.add_argument("--transcripts", type=int, default=20000)
+
+    args = parser.parse_args()
+    with tempfile.TemporaryDirectory() as tmp:
+        quant_path = write_quant_dataset(Path(tmp), args.samples, args.transcripts)
+        ExpressionDataManager._instance = None
+        manager = ExpressionDataManager(quant_path=str(quant_path), watch=True)
+
+        start = time.perf_counter()
+        manager.load_quant_data()
+        print(f"{'full load':>14} {time.perf_counter() - start:>8.2f} s")
+
+        names = sample_names(args.samples + 1)
+        first, new = names[0], names[-1]
+        shutil.copytree(quant_path / first, quant_path / new)
+        print(f"{'add sample':>14} {time_reload(manager):>8.2f} s")
+
+        (quant_path / first / "quant.sf").touch()
+        print(f"{'modify sample':>14} {time_reload(manager):>8.2f} s")
+
+        shutil.rmtree(quant_path / new)
+        print(f"{'remove sample':>14} {time_reload(manager):>8.2f} s")
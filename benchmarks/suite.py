@@ -0,0 +1,232 @@
+import argparse
+import itertools
+import json
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import plotly
+from flask import Flask
+
+from app.data_loader import ExpressionDataManager
+from app.export import EXPORT_FORMATS, image_cache, register_downloads
+from app.figures import figure_cache
+from app.layout import create_layout, update_expression_plot
+from app.renderer import renderer_pool
+from benchmarks.synthetic import transcript_names, write_annotation, write_quant_dataset
+
+CASES = (
+    "load_quant_data",
+    "get_isoforms_for_gene",
+    "update_expression_plot",
+    "update_expression_plot_cached",
+    "create_layout",
+    "create_layout_server_search",
+    *(f"download_{fmt}" for fmt in EXPORT_FORMATS),
+)
+
+
+def measure(func, repeat: int, setup=None, calls: int = 1) -> dict:
+    timings = []
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        start = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - start) * 1000 / calls)
+    return {
+        "repeat": repeat,
+        "calls": calls,
+        "min_ms": min(timings),
+        "median_ms": statistics.median(timings),
+        "mean_ms": statistics.fmean(timings),
+    }
+
+
+def _reset_manager():
+    ExpressionDataManager._instance = None
+
+
+def _measure_case(func, repeat, setup=None, calls=1) -> dict:
+    try:
+        return measure(func, repeat, setup, calls)
+    except Exception as err:
+        message = str(err).strip().splitlines()[0] if str(err).strip() else ""
+        return {"error": f"{type(err).__name__}: {message}"}
+
+
+def _download(client, fmt: str, gene: str) -> bytes:
+    response = client.get(f"/download/{fmt}/{gene}")
+    if response.status_code != 200:
+        raise RuntimeError(response.get_data(as_text=True))
+    return response.data
+
+
+def run_suite(quant_path: Path, annotation_path: Path, genes: list,
+              cases=CASES, repeat: int = 10, load_repeat: int = 3) -> dict:
+    results = {}
+    annotation, expression = str(annotation_path), str(quant_path)
+
+    if "load_quant_data" in cases:
+        results["load_quant_data"] = _measure_case(
+            lambda: ExpressionDataManager(annotation, expression).load_quant_data(),
+            load_repeat, setup=_reset_manager)
+
+    _reset_manager()
+    manager = ExpressionDataManager(annotation, expression)
+    manager.load_quant_data()
+    gene_cycle = itertools.cycle(genes)
+
+    if "get_isoforms_for_gene" in cases:
+        results["get_isoforms_for_gene"] = _measure_case(
+            lambda: [manager.get_isoforms_for_gene(gene) for gene in genes],
+            repeat, calls=len(genes))
+
+    if "update_expression_plot" in cases:
+        results["update_expression_plot"] = _measure_case(
+            lambda: update_expression_plot(next(gene_cycle)),
+            repeat, setup=figure_cache.clear)
+
+    if "update_expression_plot_cached" in cases:
+        update_expression_plot(genes[0])
+        results["update_expression_plot_cached"] = _measure_case(
+            lambda: update_expression_plot(genes[0]), repeat)
+
+    if "create_layout" in cases:
+        results["create_layout"] = _measure_case(
+            lambda: create_layout(annotation, expression), repeat)
+
+    if "create_layout_server_search" in cases:
+        results["create_layout_server_search"] = _measure_case(
+            lambda: create_layout(annotation, expression, server_search=True), repeat)
+
+    server = Flask(__name__)
+    server.testing = True
+    register_downloads(server)
+    client = server.test_client()
+    for fmt in EXPORT_FORMATS:
+        case = f"download_{fmt}"
+        if case in cases:
+            results[case] = _measure_case(
+                lambda fmt=fmt: _download(client, fmt, next(gene_cycle)),
+                repeat, setup=image_cache.clear)
+
+    _reset_manager()
+    return results
+
+
+def _git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"],
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def metadata(dataset: dict, label: str) -> dict:
+    return {
+        "label": label,
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "commit": _git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "versions": {"numpy": np.__version__, "pandas": pd.__version__,
+                     "plotly": plotly.__version__},
+        "dataset": dataset,
+    }
+
+
+def compare(results: dict, baseline: dict, threshold: float) -> list:
+    rows = []
+    for case, result in results.items():
+        previous = baseline.get(case, {})
+        if "median_ms" not in result or "median_ms" not in previous:
+            continue
+        ratio = result["median_ms"] / previous["median_ms"]
+        rows.append((case, previous["median_ms"], result["median_ms"], ratio,
+                     ratio > threshold))
+    return rows
+
+
+def print_results(results: dict):
+    print(f"{'case':<32} {'median [ms]':>12} {'min [ms]':>10}")
+    for case, result in results.items():
+        if "error" in result:
+            print(f"{case:<32} {'error':>12}  {result['error']}")
+        else:
+            print(f"{case:<32} {result['median_ms']:>12.4g} {result['min_ms']:>10.4g}")
+
+
+def print_comparison(rows: list):
+    print(f"{'case':<32} {'baseline':>10} {'current':>10} {'ratio':>7}")
+    for case, previous, current, ratio, regressed in rows:
+        flag = "  REGRESSION" if regressed else ""
+        print(f"{case:<32} {previous:>10.4g} {current:>10.4g} {ratio:>7.2f}{flag}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the benchmark suite")
+    parser.add_argument("--samples", type=int, default=64)
+    parser.add_argument("--transcripts", type=int, default=20000)
+    parser.add_argument("--isoforms-per-gene", type=int, default=3)
+    parser.add_argument("--lines-per-genotype", type=int, default=4)
+    parser.add_argument("--annotation-genes", type=int,
+                        help="Number of annotation rows (default: one per gene)")
+    parser.add_argument("--repeat", type=int, default=10)
+    parser.add_argument("--load-repeat", type=int, default=3)
+    parser.add_argument("--cases", nargs="+", choices=CASES, default=list(CASES))
+    parser.add_argument("--renderers", type=int, default=0,
+                        help="Start a renderer pool for the download cases")
+    parser.add_argument("--label", default="dev")
+    parser.add_argument("--output", help="Write the results to this JSON file")
+    parser.add_argument("--compare", help="Baseline JSON file to compare against")
+    parser.add_argument("--threshold", type=float, default=1.2,
+                        help="Median ratio above which a case counts as regressed")
+
+    args = parser.parse_args()
+    n_genes = -(-args.transcripts // args.isoforms_per_gene)
+    dataset = {
+        "samples": args.samples,
+        "transcripts": args.transcripts,
+        "isoforms_per_gene": args.isoforms_per_gene,
+        "lines_per_genotype": args.lines_per_genotype,
+        "annotation_genes": args.annotation_genes or n_genes,
+    }
+    genes = sorted({name.split(".")[0] for name in
+                    transcript_names(args.transcripts, args.isoforms_per_gene)})
+    genes = genes[::max(1, len(genes) // 100)]
+
+    if args.renderers > 0:
+        renderer_pool.configure(size=args.renderers)
+        renderer_pool.start()
+    with tempfile.TemporaryDirectory() as tmp:
+        quant_path = write_quant_dataset(Path(tmp) / "quant", args.samples,
+                                         args.transcripts, args.isoforms_per_gene,
+                                         args.lines_per_genotype)
+        annotation_path = write_annotation(Path(tmp) / "annotation.csv",
+                                           dataset["annotation_genes"])
+        results = run_suite(quant_path, annotation_path, genes, args.cases,
+                            args.repeat, args.load_repeat)
+    renderer_pool.stop()
+
+    report = {"meta": metadata(dataset, args.label), "results": results}
+    print_results(results)
+    if args.output:
+        Path(args.output).parent.mkdir(parents=True, exist_ok=True)
+        Path(args.output).write_text(json.dumps(report, indent=2) + "\n")
+    if args.compare:
+        baseline = json.loads(Path(args.compare).read_text())
+        rows = compare(results, baseline["results"], args.threshold)
+        print()
+        if baseline["meta"]["dataset"] != dataset:
+            print("Warning: the baseline was measured on a different dataset")
+        print_comparison(rows)
+        if any(row[-1] for row in rows):
+            sys.exit(1)
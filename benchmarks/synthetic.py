@@ -0,0 +1,74 @@
+import argparse
+from pathlib import Path
+
+import numpy as np
+
+QUANT_HEADER = "Name\tLength\tEffectiveLength\tTPM\tNumReads\n"
+
+
+def transcript_names(n_transcripts: int, isoforms_per_gene: int = 3) -> list:
+    names = []
+    gene = 0
+    while len(names) < n_transcripts:
+        gene += 1
+        agi = f"AT{gene % 5 + 1}G{gene:05d}"
+        for isoform in range(1, isoforms_per_gene + 1):
+            names.append(f"{agi}.{isoform}")
+    return names[:n_transcripts]
+
+
+def sample_names(n_samples: int, lines_per_genotype: int = 4,
+                 genotypes: tuple = ("ko", "wt")) -> list:
+    groups = [f"{genotype}_LL{18 + line}"
+              for genotype in genotypes
+              for line in range(lines_per_genotype)]
+    replicates = -(-n_samples // len(groups))
+    names = [f"{group}_{replicate}"
+             for replicate in range(1, replicates + 1)
+             for group in groups]
+    return names[:n_samples]
+
+
+def write_quant_dataset(root: Path, n_samples: int, n_transcripts: int,
+                        isoforms_per_gene: int = 3, lines_per_genotype: int = 4,
+                        seed: int = 0) -> Path:
+    rng = np.random.default_rng(seed)
+    root = Path(root)
+    root.mkdir(parents=True, exist_ok=True)
+    names = transcript_names(n_transcripts, isoforms_per_gene)
+    lengths = rng.integers(200, 5000, size=n_transcripts)
+    prefix = [f"{name}\t{length}\t{length * 0.8:.3f}\t"
+              for name, length in zip(names, lengths)]
+    for sample in sample_names(n_samples, lines_per_genotype):
+        tpm = rng.gamma(0.5, 20.0, size=n_transcripts)
+        reads = rng.poisson(tpm * 3)
+        lines = [f"{p}{t:.6f}\t{r}" for p, t, r in zip(prefix, tpm, reads)]
+        directory = root / sample
+        directory.mkdir(exist_ok=True)
+        (directory / "quant.sf").write_text(QUANT_HEADER + "\n".join(lines) + "\n")
+    return root
+
+
+def write_annotation(path: Path, n_genes: int) -> Path:
+    path = Path(path)
+    rows = [f"AT{gene % 5 + 1}G{gene:05d};Gene {gene}"
+            for gene in range(1, n_genes + 1)]
+    path.write_text("AGI;Name\n" + "\n".join(rows) + "\n")
+    return path
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Write a synthetic Salmon dataset")
+    parser.add_argument("output", help="Directory to write sample folders to")
+    parser.add_argument("--samples", type=int, default=16)
+    parser.add_argument("--transcripts", type=int, default=10000)
+    parser.add_argument("--isoforms-per-gene", type=int, default=3)
+    parser.add_argument("--lines-per-genotype", type=int, default=4)
+    parser.add_argument("--annotation", help="Also write an annotation CSV here")
+
+    args = parser.parse_args()
+    write_quant_dataset(Path(args.output), args.samples, args.transcripts,
+                        args.isoforms_per_gene, args.lines_per_genotype)
+    if args.annotation:
+        n_genes = -(-args.transcripts // args.isoforms_per_gene)
+        write_annotation(Path(args.annotation), n_genes)
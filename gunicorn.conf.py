@@ -0,0 +1,17 @@
+import os
+
+bind = os.environ.get("HTV_BIND", "127.0.0.1:8050")
+workers = int(os.environ.get("HTV_WORKERS", 4))
+threads = int(os.environ.get("HTV_THREADS", 4))
+worker_class = "gthread"
+preload_app = True
+timeout = 120
+
+
+def post_fork(server, worker):
+    from run import start_quant_watcher, start_renderer_pool
+
+    start_renderer_pool(int(os.environ.get("HTV_RENDERERS", 2)),
+                        int(os.environ.get("HTV_RENDER_QUEUE", 8)))
+    if os.environ.get("HTV_WATCH", "").lower() in ("1", "true", "yes"):
+        start_quant_watcher()
@@ -1,25 +1,218 @@
 import argparse
+import logging
+import os
+import sys
+from pathlib import Path
 
 import dash_bootstrap_components as dbc
 from dash import Dash
 
+from app.batch_export import parse_gene_list, register_batch_export, stream_zip
+from app.compression import DEFAULT_LEVEL, register_compression, static_cache
+from app.data_loader import ExpressionDataManager
+from app.export import EXPORT_FORMATS, image_cache, register_downloads
+from app.figures import figure_cache
 from app.layout import create_layout
+from app.metrics import register_metrics
+from app.profiling import register_profiler
+from app.quant_watcher import QuantWatcher
+from app.renderer import renderer_pool
 
 
-def main(annotation_path, expression_path, host="127.0.0.1", port=8050, debug=True):
+def create_app(annotation_path, expression_path, load_workers=1, cache_dir=None,
+               compact=False, shared_store=None, server_search=False, search_limit=50,
+               figure_cache_entries=256, figure_cache_mb=64, image_cache_mb=128,
+               watch=False, gene_store=None, profile_dir=None, replicates=False,
+               compression_level=DEFAULT_LEVEL, profile_token=None, metrics_dir=None):
+    figure_cache.configure(max_entries=figure_cache_entries,
+                           max_bytes=int(figure_cache_mb * 2**20))
+    image_cache.configure(max_bytes=int(image_cache_mb * 2**20))
+    ExpressionDataManager(annotation_path, expression_path, load_workers=load_workers,
+                          cache_dir=cache_dir, compact=compact,
+                          shared_store=shared_store, watch=watch,
+                          gene_store=gene_store, replicates=replicates)
     app = Dash(__name__, external_stylesheets=[dbc.themes.BOOTSTRAP])
-    app.layout = create_layout(annotation_path, expression_path)
+    app.layout = create_layout(annotation_path, expression_path,
+                               server_search=server_search, search_limit=search_limit,
+                               url_prefix=app.get_relative_path("/"))
+    register_batch_export(app.server, app.config.routes_pathname_prefix)
+    register_downloads(app.server, app.config.routes_pathname_prefix)
+    register_metrics(app.server, {"figure": figure_cache, "image": image_cache,
+                                  "compressed": static_cache}, renderer_pool,
+                     metrics_dir)
+    if compression_level > 0:
+        register_compression(app.server, compression_level)
+    if profile_dir is not None:
+        register_profiler(app.server, profile_dir, token=profile_token,
+                          prefix=app.config.routes_pathname_prefix,
+                          url_prefix=app.get_relative_path("/"))
+    return app
+
+
+def main(annotation_path, expression_path, host="127.0.0.1", port=8050, debug=True,
+         load_workers=1, cache_dir=None, server_search=False, search_limit=50,
+         figure_cache_entries=256, figure_cache_mb=64, renderers=2, render_queue=8,
+         image_cache_mb=128, compact=False, shared_store=None, workers=1, threads=1,
+         watch=False, gene_store=None, profile_dir=None, replicates=False,
+         compression_level=DEFAULT_LEVEL, profile_token=None, metrics_dir=None):
+    app = create_app(annotation_path, expression_path, load_workers=load_workers,
+                     cache_dir=cache_dir, compact=compact, shared_store=shared_store,
+                     server_search=server_search, search_limit=search_limit,
+                     figure_cache_entries=figure_cache_entries,
+                     figure_cache_mb=figure_cache_mb, image_cache_mb=image_cache_mb,
+                     watch=watch, gene_store=gene_store, profile_dir=profile_dir,
+                     replicates=replicates, compression_level=compression_level,
+                     profile_token=profile_token, metrics_dir=metrics_dir)
+
+    def start_services():
+        start_renderer_pool(renderers, render_queue)
+        if watch:
+            start_quant_watcher()
+
+    if workers > 1 or threads > 1:
+        from app.gunicorn_app import serve
+
+        serve(app.server, host, port, workers=workers, threads=threads,
+              post_fork=start_services)
+        return
+
+    if not debug or os.environ.get("WERKZEUG_RUN_MAIN"):
+        start_services()
     app.run(host=host, port=port, debug=debug)
 
-if __name__ == "__main__":
-    parser = argparse.ArgumentParser(description="Run Dash gene expression app")
+
+def export(annotation_path, expression_path, genes_path, formats, output,
+           load_workers=1, cache_dir=None, renderers=2, compact=False,
+           shared_store=None, gene_store=None):
+    start_renderer_pool(renderers, renderers)
+    data_manager = ExpressionDataManager(annotation_path, expression_path,
+                                         load_workers=load_workers,
+                                         cache_dir=cache_dir, compact=compact,
+                                         shared_store=shared_store,
+                                         gene_store=gene_store)
+    genes = parse_gene_list(Path(genes_path).read_text())
+    with open(output, "wb") as archive:
+        for chunk in stream_zip(data_manager, genes, formats,
+                                workers=max(1, renderers)):
+            archive.write(chunk)
+    renderer_pool.stop()
+
+
+def start_renderer_pool(renderers, render_queue):
+    if renderers <= 0:
+        return
+    renderer_pool.configure(size=renderers, max_queue=render_queue)
+    try:
+        renderer_pool.start()
+    except Exception as err:
+        logging.warning("Could not start renderer pool, exports will start a "
+                        "new browser per request: %s", err)
+
+
+def start_quant_watcher(debounce=5.0):
+    watcher = QuantWatcher(ExpressionDataManager(), debounce=debounce)
+    watcher.start()
+    return watcher
+
+
+def _add_data_arguments(parser):
     parser.add_argument("--annotation", default="example_data/example_annotation.csv",
                         help="Path to annotation CSV")
     parser.add_argument("--expression", default="example_data/example_quant/",
                         help="Path to expression data folder")
-    parser.add_argument("--host", default="127.0.0.1", help="Host to run app on")
-    parser.add_argument("--port", type=int, default=8050, help="Port to run app on")
-    parser.add_argument("--debug", action="store_true", help="Enable debug mode")
+    parser.add_argument("--load-workers", type=int, default=1,
+                        help="Number of processes used to read quant.sf files")
+    parser.add_argument("--cache-dir",
+                        help="Directory for the aggregated expression data cache")
+    parser.add_argument("--compact", action="store_true",
+                        help="Keep the aggregated expression data as float32")
+    parser.add_argument("--shared-store",
+                        help="Directory for a memory-mapped expression matrix shared "
+                             "by all worker processes")
+    parser.add_argument("--gene-store",
+                        help="Directory for a gene-chunked HDF5 store from which "
+                             "expression data is read gene by gene on demand")
+    parser.add_argument("--renderers", type=int, default=2,
+                        help="Number of pre-warmed browser tabs used for image "
+                             "export, 0 disables the pool")
+
+
+def _parse_args(argv):
+    parser = argparse.ArgumentParser(description="Run Dash gene expression app")
+    commands = parser.add_subparsers(dest="command")
 
-    args = parser.parse_args()
-    main(args.annotation, args.expression, args.host, args.port, args.debug)
+    serve = commands.add_parser("serve", help="Run the dashboard (default)")
+    _add_data_arguments(serve)
+    serve.add_argument("--host", default="127.0.0.1", help="Host to run app on")
+    serve.add_argument("--port", type=int, default=8050, help="Port to run app on")
+    serve.add_argument("--debug", action="store_true", help="Enable debug mode")
+    serve.add_argument("--workers", type=int, default=1,
+                       help="Number of gunicorn worker processes, more than one "
+                            "worker or thread serves the app with gunicorn")
+    serve.add_argument("--threads", type=int, default=1,
+                       help="Number of request threads per gunicorn worker")
+    serve.add_argument("--watch", action="store_true",
+                       help="Reload samples that are added, removed or changed in "
+                            "the expression folder without a restart, keeps the "
+                            "TPM of every sample in memory (8 bytes per transcript "
+                            "and sample)")
+    serve.add_argument("--replicates", action="store_true",
+                       help="Keep per-replicate TPM in memory to overlay replicate "
+                            "points on the expression plot")
+    serve.add_argument("--profile", metavar="DIR",
+                       help="Profile requests that send the profiling token in "
+                            "the X-HTV-Profile header, the profile query parameter "
+                            "or its cookie and write the profiles to DIR, "
+                            "summarized at /profile")
+    serve.add_argument("--profile-token", default=os.environ.get("HTV_PROFILE_TOKEN"),
+                       help="Token that enables profiling, a random token is "
+                            "logged at startup if not given")
+    serve.add_argument("--metrics-dir",
+                       help="Directory in which every worker process writes its "
+                            "metrics so that /metrics reports all workers")
+    serve.add_argument("--server-search", action="store_true",
+                       help="Search genes on the server instead of shipping all "
+                            "options to the browser")
+    serve.add_argument("--search-limit", type=int, default=50,
+                       help="Maximum number of genes returned per search")
+    serve.add_argument("--compression-level", type=int, default=DEFAULT_LEVEL,
+                       help="gzip/brotli level of compressed responses, 0 disables "
+                            "compression")
+    serve.add_argument("--figure-cache-entries", type=int, default=256,
+                       help="Maximum number of rendered figures kept in memory")
+    serve.add_argument("--figure-cache-mb", type=float, default=64,
+                       help="Memory budget of the figure cache in MB")
+    serve.add_argument("--render-queue", type=int, default=8,
+                       help="Maximum number of exports waiting for a renderer")
+    serve.add_argument("--image-cache-mb", type=float, default=128,
+                       help="Memory budget of the exported image cache in MB")
+
+    batch = commands.add_parser("export", help="Export plots for a list of genes "
+                                               "into a ZIP archive")
+    _add_data_arguments(batch)
+    batch.add_argument("--genes", required=True,
+                       help="Text file with one gene ID per line")
+    batch.add_argument("--formats", nargs="+", default=["svg"],
+                       choices=sorted(EXPORT_FORMATS), help="Image formats to export")
+    batch.add_argument("--output", default="expression_plots.zip",
+                       help="Path of the ZIP archive to write")
+
+    if not argv or argv[0] not in commands.choices and argv[0] not in ("-h", "--help"):
+        argv = ["serve", *argv]
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    args = _parse_args(sys.argv[1:])
+    if args.command == "export":
+        export(args.annotation, args.expression, args.genes, args.formats,
+               args.output, args.load_workers, args.cache_dir, args.renderers,
+               args.compact, args.shared_store, args.gene_store)
+    else:
+        main(args.annotation, args.expression, args.host, args.port, args.debug,
+             args.load_workers, args.cache_dir, args.server_search,
+             args.search_limit, args.figure_cache_entries, args.figure_cache_mb,
+             args.renderers, args.render_queue, args.image_cache_mb, args.compact,
+             args.shared_store, args.workers, args.threads, args.watch,
+             args.gene_store, args.profile, args.replicates,
+             args.compression_level, args.profile_token, args.metrics_dir)
@@ -0,0 +1,84 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.aggregation import RunningStatistics, StreamingAggregator, sample_group
+from app.expression_matrix import build_isoform_index
+
+
+def tpm(values: dict) -> pd.Series:
+    return pd.Series(values, dtype=float)
+
+
+def test_sample_group_strips_replicate():
+    assert sample_group("ko_LL18_3") == "ko_LL18"
+
+
+def test_running_statistics_match_numpy():
+    rng = np.random.default_rng(0)
+    samples = rng.gamma(0.5, 20.0, size=(7, 50))
+    samples[2, :10] = np.nan
+    statistics = RunningStatistics(50)
+    for sample in samples:
+        statistics.add(sample)
+
+    mean, std = statistics.statistics()
+
+    np.testing.assert_allclose(mean, np.nanmean(samples, axis=0), rtol=1e-12)
+    np.testing.assert_allclose(std, np.nanstd(samples, axis=0, ddof=1), rtol=1e-10)
+
+
+def test_running_statistics_need_two_values_for_std():
+    statistics = RunningStatistics(2)
+    statistics.add(np.array([1.0, np.nan]))
+
+    mean, std = statistics.statistics()
+
+    assert mean[0] == 1.0 and np.isnan(mean[1])
+    assert np.isnan(std).all()
+
+
+def test_aggregator_aligns_rows_and_sums_genes():
+    aggregator = StreamingAggregator()
+    aggregator.add_sample("ko_LL18_1", tpm({"AT1G01010.1": 1.0, "AT1G01010.2": 2.0,
+                                            "AT1G01010-AT1G01020.1": 9.0}))
+    aggregator.add_sample("ko_LL18_2", tpm({"AT1G01010.1": 3.0, "AT1G01020.1": 4.0}))
+
+    matrix = aggregator.result()
+    frame = matrix.frame
+
+    assert list(matrix.rows) == ["AT1G01010.1", "AT1G01010.2", "AT1G01020.1",
+                                 "AT1G01010", "AT1G01020"]
+    assert frame.loc[("AT1G01010.1", "mean"), "ko_LL18"] == 2.0
+    assert frame.loc[("AT1G01010.2", "mean"), "ko_LL18"] == 2.0
+    assert np.isnan(frame.loc[("AT1G01010.2", "std"), "ko_LL18"])
+    assert frame.loc[("AT1G01010", "mean"), "ko_LL18"] == 3.0
+    assert frame.loc[("AT1G01020", "mean"), "ko_LL18"] == 2.0
+    assert frame.loc[("AT1G01020", "std"), "ko_LL18"] == pytest.approx(np.sqrt(8))
+
+
+def test_aggregator_builds_isoform_index():
+    aggregator = StreamingAggregator()
+    aggregator.add_sample("ko_LL18_1", tpm({"AT1G01020.1": 1.0, "AT1G01010.2": 2.0}))
+    aggregator.add_sample("ko_LL18_2", tpm({"AT1G01010.1": 3.0, "AT1G01020.2": 4.0}))
+
+    matrix = aggregator.result()
+
+    assert "isoform_index" in vars(matrix)
+    assert matrix.isoform_index == {
+        "AT1G01020": ["AT1G01020.1", "AT1G01020.2", "AT1G01020"],
+        "AT1G01010": ["AT1G01010.2", "AT1G01010.1", "AT1G01010"],
+    }
+    assert matrix.isoform_index == build_isoform_index(matrix.rows)
+
+
+def test_aggregator_keeps_groups_separate():
+    aggregator = StreamingAggregator(np.float32)
+    for name, value in [("wt_LL18_1", 1.0), ("ko_LL18_1", 5.0), ("wt_LL18_2", 3.0)]:
+        aggregator.add_sample(name, tpm({"AT1G01010.1": value}))
+
+    matrix = aggregator.result()
+
+    assert list(matrix.groups) == ["ko_LL18", "wt_LL18"]
+    assert matrix.values.dtype == np.float32
+    np.testing.assert_array_equal(matrix.mean, [[5.0, 2.0], [5.0, 2.0]])
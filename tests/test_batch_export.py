@@ -0,0 +1,140 @@
+import base64
+import io
+import zipfile
+from unittest.mock import patch
+
+import pytest
+from flask import Flask
+
+from app.batch_export import (
+    parse_gene_list,
+    register_batch_export,
+    stream_zip,
+)
+from app.data_loader import ExpressionDataManager
+from app.layout import load_batch_gene_file
+
+QUANT_CONTENT = (
+    "Name\tLength\tEffectiveLength\tTPM\tNumReads\n"
+    "AT1G01010.1\t1749\t1430.305\t{tpm}\t24\n"
+    "AT1G01010.2\t1749\t1430.305\t1.5\t24\n"
+    "AT1G01020.1\t1749\t1430.305\t3.5\t24\n"
+)
+
+
+@pytest.fixture(autouse=True)
+def reset_singleton():
+    ExpressionDataManager._instance = None
+
+
+@pytest.fixture
+def data_manager(tmp_path):
+    for i, sample in enumerate(["ko_LL18_1", "ko_LL18_2", "wt_LL18_1", "wt_LL18_2"]):
+        folder = tmp_path / sample
+        folder.mkdir()
+        (folder / "quant.sf").write_text(QUANT_CONTENT.format(tpm=i + 1))
+    return ExpressionDataManager(None, str(tmp_path))
+
+
+@pytest.fixture
+def mock_to_image():
+    def to_image(fig, format, width, height, scale):
+        return f"{format}:{fig.layout.title.text}".encode()
+
+    with patch("plotly.io.to_image", side_effect=to_image) as mock:
+        yield mock
+
+
+def test_parse_gene_list_splits_and_deduplicates():
+    text = "AT1G01010\nAT1G01020, AT1G01030;AT1G01010\n\n  AT1G01040  # comment\n"
+    assert parse_gene_list(text) == ["AT1G01010", "AT1G01020", "AT1G01030",
+                                     "AT1G01040"]
+
+
+def test_parse_gene_list_empty():
+    assert parse_gene_list("") == []
+    assert parse_gene_list(None) == []
+
+
+def test_stream_zip_contains_every_gene_and_format(data_manager, mock_to_image):
+    data = b"".join(stream_zip(data_manager, ["AT1G01010", "AT1G01020"],
+                               ["svg", "png"]))
+
+    with zipfile.ZipFile(io.BytesIO(data)) as archive:
+        assert sorted(archive.namelist()) == [
+            "png/expression_plot_AT1G01010.png",
+            "png/expression_plot_AT1G01020.png",
+            "svg/expression_plot_AT1G01010.svg",
+            "svg/expression_plot_AT1G01020.svg",
+        ]
+        assert archive.read("svg/expression_plot_AT1G01010.svg") == \
+            b"svg:Expression Profile: AT1G01010"
+
+    scales = {call.kwargs["format"]: call.kwargs["scale"]
+              for call in mock_to_image.call_args_list}
+    assert scales == {"svg": 1, "png": 2}
+
+
+def test_stream_zip_yields_incrementally(data_manager, mock_to_image):
+    chunks = list(stream_zip(data_manager, ["AT1G01010", "AT1G01020"], ["svg"]))
+    assert len([chunk for chunk in chunks if chunk]) >= 2
+
+
+def test_stream_zip_lists_missing_genes(data_manager, mock_to_image):
+    data = b"".join(stream_zip(data_manager, ["AT1G01010", "AT9G99999"], ["pdf"]))
+
+    with zipfile.ZipFile(io.BytesIO(data)) as archive:
+        assert "pdf/expression_plot_AT1G01010.pdf" in archive.namelist()
+        assert archive.read("missing_genes.txt") == b"AT9G99999\n"
+
+
+def test_stream_zip_rejects_unknown_format(data_manager):
+    with pytest.raises(ValueError, match="Formats"):
+        list(stream_zip(data_manager, ["AT1G01010"], ["gif"]))
+
+
+@pytest.fixture
+def client(data_manager):
+    server = Flask(__name__)
+    register_batch_export(server)
+    return server.test_client()
+
+
+def test_batch_route_streams_zip(client, mock_to_image):
+    response = client.post("/export/batch", data={
+        "genes": "AT1G01010\nAT1G01020",
+        "format_svg": "on",
+        "format_pdf": "on",
+    })
+
+    assert response.status_code == 200
+    assert response.mimetype == "application/zip"
+    assert "expression_plots.zip" in response.headers["Content-Disposition"]
+    with zipfile.ZipFile(io.BytesIO(response.data)) as archive:
+        assert len(archive.namelist()) == 4
+
+
+def test_batch_route_accepts_uploaded_file(client, mock_to_image):
+    response = client.post("/export/batch", data={
+        "gene_file": (io.BytesIO(b"AT1G01020\n"), "genes.txt"),
+        "formats": "png",
+    }, content_type="multipart/form-data")
+
+    with zipfile.ZipFile(io.BytesIO(response.data)) as archive:
+        assert archive.namelist() == ["png/expression_plot_AT1G01020.png"]
+
+
+def test_batch_route_requires_genes(client):
+    response = client.post("/export/batch", data={"format_svg": "on"})
+    assert response.status_code == 400
+
+
+def test_batch_route_requires_format(client):
+    response = client.post("/export/batch", data={"genes": "AT1G01010"})
+    assert response.status_code == 400
+
+
+def test_load_batch_gene_file_merges_with_pasted_genes():
+    contents = "data:text/plain;base64," + base64.b64encode(
+        b"AT1G01020\nAT1G01010\n").decode()
+    assert load_batch_gene_file(contents, "AT1G01010") == "AT1G01010\nAT1G01020"
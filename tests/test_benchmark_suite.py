@@ -0,0 +1,43 @@
+import pytest
+
+from app.data_loader import ExpressionDataManager
+from benchmarks.suite import compare, measure, run_suite
+from benchmarks.synthetic import write_annotation, write_quant_dataset
+
+
+@pytest.fixture(autouse=True)
+def reset_singleton():
+    ExpressionDataManager._instance = None
+
+
+def test_measure_reports_per_call_timings():
+    calls = []
+
+    result = measure(lambda: calls.append(1), repeat=4, setup=lambda: calls.append(0),
+                     calls=2)
+
+    assert calls == [0, 1] * 4
+    assert result["repeat"] == 4 and result["calls"] == 2
+    assert result["min_ms"] <= result["median_ms"]
+
+
+def test_compare_flags_regressions():
+    rows = compare({"a": {"median_ms": 3.0}, "b": {"median_ms": 1.0},
+                    "c": {"error": "failed"}},
+                   {"a": {"median_ms": 2.0}, "b": {"median_ms": 1.0}}, threshold=1.2)
+
+    assert rows == [("a", 2.0, 3.0, 1.5, True), ("b", 1.0, 1.0, 1.0, False)]
+
+
+def test_run_suite_covers_app_entry_points(tmp_path):
+    quant_path = write_quant_dataset(tmp_path / "quant", 16, 30)
+    annotation_path = write_annotation(tmp_path / "annotation.csv", 10)
+
+    results = run_suite(quant_path, annotation_path, ["AT2G00001", "AT3G00002"],
+                        cases=["load_quant_data", "get_isoforms_for_gene",
+                               "update_expression_plot", "create_layout"],
+                        repeat=2, load_repeat=1)
+
+    assert set(results) == {"load_quant_data", "get_isoforms_for_gene",
+                            "update_expression_plot", "create_layout"}
+    assert all("median_ms" in result for result in results.values())
@@ -0,0 +1,78 @@
+import json
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parents[1]
+SCRIPT = """
+import json
+from run import create_app
+app = create_app("example_data/example_annotation.csv", "example_data/example_quant/")
+client = app.server.test_client()
+print(json.dumps({
+    "dependencies": client.get("/_dash-dependencies").get_json(),
+    "index": client.get("/").get_data(as_text=True),
+}))
+"""
+
+PREFIX_SCRIPT = """
+import json
+from run import create_app
+app = create_app("example_data/example_annotation.csv", "example_data/example_quant/")
+client = app.server.test_client()
+print(json.dumps({
+    "layout": client.get("/htv/_dash-layout").get_json(),
+    "routes": sorted(rule.rule for rule in app.server.url_map.iter_rules()),
+    "batch": client.post("/htv/export/batch", data={}).status_code,
+}))
+"""
+
+
+@pytest.fixture(scope="module")
+def dash_app():
+    output = subprocess.run([sys.executable, "-c", SCRIPT], cwd=ROOT, check=True,
+                            capture_output=True, text=True).stdout
+    return json.loads(output.splitlines()[-1])
+
+
+def triggered_by(dependencies, component, prop):
+    return [dependency for dependency in dependencies
+            if {"id": component, "property": prop} in dependency["inputs"]]
+
+
+def test_gene_selection_triggers_one_server_callback(dash_app):
+    callbacks = triggered_by(dash_app["dependencies"], "gene-selector", "value")
+
+    server = [callback["output"] for callback in callbacks
+              if callback["clientside_function"] is None]
+    assert server == ["expression-plot.figure"]
+    assert len(callbacks) == 2
+
+
+@pytest.mark.parametrize("component, prop, function", [
+    ("gene-selector", "value", "toggleDownloadButtons"),
+    ("de-table", "active_cell", "selectDeGene"),
+])
+def test_ui_callbacks_run_in_browser(dash_app, component, prop, function):
+    clientside = [callback["clientside_function"]
+                  for callback in triggered_by(dash_app["dependencies"], component,
+                                               prop)
+                  if callback["clientside_function"] is not None]
+
+    assert clientside == [{"namespace": "htv", "function_name": function}]
+    assert "assets/clientside.js" in dash_app["index"]
+
+
+def test_urls_follow_the_pathname_prefix():
+    env = dict(os.environ, DASH_URL_BASE_PATHNAME="/htv/")
+    output = subprocess.run([sys.executable, "-c", PREFIX_SCRIPT], cwd=ROOT,
+                            check=True, capture_output=True, text=True,
+                            env=env).stdout
+    result = json.loads(output.splitlines()[-1])
+
+    assert '"action": "/htv/export/batch"' in json.dumps(result["layout"])
+    assert "/htv/download/<fmt>/<gene>" in result["routes"]
+    assert result["batch"] == 400
@@ -0,0 +1,176 @@
+import gzip
+import json
+import subprocess
+import sys
+from pathlib import Path
+from types import SimpleNamespace
+
+import orjson
+import plotly.io as pio
+import pytest
+from dash._utils import to_json
+from flask import Flask, Response, stream_with_context
+
+from app import compression
+from app.compression import register_compression, static_cache
+from app.data_loader import ExpressionDataManager
+from app.figures import figure_cache
+from app.layout import update_expression_plot
+
+ROOT = Path(__file__).resolve().parents[1]
+BODY = json.dumps({"values": list(range(1000))})
+SCRIPT = """
+import gzip
+import json
+from run import create_app
+app = create_app("example_data/example_annotation.csv", "example_data/example_quant/")
+client = app.server.test_client()
+body = {
+    "output": "expression-plot.figure",
+    "outputs": {"id": "expression-plot", "property": "figure"},
+    "inputs": [{"id": "gene-selector", "property": "value", "value": "AT1G01010"},
+               {"id": "show-replicates", "property": "value", "value": False}],
+    "state": [{"id": "log-scale", "property": "value", "value": False},
+              {"id": "error-type", "property": "value", "value": "sd"},
+              {"id": "expression-rows", "property": "value",
+               "value": ["isoforms", "gene"]},
+              {"id": "genotype-filter", "property": "value", "value": None}],
+    "changedPropIds": ["gene-selector.value"],
+}
+responses = {}
+for encoding in ("identity", "gzip"):
+    response = client.post("/_dash-update-component", json=body,
+                           headers={"Accept-Encoding": encoding})
+    data = response.data
+    if response.headers.get("Content-Encoding") == "gzip":
+        data = gzip.decompress(data)
+    responses[encoding] = {"encoding": response.headers.get("Content-Encoding"),
+                           "size": len(response.data),
+                           "body": json.loads(data)}
+print(json.dumps(responses))
+"""
+
+
+@pytest.fixture
+def client():
+    static_cache.clear()
+    server = Flask(__name__)
+    register_compression(server)
+
+    @server.route("/json")
+    def json_response():
+        return Response(BODY, mimetype="application/json")
+
+    @server.route("/small")
+    def small_response():
+        return Response("{}", mimetype="application/json")
+
+    @server.route("/png")
+    def png_response():
+        return Response(BODY.encode(), mimetype="image/png")
+
+    @server.route("/stream")
+    def stream_response():
+        return Response(stream_with_context(iter([BODY])), mimetype="text/plain")
+
+    @server.route("/static.js")
+    def static_response():
+        response = Response(server.config.get("STATIC_BODY", BODY),
+                            mimetype="application/javascript")
+        response.cache_control.max_age = 3600
+        return response
+
+    return server.test_client()
+
+
+def test_compresses_when_accepted(client):
+    response = client.get("/json", headers={"Accept-Encoding": "gzip, deflate"})
+
+    assert response.headers["Content-Encoding"] == "gzip"
+    assert response.headers["Vary"] == "Accept-Encoding"
+    assert int(response.headers["Content-Length"]) == len(response.data)
+    assert gzip.decompress(response.data).decode() == BODY
+
+
+def test_sends_identity_when_not_accepted(client):
+    response = client.get("/json", headers={"Accept-Encoding": "identity"})
+
+    assert "Content-Encoding" not in response.headers
+    assert response.headers["Vary"] == "Accept-Encoding"
+    assert response.data.decode() == BODY
+
+
+@pytest.mark.parametrize("path", ["/small", "/png", "/stream"])
+def test_skips_small_binary_and_streamed_responses(client, path):
+    response = client.get(path, headers={"Accept-Encoding": "gzip"})
+
+    assert "Content-Encoding" not in response.headers
+
+
+def test_prefers_brotli_when_available(client, monkeypatch):
+    fake = SimpleNamespace(compress=lambda data, quality: b"br:" + data)
+    monkeypatch.setattr(compression, "brotli", fake)
+
+    response = client.get("/json", headers={"Accept-Encoding": "gzip, br"})
+
+    assert response.headers["Content-Encoding"] == "br"
+    assert response.data == b"br:" + BODY.encode()
+    assert client.get("/json", headers={"Accept-Encoding": "gzip"}) \
+        .headers["Content-Encoding"] == "gzip"
+
+
+def test_cacheable_responses_are_compressed_once(client):
+    first = client.get("/static.js", headers={"Accept-Encoding": "gzip"})
+    second = client.get("/static.js", headers={"Accept-Encoding": "gzip"})
+
+    assert first.data == second.data
+    assert static_cache.stats()["entries"] == 1
+    assert static_cache.stats()["hits"] == 1
+
+
+def test_changed_static_file_of_same_size_is_compressed_again(client):
+    client.get("/static.js", headers={"Accept-Encoding": "gzip"})
+    client.application.config["STATIC_BODY"] = BODY.replace("1", "2")
+
+    response = client.get("/static.js", headers={"Accept-Encoding": "gzip"})
+
+    assert gzip.decompress(response.data).decode() == BODY.replace("1", "2")
+
+
+@pytest.fixture
+def data_manager(tmp_path):
+    ExpressionDataManager._instance = None
+    figure_cache.clear()
+    (tmp_path / "wt_LL18_1").mkdir()
+    (tmp_path / "wt_LL18_1" / "quant.sf").write_text("Name\tTPM\nAT1G01010.1\t2.0")
+    manager = ExpressionDataManager(quant_path=str(tmp_path))
+    manager.load_expression_matrix()
+    yield manager
+    ExpressionDataManager._instance = None
+    figure_cache.clear()
+
+
+def test_callback_returns_serialized_figure(data_manager, monkeypatch):
+    fig = update_expression_plot("AT1G01010")
+    figure_cache.clear()
+    monkeypatch.setattr("app.layout._in_callback", lambda: True)
+
+    miss = update_expression_plot("AT1G01010")
+    hit = update_expression_plot("AT1G01010")
+
+    assert isinstance(miss, orjson.Fragment) and isinstance(hit, orjson.Fragment)
+    assert json.loads(to_json({"figure": hit})) == \
+        {"figure": json.loads(pio.to_json(fig))}
+
+
+def test_dash_callback_response_is_compressed():
+    output = subprocess.run([sys.executable, "-c", SCRIPT], cwd=ROOT, check=True,
+                            capture_output=True, text=True).stdout
+    responses = json.loads(output.splitlines()[-1])
+
+    assert responses["identity"]["encoding"] is None
+    assert responses["gzip"]["encoding"] == "gzip"
+    assert responses["gzip"]["size"] < responses["identity"]["size"] / 2
+    assert responses["gzip"]["body"] == responses["identity"]["body"]
+    figure = responses["gzip"]["body"]["response"]["expression-plot"]["figure"]
+    assert figure["layout"]["title"]["text"] == "Expression Profile: AT1G01010"
@@ -1,6 +1,10 @@
 import math
+import time
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import patch
 
 import numpy as np
+import pandas as pd
 import pytest
 
 from app.data_loader import ExpressionDataManager
@@ -71,6 +75,16 @@ def test_get_isoforms_for_gene(temp_folder_with_structure):
     isoforms = manager.get_isoforms_for_gene("AT1G01010")
     assert set(isoforms) == {"AT1G01010", "AT1G01010.1", "AT1G01010.2"}
 
+def test_get_isoforms_for_gene_requires_exact_gene(temp_folder_with_structure):
+    manager = ExpressionDataManager(None, str(temp_folder_with_structure))
+    manager.load_quant_data()
+
+    assert manager.get_isoforms_for_gene("AT1G0101") == []
+    assert manager.get_isoforms_for_gene("AT1G01010.1") == []
+    assert manager.get_isoforms_for_gene("AT1G01010") == [
+        "AT1G01010.1", "AT1G01010.2", "AT1G01010"
+    ]
+
 def test_get_sample_groups(temp_folder_with_structure):
     manager = ExpressionDataManager(None, str(temp_folder_with_structure))
     manager.load_quant_data()
@@ -115,3 +129,95 @@ def test_gene_isoform_aggregation_row_added(temp_folder_with_structure):
         assert np.isclose(gene_mean, expected_gene_total, rtol=1e-8, atol=1e-10), \
             (f"Gene-level aggregation incorrect: expected "
              f"{expected_gene_total}, got {gene_mean}")
+
+def test_parallel_load_matches_serial(temp_folder_with_structure):
+    manager = ExpressionDataManager(None, str(temp_folder_with_structure))
+    serial = manager.load_quant_data()
+    ExpressionDataManager._instance = None
+
+    manager = ExpressionDataManager(None, str(temp_folder_with_structure),
+                                    load_workers=2)
+    parallel = manager.load_quant_data()
+
+    pd.testing.assert_frame_equal(serial, parallel)
+
+
+def test_compact_load_matches_full_precision(temp_folder_with_structure):
+    manager = ExpressionDataManager(None, str(temp_folder_with_structure))
+    full = manager.load_quant_data()
+    ExpressionDataManager._instance = None
+
+    manager = ExpressionDataManager(None, str(temp_folder_with_structure),
+                                    compact=True)
+    compact = manager.load_quant_data()
+
+    assert (compact.dtypes == np.float32).all()
+    pd.testing.assert_frame_equal(full, compact.astype(np.float64), rtol=1e-6)
+
+
+def test_expression_block_matches_frame(temp_folder_with_structure):
+    manager = ExpressionDataManager(None, str(temp_folder_with_structure))
+    df = manager.load_quant_data()
+
+    isoforms = manager.get_isoforms_for_gene("AT1G01010")
+    means, stds = manager.get_expression_block(isoforms)
+
+    np.testing.assert_array_equal(means, df.xs("mean", level=1).loc[isoforms])
+    np.testing.assert_array_equal(stds, df.xs("std", level=1).loc[isoforms])
+
+
+def test_concurrent_loads_aggregate_once(temp_folder_with_structure):
+    manager = ExpressionDataManager(None, str(temp_folder_with_structure))
+    aggregate = ExpressionDataManager._aggregate_quant_data
+    calls = []
+
+    def slow_aggregate(self):
+        calls.append(1)
+        time.sleep(0.05)
+        return aggregate(self)
+
+    with patch.object(ExpressionDataManager, "_aggregate_quant_data", slow_aggregate):
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            frames = list(executor.map(
+                lambda _: ExpressionDataManager().load_quant_data(), range(8)))
+
+    assert len(calls) == 1
+    assert all(frame is frames[0] for frame in frames)
+    assert ExpressionDataManager() is manager
+
+
+def test_streaming_matches_replicate_aggregation(temp_folder_with_structure):
+    manager = ExpressionDataManager(None, str(temp_folder_with_structure))
+    streamed = manager.load_quant_data()
+    ExpressionDataManager._instance = None
+
+    manager = ExpressionDataManager(None, str(temp_folder_with_structure), watch=True)
+    replicates = manager.load_quant_data()
+
+    pd.testing.assert_frame_equal(streamed, replicates, check_exact=True)
+
+
+def test_full_reload_swaps_state_at_once(temp_folder_with_structure):
+    manager = ExpressionDataManager(None, str(temp_folder_with_structure), watch=True,
+                                    replicates=True)
+    manager.load_expression_matrix()
+    manager.get_sample_qc()
+    previous = (manager._matrix, manager._replicates, manager._replicate_matrix,
+                manager._sample_qc, manager.fingerprint)
+    aggregate = ExpressionDataManager._aggregate_quant_data
+    seen = []
+
+    def observed_aggregate(self):
+        seen.append((self._matrix, self._replicates, self._replicate_matrix,
+                     self._sample_qc, self.fingerprint))
+        return aggregate(self)
+
+    with patch.object(ExpressionDataManager, "_aggregate_quant_data",
+                      observed_aggregate):
+        manager._load_matrix()
+
+    assert len(seen) == 1 and all(a is b for a, b in zip(seen[0], previous))
+    assert manager._matrix is not previous[0]
+    assert manager._replicates is not previous[1]
+    assert manager._replicate_matrix is not previous[2]
+    assert manager._sample_qc is None
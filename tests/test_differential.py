@@ -0,0 +1,181 @@
+import math
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+from app.data_loader import ExpressionDataManager
+from app.differential import (
+    benjamini_hochberg,
+    genotype_comparisons,
+    reference_genotype,
+    regularized_beta,
+    t_test_p_values,
+    welch_t_test,
+)
+from app.layout import update_de_table
+
+SAMPLES = {
+    "ko_LL18_1": {"AT1G01010.1": 1.0, "AT1G01020.1": 5.0,
+                  "AT1G01030.1": 4.0},
+    "ko_LL18_2": {"AT1G01010.1": 2.0, "AT1G01020.1": 5.0,
+                  "AT1G01030.1": 4.0},
+    "ko_LL18_3": {"AT1G01010.1": 3.0, "AT1G01020.1": 6.0,
+                  "AT1G01030.1": 4.0},
+    "wt_LL18_1": {"AT1G01010.1": 10.0, "AT1G01020.1": 5.0,
+                  "AT1G01030.1": 4.0},
+    "wt_LL18_2": {"AT1G01010.1": 14.0, "AT1G01020.1": 6.0,
+                  "AT1G01030.1": 4.0},
+}
+
+
+@pytest.fixture(autouse=True)
+def reset_singleton():
+    ExpressionDataManager._instance = None
+
+
+@pytest.fixture
+def data_manager(tmp_path):
+    for sample, rows in SAMPLES.items():
+        (tmp_path / sample).mkdir()
+        lines = ["Name\tTPM"] + [f"{name}\t{tpm}" for name, tpm in rows.items()]
+        (tmp_path / sample / "quant.sf").write_text("\n".join(lines))
+    manager = ExpressionDataManager(quant_path=str(tmp_path))
+    manager.load_expression_matrix()
+    return manager
+
+
+def test_regularized_beta_matches_closed_forms():
+    x = np.array([0.0, 0.1, 0.4, 0.9, 1.0])
+
+    np.testing.assert_allclose(regularized_beta(1, 1, x), x)
+    np.testing.assert_allclose(regularized_beta(2, 3, 0.4), 0.5248)
+    np.testing.assert_allclose(regularized_beta(0.5, 0.5, 0.25), 1 / 3)
+    assert np.isnan(regularized_beta(1, 1, 1.5))
+
+
+def test_t_test_p_values_match_reference_values():
+    p_values = t_test_p_values([2.0, 1.0, 0.0, 3.5], [10, 1, 5, 100])
+
+    np.testing.assert_allclose(p_values, [0.0733880348, 0.5, 1.0, 0.000696427717],
+                               rtol=1e-7)
+
+
+def test_welch_t_test():
+    a = np.array([1.0, 2.0, 3.0])
+    b = np.array([10.0, 14.0])
+    t, df, p_value = welch_t_test(a.mean(), a.std(ddof=1), 3,
+                                  b.mean(), b.std(ddof=1), 2)
+
+    se2 = a.var(ddof=1) / 3 + b.var(ddof=1) / 2
+    assert t == pytest.approx((2 - 12) / math.sqrt(se2))
+    assert df == pytest.approx(se2 ** 2 / ((1 / 3) ** 2 / 2 + 4 ** 2 / 1))
+    assert p_value == t_test_p_values(t, df)
+    assert 0.05 < p_value < 0.2
+
+
+def test_welch_t_test_without_variance_is_nan():
+    t, df, p_value = welch_t_test(np.array([1.0]), np.array([0.0]), 2,
+                                  np.array([2.0]), np.array([0.0]), 2)
+
+    assert np.isnan(t).all() and np.isnan(df).all() and np.isnan(p_value).all()
+
+
+def test_benjamini_hochberg():
+    q_values = benjamini_hochberg([0.01, 0.04, np.nan, 0.03, 0.5])
+
+    np.testing.assert_allclose(q_values,
+                               [0.04, 0.04 * 4 / 3, np.nan, 0.04 * 4 / 3, 0.5])
+
+
+def test_genotype_comparisons_against_reference():
+    groups = {"ko": ["ko_LL18", "ko_LL24"], "ox": ["ox_LL18"], "wt": ["wt_LL18"]}
+
+    assert reference_genotype(groups) == "wt"
+    assert genotype_comparisons(groups) == [("ko_LL18", "wt_LL18"),
+                                            ("ox_LL18", "wt_LL18")]
+    assert reference_genotype(["ko", "ox"]) == "ko"
+    assert genotype_comparisons({}) == []
+
+
+def test_differential_expression_of_genes(data_manager):
+    results = data_manager.get_differential_expression("ko_LL18", "wt_LL18")
+
+    assert list(results["gene"]) == ["AT1G01010", "AT1G01020", "AT1G01030"]
+    first = results.iloc[0]
+    assert first["mean"] == pytest.approx(2.0)
+    assert first["reference_mean"] == pytest.approx(12.0)
+    assert first["log2_fold_change"] == pytest.approx(math.log2(3 / 13))
+    assert first["df"] == pytest.approx((1 / 3 + 4) ** 2 / ((1 / 3) ** 2 / 2 + 16))
+    assert results["q_value"].iloc[:2].notna().all()
+    assert np.isnan(results["p_value"].iloc[2])
+    assert data_manager.get_differential_expression("ko_LL18", "wt_LL18") is results
+
+
+def test_differential_expression_rejects_unknown_groups(data_manager):
+    with pytest.raises(KeyError):
+        data_manager.get_differential_expression("ox_LL18", "wt_LL18")
+
+
+def test_de_table_pages_and_sorts(data_manager):
+    rows, page_count = update_de_table(
+        "ko_LL18|wt_LL18", 0, 1, [{"column_id": "mean", "direction": "desc"}])
+
+    assert page_count == 3
+    assert [row["gene"] for row in rows] == ["AT1G01020"]
+    rows, _ = update_de_table("ko_LL18|wt_LL18", 1, 1, [])
+    assert [row["gene"] for row in rows] == ["AT1G01020"]
+    assert update_de_table(None, 0, 20, []) == ([], 0)
+
+
+def test_de_table_replaces_missing_values(data_manager):
+    rows, _ = update_de_table("ko_LL18|wt_LL18", 0, 20, [])
+
+    assert rows[2]["t"] is None
+    assert rows[2]["log2_fold_change"] == 0.0
+
+
+
+@pytest.mark.parametrize("store", [None, "cache_dir", "shared_store", "gene_store"])
+def test_replicate_counts_are_stored_with_the_matrix(tmp_path_factory, store):
+    quant_dir = tmp_path_factory.mktemp("quant")
+    for sample, rows in SAMPLES.items():
+        (quant_dir / sample).mkdir()
+        lines = ["Name\tTPM"] + [f"{name}\t{tpm}" for name, tpm in rows.items()]
+        (quant_dir / sample / "quant.sf").write_text("\n".join(lines))
+    (quant_dir / "wt_LL18_3").mkdir()
+    options = {} if store is None else {store: str(tmp_path_factory.mktemp(store))}
+    first = ExpressionDataManager(quant_path=str(quant_dir), **options)
+    matrices = [first.load_expression_matrix()]
+    ExpressionDataManager._instance = None
+    manager = ExpressionDataManager(quant_path=str(quant_dir), **options)
+    matrices.append(manager.load_expression_matrix())
+
+    (quant_dir / "ko_LL18_4").mkdir()
+    assert manager.get_replicate_counts() == {"ko_LL18": 3, "wt_LL18": 2}
+    for matrix in matrices:
+        if hasattr(matrix, "close"):
+            matrix.close()
+
+
+def test_missing_replicate_counts_raise(data_manager):
+    matrix = data_manager.load_expression_matrix()
+    matrix.counts = None
+
+    with pytest.raises(ValueError):
+        data_manager.get_replicate_counts()
+    with pytest.raises(ValueError):
+        data_manager.get_differential_expression("ko_LL18", "wt_LL18")
+
+
+def test_replicate_counts_follow_watched_changes(data_manager):
+    ExpressionDataManager._instance = None
+    manager = ExpressionDataManager(quant_path=data_manager.quant_path, watch=True)
+    manager.load_expression_matrix()
+    new = manager.quant_path + "/wt_LL18_3"
+    Path(new).mkdir()
+    (Path(new) / "quant.sf").write_text("Name\tTPM\nAT1G01010.1\t12.0")
+
+    manager.reload_changed_samples()
+
+    assert manager.get_replicate_counts() == {"ko_LL18": 3, "wt_LL18": 3}
@@ -1,146 +1,159 @@
-import base64
 from unittest.mock import patch
 
-import plotly.graph_objects as go
 import pytest
+from flask import Flask
 
-from app.layout import download_pdf, download_png, download_svg
+from app.data_loader import ExpressionDataManager
+from app.export import image_cache, register_downloads
+from app.figures import figure_cache
+from app.layout import update_expression_plot
+from app.renderer import RendererQueueFull
 
 sample_gene = "AT1G01010"
 
+QUANT_CONTENT = (
+    "Name\tLength\tEffectiveLength\tTPM\tNumReads\n"
+    "AT1G01010.1\t1749\t1430.305\t{tpm}\t24\n"
+    "AT1G01010.2\t1749\t1430.305\t1.5\t24\n"
+)
+
+
+@pytest.fixture(autouse=True)
+def sample_data(tmp_path):
+    ExpressionDataManager._instance = None
+    figure_cache.clear()
+    image_cache.clear()
+    for i, sample in enumerate(["ko_LL18_1", "ko_LL18_2", "wt_LL18_1", "wt_LL18_2"]):
+        folder = tmp_path / sample
+        folder.mkdir()
+        (folder / "quant.sf").write_text(QUANT_CONTENT.format(tpm=i + 1))
+    ExpressionDataManager(None, str(tmp_path)).load_quant_data()
+    yield
+    ExpressionDataManager._instance = None
+
+
 @pytest.fixture
-def sample_figure():
-    """Create a sample figure for testing"""
-    fig = go.Figure()
-    fig.add_trace(go.Scatter(
-        x=[1, 2, 3, 4],
-        y=[10, 11, 12, 13],
-        mode='lines+markers',
-        name='Test Data'
-    ))
-    fig.update_layout(
-        title='Test Plot',
-        xaxis_title='X Axis',
-        yaxis_title='Y Axis'
-    )
-    return fig.to_dict()
-
-
-def test_download_svg_none_clicks(sample_figure):
-    result = download_svg(None, sample_figure, sample_gene)
-    assert result is None
-
-def test_download_svg_no_clicks(sample_figure):
-    result = download_svg(0, sample_figure, sample_gene)
-    assert result is None
-
-def test_download_svg_no_figure():
-    result = download_svg(1, None, sample_gene)
-    assert result is None
+def client():
+    server = Flask(__name__)
+    register_downloads(server)
+    return server.test_client()
+
+
+def test_download_unknown_format(client):
+    assert client.get(f"/download/gif/{sample_gene}").status_code == 404
+
 
 @patch('plotly.io.to_image')
-def test_download_svg_success(mock_to_image, sample_figure):
-    mock_svg_content = b'<svg>test svg content</svg>'
-    mock_to_image.return_value = mock_svg_content
+def test_download_unknown_gene(mock_to_image, client):
+    response = client.get("/download/svg/AT9G99999")
 
-    result = download_svg(1, sample_figure, sample_gene)
+    assert response.status_code == 404
+    mock_to_image.assert_not_called()
 
-    assert isinstance(result, dict)
-    assert result['content'] == base64.b64encode(mock_svg_content).decode()
-    assert result['filename'] == f"expression_plot_{sample_gene}.svg"
-    assert result['type'] == "image/svg+xml"
+
+@pytest.mark.parametrize("fmt, mimetype, scale", [
+    ("svg", "image/svg+xml", 1),
+    ("png", "image/png", 2),
+    ("pdf", "application/pdf", 1),
+])
+@patch('plotly.io.to_image')
+def test_download_success(mock_to_image, client, fmt, mimetype, scale):
+    mock_to_image.return_value = b'fake image binary data'
+
+    response = client.get(f"/download/{fmt}/{sample_gene}")
+
+    assert response.status_code == 200
+    assert response.data == b'fake image binary data'
+    assert response.mimetype == mimetype
+    assert response.headers["Content-Disposition"] == \
+        f"attachment; filename=expression_plot_{sample_gene}.{fmt}"
 
     mock_to_image.assert_called_once()
     call_args = mock_to_image.call_args
-    assert call_args[1]['format'] == 'svg'
+    assert call_args[1]['format'] == fmt
     assert call_args[1]['width'] == 1000
     assert call_args[1]['height'] == 400
+    assert call_args[1]['scale'] == scale
+
 
 @patch('plotly.io.to_image')
-def test_download_svg_no_gene_name(mock_to_image, sample_figure):
-    mock_svg_content = b'<svg>test svg content</svg>'
-    mock_to_image.return_value = mock_svg_content
+def test_download_renders_figure_from_data(mock_to_image, client):
+    mock_to_image.return_value = b'<svg></svg>'
 
-    result = download_svg(1, sample_figure, None)
+    client.get(f"/download/svg/{sample_gene}")
 
-    assert result['filename'] == "expression_plot_plot.svg"
+    fig = mock_to_image.call_args[0][0]
+    assert fig.layout.title.text == f"Expression Profile: {sample_gene}"
 
-def test_download_png_none_clicks(sample_figure):
-    result = download_png(None, sample_figure, sample_gene)
-    assert result is None
 
-def test_download_png_no_clicks(sample_figure):
-    # Test with 0 clicks
-    result = download_png(0, sample_figure, sample_gene)
-    assert result is None
+@patch('plotly.io.to_image')
+def test_download_uses_cached_figure(mock_to_image, client):
+    mock_to_image.return_value = b'<svg></svg>'
+    update_expression_plot(sample_gene)
 
-def test_download_png_no_figure():
-    result = download_png(1, None, sample_gene)
-    assert result is None
+    with patch('app.export.build_expression_figure') as build:
+        client.get(f"/download/svg/{sample_gene}")
+
+    build.assert_not_called()
+    fig = mock_to_image.call_args[0][0]
+    assert fig["layout"]["title"]["text"] == f"Expression Profile: {sample_gene}"
 
-@patch('plotly.io.to_image')
-def test_download_png_success(mock_to_image, sample_figure):
-    mock_png_content = b'fake png binary data'
-    mock_to_image.return_value = mock_png_content
 
-    result = download_png(1, sample_figure, sample_gene)
+@patch('plotly.io.to_image')
+def test_repeated_download_served_from_image_cache(mock_to_image, client):
+    mock_to_image.return_value = b'<svg></svg>'
 
-    assert isinstance(result, dict)
-    assert result['content'] == base64.b64encode(mock_png_content).decode()
-    assert result['filename'] == f"expression_plot_{sample_gene}.png"
-    assert result['type'] == "image/png"
+    first = client.get(f"/download/svg/{sample_gene}")
+    second = client.get(f"/download/svg/{sample_gene}")
 
+    assert first.data == second.data
     mock_to_image.assert_called_once()
-    call_args = mock_to_image.call_args
-    assert call_args[1]['format'] == 'png'
-    assert call_args[1]['width'] == 1000
-    assert call_args[1]['height'] == 400
-    assert call_args[1]['scale'] == 2
+    assert image_cache.stats()["hits"] == 1
+
 
 @patch('plotly.io.to_image')
-def test_download_png_no_gene_name(mock_to_image, sample_figure):
-    mock_png_content = b'fake png binary data'
-    mock_to_image.return_value = mock_png_content
+def test_image_cache_keyed_by_format(mock_to_image, client):
+    mock_to_image.return_value = b'image'
+
+    client.get(f"/download/svg/{sample_gene}")
+    client.get(f"/download/pdf/{sample_gene}")
 
-    result = download_png(1, sample_figure, None)
+    assert mock_to_image.call_count == 2
 
-    assert result['filename'] == "expression_plot_plot.png"
 
-def test_download_pdf_none_clicks(sample_figure):
-    result = download_pdf(None, sample_figure, sample_gene)
-    assert result is None
+def test_download_busy_renderer(client):
+    with patch('app.export.renderer_pool.render',
+               side_effect=RendererQueueFull("busy")):
+        response = client.get(f"/download/png/{sample_gene}")
 
-def test_download_pdf_no_clicks(sample_figure):
-    result = download_pdf(0, sample_figure, sample_gene)
-    assert result is None
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "5"
 
-def test_download_pdf_no_figure():
-    result = download_pdf(1, None, sample_gene)
-    assert result is None
 
 @patch('plotly.io.to_image')
-def test_download_pdf_success(mock_to_image, sample_figure):
-    mock_pdf_content = b'fake pdf binary data'
-    mock_to_image.return_value = mock_pdf_content
+def test_download_follows_plot_options(mock_to_image, client):
+    mock_to_image.return_value = b'<svg></svg>'
 
-    result = download_pdf(1, sample_figure, sample_gene)
+    client.get(f"/download/svg/{sample_gene}")
+    client.get(f"/download/svg/{sample_gene}"
+               "?log=1&error=sem&rows=isoforms&genotypes=wt")
 
-    assert isinstance(result, dict)
-    assert result['content'] == base64.b64encode(mock_pdf_content).decode()
-    assert result['filename'] == f"expression_plot_{sample_gene}.pdf"
-    assert result['type'] == "application/pdf"
+    assert mock_to_image.call_count == 2
+    fig = mock_to_image.call_args[0][0]
+    assert fig.layout.yaxis.type == "log"
+    assert fig.layout.yaxis.title.text == "mean/SEM TPM"
+    assert [trace.name for trace in fig.data if trace.visible] == [
+        "AT1G01010.1", "AT1G01010.2"]
 
-    mock_to_image.assert_called_once()
-    call_args = mock_to_image.call_args
-    assert call_args[1]['format'] == 'pdf'
-    assert call_args[1]['width'] == 1000
-    assert call_args[1]['height'] == 400
 
 @patch('plotly.io.to_image')
-def test_download_pdf_no_gene_name(mock_to_image, sample_figure):
-    mock_pdf_content = b'fake pdf binary data'
-    mock_to_image.return_value = mock_pdf_content
+def test_download_uses_cached_figure_of_the_same_view(mock_to_image, client):
+    mock_to_image.return_value = b'<svg></svg>'
+    update_expression_plot(sample_gene, False, True, "sem")
 
-    result = download_pdf(1, sample_figure, None)
+    with patch('app.export.build_expression_figure') as build:
+        client.get(f"/download/svg/{sample_gene}?log=1&error=sem")
 
-    assert result['filename'] == "expression_plot_plot.pdf"
+    build.assert_not_called()
+    fig = mock_to_image.call_args[0][0]
+    assert fig["layout"]["yaxis"]["type"] == "log"
@@ -0,0 +1,65 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.expression_matrix import ExpressionMatrix
+
+
+@pytest.fixture
+def matrix():
+    rows = pd.Index(["AT1G01010", "AT1G01010.1", "AT1G01010.2", "AT1G01020.1"])
+    groups = pd.Index(["ko_LL18", "ox_LL18"])
+    values = np.arange(16, dtype=np.float32).reshape(2, 4, 2)
+    return ExpressionMatrix(rows, groups, values)
+
+
+def test_frame_is_a_view_of_the_values(matrix):
+    frame = matrix.frame
+
+    assert frame.loc[("AT1G01010.2", "mean"), "ox_LL18"] == 5
+    assert frame.loc[("AT1G01010.2", "std"), "ox_LL18"] == 13
+    assert np.shares_memory(frame.to_numpy(), matrix.values)
+
+
+def test_frame_round_trip(matrix):
+    restored = ExpressionMatrix.from_frame(matrix.frame, np.float32)
+
+    pd.testing.assert_index_equal(restored.rows, matrix.rows)
+    pd.testing.assert_index_equal(restored.groups, matrix.groups)
+    np.testing.assert_array_equal(restored.values, matrix.values)
+
+
+def test_isoform_index_groups_rows_by_gene(matrix):
+    assert matrix.isoform_index == {
+        "AT1G01010": ["AT1G01010", "AT1G01010.1", "AT1G01010.2"],
+        "AT1G01020": ["AT1G01020.1"],
+    }
+
+
+def test_block_returns_requested_rows(matrix):
+    means, stds = matrix.block(["AT1G01020.1", "AT1G01010.1"])
+
+    np.testing.assert_array_equal(means, [[6, 7], [2, 3]])
+    np.testing.assert_array_equal(stds, [[14, 15], [10, 11]])
+
+
+def test_block_rejects_unknown_rows(matrix):
+    with pytest.raises(KeyError):
+        matrix.block(["AT9G99999.1"])
+
+
+def test_rejects_mismatched_shape():
+    with pytest.raises(ValueError):
+        ExpressionMatrix(pd.Index(["a"]), pd.Index(["g"]), np.zeros((2, 2, 1)))
+
+
+def test_counts_round_trip(matrix):
+    counted = ExpressionMatrix(matrix.rows, matrix.groups, matrix.values,
+                               np.array([3, 2]))
+
+    restored = ExpressionMatrix.from_frame(counted.frame, np.float32,
+                                           counted.count_series)
+
+    assert restored.count_series.to_dict() == {"ko_LL18": 3, "ox_LL18": 2}
+    with pytest.raises(ValueError):
+        ExpressionMatrix(matrix.rows, matrix.groups, matrix.values, np.array([3]))
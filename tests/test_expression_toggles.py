@@ -0,0 +1,152 @@
+import numpy as np
+import pytest
+from dash import no_update
+
+from app.data_loader import ExpressionDataManager
+from app.figures import build_expression_figure, build_expression_patch, figure_cache
+from app.layout import restyle_expression_plot, update_expression_plot
+
+SAMPLES = {
+    "ko_LL18_1": {"AT1G01010.1": 1.0, "AT1G01010.2": 2.0},
+    "ko_LL18_2": {"AT1G01010.1": 3.0, "AT1G01010.2": 6.0},
+    "wt_LL18_1": {"AT1G01010.1": 10.0, "AT1G01010.2": 20.0},
+    "wt_LL18_2": {"AT1G01010.1": 14.0, "AT1G01010.2": 30.0},
+    "wt_LL18_3": {"AT1G01010.1": 12.0, "AT1G01010.2": 40.0},
+}
+
+
+@pytest.fixture(autouse=True)
+def reset_singleton():
+    ExpressionDataManager._instance = None
+    figure_cache.clear()
+    yield
+    figure_cache.clear()
+
+
+@pytest.fixture
+def data_manager(tmp_path):
+    for sample, rows in SAMPLES.items():
+        (tmp_path / sample).mkdir()
+        lines = ["Name\tTPM"] + [f"{name}\t{tpm}" for name, tpm in rows.items()]
+        (tmp_path / sample / "quant.sf").write_text("\n".join(lines))
+    manager = ExpressionDataManager(quant_path=str(tmp_path), replicates=True)
+    manager.load_expression_matrix()
+    return manager
+
+
+def apply_patch(fig, patch):
+    for operation in patch.to_plotly_json()["operations"]:
+        location = operation["location"]
+        if location[0] == "data":
+            target, path = fig.data[location[1]], location[2:]
+        else:
+            target, path = fig.layout, location[1:]
+        if operation["operation"] == "Delete":
+            target[tuple(path)] = None
+        else:
+            assert operation["operation"] == "Assign"
+            target[tuple(path)] = operation["params"]["value"]
+    return fig
+
+
+def test_log_scale_uses_autorange(data_manager):
+    fig = build_expression_figure(data_manager, "AT1G01010", log_y=True)
+
+    assert fig.layout.yaxis.type == "log"
+    assert fig.layout.yaxis.autorange is True
+
+
+def test_sem_divides_sd_by_replicate_count(data_manager):
+    sd = build_expression_figure(data_manager, "AT1G01010")
+    sem = build_expression_figure(data_manager, "AT1G01010", error="sem")
+
+    np.testing.assert_allclose(sem.data[0].error_y.array,
+                               sd.data[0].error_y.array / np.sqrt(2))
+    np.testing.assert_allclose(sem.data[1].error_y.array,
+                               sd.data[1].error_y.array / np.sqrt(3))
+    assert sem.layout.yaxis.title.text == "mean/SEM TPM"
+
+
+def test_rows_and_genotypes_hide_traces(data_manager):
+    fig = build_expression_figure(data_manager, "AT1G01010", True, rows=["gene"],
+                                  genotypes=["wt"])
+
+    visible = {(trace.name, trace.x[0] < 1.5): trace.visible for trace in fig.data
+               if trace.mode == "lines+markers"}
+    assert visible == {
+        ("AT1G01010.1", True): False, ("AT1G01010.1", False): False,
+        ("AT1G01010.2", True): False, ("AT1G01010.2", False): False,
+        ("AT1G01010", True): False, ("AT1G01010", False): True,
+    }
+    wt_total = np.array([30.0, 44.0, 52.0])
+    assert fig.layout.yaxis.range[1] == pytest.approx(
+        (wt_total.mean() + wt_total.std(ddof=1)) * 1.1)
+    ko = build_expression_figure(data_manager, "AT1G01010", True, genotypes=["ko"])
+    assert ko.layout.yaxis.range[1] == pytest.approx((6 + np.sqrt(18)) * 1.1)
+
+
+def test_legend_follows_first_visible_genotype(data_manager):
+    fig = build_expression_figure(data_manager, "AT1G01010", genotypes=["wt"])
+
+    legend = [trace.name for trace in fig.data if trace.visible and trace.showlegend]
+    assert legend == ["AT1G01010.1", "AT1G01010.2", "AT1G01010"]
+
+
+@pytest.mark.parametrize("changed, view", [
+    ("log_y", {"log_y": True}),
+    ("error", {"error": "sem"}),
+    ("rows", {"rows": ["isoforms"]}),
+    ("genotypes", {"genotypes": ["ko"], "error": "sem"}),
+    ("genotypes", {"genotypes": ["wt"]}),
+])
+def test_patch_matches_full_redraw(data_manager, changed, view):
+    start = {key: value for key, value in view.items() if key != changed}
+    base = build_expression_figure(data_manager, "AT1G01010", True, **start)
+    patch = build_expression_patch(data_manager, "AT1G01010", True,
+                                   changed=[changed], **view)
+    expected = build_expression_figure(data_manager, "AT1G01010", True, **view)
+
+    patched = apply_patch(base, patch)
+
+    assert [trace.visible for trace in patched.data] == \
+        [trace.visible for trace in expected.data]
+    assert [trace.showlegend for trace in patched.data] == \
+        [trace.showlegend for trace in expected.data]
+    for trace, other in zip(patched.data, expected.data):
+        if other.error_y.array is not None:
+            np.testing.assert_allclose(trace.error_y.array, other.error_y.array)
+    assert patched.layout.yaxis == expected.layout.yaxis
+
+
+def test_patch_only_sends_changed_properties(data_manager):
+    patch = build_expression_patch(data_manager, "AT1G01010", log_y=True,
+                                   changed=["log_y"])
+
+    locations = [operation["location"]
+                 for operation in patch.to_plotly_json()["operations"]]
+    assert locations == [["layout", "yaxis", "type"],
+                         ["layout", "yaxis", "autorange"],
+                         ["layout", "yaxis", "range"]]
+
+
+def test_restyle_callback(data_manager):
+    assert restyle_expression_plot(True, "sd", ["isoforms"], None, None) is no_update
+    assert restyle_expression_plot(True, "sd", ["isoforms"], None,
+                                   "AT9G99999") is no_update
+
+    patch = restyle_expression_plot(False, "sem", ["isoforms"], ["ko", "wt"],
+                                    "AT1G01010")
+
+    locations = {tuple(operation["location"][-2:])
+                 for operation in patch.to_plotly_json()["operations"]}
+    assert ("error_y", "array") in locations and ("yaxis", "range") in locations
+
+
+def test_expression_plot_uses_current_toggles(data_manager):
+    fig = update_expression_plot("AT1G01010", False, True, "sem", ["gene"], ["wt"])
+
+    assert fig.layout.yaxis.type == "log"
+    assert [trace.visible for trace in fig.data] == [False, False, False, False,
+                                                     False, True]
+    assert update_expression_plot("AT1G01010")["layout"]["yaxis"]["type"] == "linear"
+    assert figure_cache.stats()["entries"] == 2
@@ -0,0 +1,72 @@
+import pandas as pd
+import pytest
+
+from app.gene_search import GeneSearchIndex, gene_options
+
+
+@pytest.fixture
+def annotation_df():
+    return pd.DataFrame({
+        "AGI": ["AT1G01010", "AT1G01020", "AT1G10100", "AT2G01010", "AT3G55555"],
+        "Name": ["NAC001", "ARV1", None, "Photosystem II", "ANAC domain protein"],
+    })
+
+
+def test_gene_options_labels(annotation_df):
+    options = gene_options(annotation_df)
+    assert options[0] == {"label": "AT1G01010; NAC001", "value": "AT1G01010"}
+    assert options[2] == {"label": "AT1G10100; Unknown", "value": "AT1G10100"}
+
+
+def test_gene_options_empty_annotation():
+    assert gene_options(pd.DataFrame()) == []
+
+
+def test_search_agi_prefix(annotation_df):
+    index = GeneSearchIndex(annotation_df)
+    values = [opt["value"] for opt in index.search("AT1G010")]
+    assert values == ["AT1G01010", "AT1G01020"]
+
+
+def test_search_is_case_insensitive(annotation_df):
+    index = GeneSearchIndex(annotation_df)
+    assert [opt["value"] for opt in index.search("at2g")] == ["AT2G01010"]
+    assert [opt["value"] for opt in index.search("photo")] == ["AT2G01010"]
+
+
+def test_search_prefix_matches_rank_before_substring(annotation_df):
+    index = GeneSearchIndex(annotation_df)
+    values = [opt["value"] for opt in index.search("nac")]
+    assert values == ["AT1G01010", "AT3G55555"]
+
+    values = [opt["value"] for opt in index.search("at1g0101")]
+    assert values == ["AT1G01010"]
+
+
+def test_search_substring_in_name(annotation_df):
+    index = GeneSearchIndex(annotation_df)
+    assert [opt["value"] for opt in index.search("system")] == ["AT2G01010"]
+
+
+def test_search_substring_in_agi(annotation_df):
+    index = GeneSearchIndex(annotation_df)
+    values = [opt["value"] for opt in index.search("01010")]
+    assert values == ["AT1G01010", "AT2G01010"]
+
+
+def test_search_respects_limit(annotation_df):
+    index = GeneSearchIndex(annotation_df)
+    assert len(index.search("at", limit=2)) == 2
+
+
+def test_search_empty_query(annotation_df):
+    index = GeneSearchIndex(annotation_df)
+    assert index.search("") == []
+    assert index.search("   ") == []
+    assert index.search(None) == []
+
+
+def test_search_does_not_match_across_columns(annotation_df):
+    index = GeneSearchIndex(annotation_df)
+    assert index.search("01010nac") == []
+    assert index.search("01010\tnac") == []
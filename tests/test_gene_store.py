@@ -0,0 +1,124 @@
+from unittest.mock import patch
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.data_loader import ExpressionDataManager
+from app.expression_matrix import ExpressionMatrix
+from app.figures import build_expression_figure
+from app.gene_store import GeneStore, load_gene_store, store_gene_chunks
+
+QUANT_CONTENT = (
+    "Name\tLength\tEffectiveLength\tTPM\tNumReads\n"
+    "AT1G01010.1\t1749\t1430.305\t{tpm}\t24\n"
+    "AT1G01010.2\t1749\t1430.305\t1.5\t24\n"
+    "AT2G01020.1\t1749\t1430.305\t3.5\t24\n"
+    "AT1G01030.1\t1749\t1430.305\t{tpm}\t24\n"
+)
+
+
+@pytest.fixture
+def quant_dir(tmp_path):
+    quant_path = tmp_path / "quant"
+    for i, sample in enumerate(["ko_LL18_1", "ko_LL18_2", "wt_LL18_1", "wt_LL18_2"]):
+        folder = quant_path / sample
+        folder.mkdir(parents=True)
+        (folder / "quant.sf").write_text(QUANT_CONTENT.format(tpm=i + 1))
+    return quant_path
+
+
+@pytest.fixture
+def matrix():
+    rows = pd.Index(["AT2G01020.1", "AT1G01010.1", "AT1G01010.2",
+                     "AT2G01020", "AT1G01010"])
+    groups = pd.Index(["ko_LL18", "wt_LL18"])
+    return ExpressionMatrix(rows, groups, np.arange(20.0).reshape(2, 5, 2),
+                            np.array([3, 2]))
+
+
+@pytest.fixture(autouse=True)
+def reset_singleton():
+    ExpressionDataManager._instance = None
+    opened = []
+    original_init = GeneStore.__init__
+
+    def tracking_init(self, path):
+        original_init(self, path)
+        opened.append(self)
+
+    with patch.object(GeneStore, "__init__", tracking_init):
+        yield
+    for store in opened:
+        store.close()
+
+
+def test_store_groups_rows_by_gene(tmp_path, matrix):
+    store_gene_chunks(tmp_path, "abc", matrix)
+    store = load_gene_store(tmp_path, "abc")
+
+    assert list(store.rows) == ["AT1G01010.1", "AT1G01010.2", "AT1G01010",
+                                "AT2G01020.1", "AT2G01020"]
+    assert store.isoform_index == matrix.isoform_index
+    pd.testing.assert_frame_equal(store.frame.sort_index(),
+                                  matrix.frame.sort_index())
+
+
+def test_block_reads_only_requested_rows(tmp_path, matrix):
+    store_gene_chunks(tmp_path, "abc", matrix)
+    store = load_gene_store(tmp_path, "abc")
+    labels = ["AT1G01010", "AT1G01010.1"]
+
+    means, stds = store.block(labels)
+
+    expected_means, expected_stds = matrix.block(labels)
+    np.testing.assert_array_equal(means, expected_means)
+    np.testing.assert_array_equal(stds, expected_stds)
+    with pytest.raises(KeyError):
+        store.block(["AT9G99999.1"])
+
+
+def test_load_rejects_other_fingerprint(tmp_path, matrix):
+    store_gene_chunks(tmp_path, "abc", matrix)
+
+    assert load_gene_store(tmp_path, "def") is None
+
+
+def test_load_rejects_store_without_counts(tmp_path, matrix):
+    matrix.counts = None
+    store_gene_chunks(tmp_path, "abc", matrix)
+
+    assert load_gene_store(tmp_path, "abc") is None
+
+
+def test_manager_serves_genes_without_materializing(quant_dir, tmp_path):
+    expected = ExpressionDataManager(None, str(quant_dir)).load_quant_data()
+    ExpressionDataManager._instance = None
+
+    manager = ExpressionDataManager(None, str(quant_dir),
+                                    gene_store=str(tmp_path / "genes"))
+    with patch.object(GeneStore, "frame") as frame:
+        store = manager.load_expression_matrix()
+        fig = build_expression_figure(manager, "AT1G01010")
+
+    assert isinstance(store, GeneStore)
+    assert not frame.mock_calls
+    assert [trace.name for trace in fig.data[::2]] == [
+        "AT1G01010.1", "AT1G01010.2", "AT1G01010"]
+    np.testing.assert_array_equal(
+        fig.data[0].y, expected.loc[("AT1G01010.1", "mean"), ["ko_LL18"]])
+    pd.testing.assert_frame_equal(manager.load_quant_data().sort_index(),
+                                  expected.sort_index())
+
+
+def test_second_worker_opens_existing_store(quant_dir, tmp_path):
+    ExpressionDataManager(None, str(quant_dir),
+                          gene_store=str(tmp_path)).load_expression_matrix()
+    ExpressionDataManager._instance = None
+
+    manager = ExpressionDataManager(None, str(quant_dir), gene_store=str(tmp_path))
+    with patch.object(ExpressionDataManager, "_aggregate_quant_data") as aggregate:
+        manager.load_expression_matrix()
+
+    aggregate.assert_not_called()
+    assert manager.get_isoforms_for_gene("AT2G01020") == ["AT2G01020.1", "AT2G01020"]
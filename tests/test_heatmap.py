@@ -0,0 +1,99 @@
+import numpy as np
+import pytest
+
+from app.data_loader import ExpressionDataManager
+from app.figures import _downsample_rows, _scale_heatmap, build_heatmap_figure
+from app.layout import figure_cache, update_heatmap
+
+SAMPLES = {
+    "ko_LL18_1": {"AT1G01010.1": 1.0, "AT1G01010.2": 3.0, "AT1G01020.1": 0.0},
+    "ko_LL18_2": {"AT1G01010.1": 3.0, "AT1G01010.2": 1.0, "AT1G01020.1": 2.0},
+    "wt_LL18_1": {"AT1G01010.1": 7.0, "AT1G01010.2": 5.0, "AT1G01020.1": 6.0},
+}
+
+
+@pytest.fixture(autouse=True)
+def reset_singleton():
+    ExpressionDataManager._instance = None
+    figure_cache.clear()
+    yield
+    figure_cache.clear()
+
+
+@pytest.fixture
+def data_manager(tmp_path):
+    for sample, rows in SAMPLES.items():
+        (tmp_path / sample).mkdir()
+        lines = ["Name\tTPM"] + [f"{name}\t{tpm}" for name, tpm in rows.items()]
+        (tmp_path / sample / "quant.sf").write_text("\n".join(lines))
+    manager = ExpressionDataManager(quant_path=str(tmp_path))
+    manager.load_expression_matrix()
+    return manager
+
+
+def test_heatmap_shows_gene_means(data_manager):
+    fig = build_heatmap_figure(data_manager, ["AT1G01020", "AT1G01010"])
+
+    heatmap = fig.data[0]
+    assert list(heatmap.x) == ["ko_LL18", "wt_LL18"]
+    assert list(heatmap.y) == ["AT1G01020", "AT1G01010"]
+    np.testing.assert_allclose(np.asarray(heatmap.z), [[1.0, 6.0], [4.0, 12.0]])
+    assert fig.layout.title.text == "Expression Heatmap: 2 genes"
+
+
+def test_heatmap_reports_missing_genes(data_manager):
+    fig = build_heatmap_figure(data_manager, ["AT1G01010", "AT9G99999"])
+
+    assert list(fig.data[0].y) == ["AT1G01010"]
+    assert "1 not found" in fig.layout.title.text
+
+
+def test_heatmap_without_known_genes_is_empty(data_manager):
+    fig = build_heatmap_figure(data_manager, ["AT9G99999"])
+
+    assert fig.layout.annotations[0].text.startswith("No expression data")
+
+
+def test_log_and_zscore_scaling():
+    values = np.array([[0.0, 1.0, 3.0], [2.0, 2.0, np.nan]])
+
+    np.testing.assert_allclose(_scale_heatmap(values, "log")[0], [0.0, 1.0, 2.0])
+    zscores = _scale_heatmap(values, "zscore")
+    np.testing.assert_allclose(zscores[0].mean(), 0.0, atol=1e-12)
+    np.testing.assert_allclose(zscores[0].std(), 1.0)
+    np.testing.assert_array_equal(zscores[1], [0.0, 0.0, np.nan])
+    with pytest.raises(ValueError):
+        _scale_heatmap(values, "sqrt")
+
+
+def test_downsampling_averages_consecutive_rows():
+    values = np.arange(10, dtype=float).reshape(5, 2)
+    values[1, 0] = np.nan
+    labels = [f"G{i}" for i in range(5)]
+
+    binned, binned_labels = _downsample_rows(values, labels, 2)
+
+    np.testing.assert_allclose(binned, [[0.0, 2.0], [6.0, 7.0]])
+    assert binned_labels == ["G0 … G1 (2 genes)", "G2 … G4 (3 genes)"]
+
+
+def test_large_selection_is_downsampled(data_manager):
+    fig = build_heatmap_figure(data_manager, ["AT1G01010", "AT1G01020"], max_rows=1)
+
+    assert len(fig.data[0].y) == 1
+    assert "averaged into 1 rows" in fig.layout.title.text
+
+
+def test_update_heatmap_caches_figure(data_manager):
+    first = update_heatmap(1, "zscore", "AT1G01010\nAT1G01020")
+    second = update_heatmap(1, "zscore", "AT1G01010\nAT1G01020")
+
+    assert figure_cache.stats()["hits"] == 1
+    assert second["data"][0]["type"] == "heatmap"
+    assert first.data[0].y == tuple(second["data"][0]["y"])
+
+
+def test_update_heatmap_without_genes():
+    fig = update_heatmap(1, "linear", "  ")
+
+    assert fig.layout.annotations[0].text == "Paste gene IDs to show a heatmap"
@@ -3,9 +3,10 @@ from unittest.mock import MagicMock, patch
 import dash.html as html
 import pandas as pd
 import pytest
+from dash import no_update
 
 from app.data_loader import ExpressionDataManager
-from app.layout import create_layout
+from app.layout import create_layout, search_genes
 
 
 def make_mock_manager(annotation_df=None, quant_df=None):
@@ -90,6 +91,56 @@ def test_dropdown_null_gene_names(mock_manager_cls):
     actual_labels = [opt["label"] for opt in dropdown.options]
     assert actual_labels == expected_labels
 
+@patch("app.layout.ExpressionDataManager", autospec=True)
+def test_server_search_ships_no_options(mock_manager_cls):
+    annotation_df = pd.DataFrame({
+        "AGI": ["AT1G01010", "AT1G01020"],
+        "Name": ["GeneA", "GeneB"]
+    })
+    mock_manager = make_mock_manager(annotation_df=annotation_df)
+    mock_manager_cls.return_value = mock_manager
+
+    layout = create_layout("does_not_exist", "does_not_exist", server_search=True,
+                           search_limit=10)
+    dropdown = _find_component_by_id(layout.children, "gene-selector")
+    assert dropdown.options == []
+
+    config = _find_component_by_id(layout.children, "gene-search-config")
+    assert config.data == {"server_search": True, "limit": 10}
+    mock_manager.search_genes.assert_called_once()
+
+
+@patch("app.layout.ExpressionDataManager", autospec=True)
+def test_search_genes_callback_returns_matches(mock_manager_cls):
+    mock_manager = make_mock_manager()
+    mock_manager.search_genes.side_effect = lambda query, limit: [
+        {"label": f"{query.upper()}; GeneA", "value": query.upper()}
+    ][:limit]
+    mock_manager_cls.return_value = mock_manager
+
+    options = search_genes("at1g01010", None, {"server_search": True, "limit": 5})
+    assert options == [{"label": "AT1G01010; GeneA", "value": "AT1G01010"}]
+    mock_manager.search_genes.assert_called_once_with("at1g01010", 5)
+
+
+@patch("app.layout.ExpressionDataManager", autospec=True)
+def test_search_genes_callback_keeps_selected_gene(mock_manager_cls):
+    mock_manager = make_mock_manager()
+    mock_manager.search_genes.side_effect = lambda query, limit: [
+        {"label": f"{query}; Gene", "value": query}
+    ]
+    mock_manager_cls.return_value = mock_manager
+
+    options = search_genes("AT2G", "AT1G01010", {"server_search": True, "limit": 5})
+    assert [opt["value"] for opt in options] == ["AT2G", "AT1G01010"]
+
+
+def test_search_genes_callback_inactive_without_server_search():
+    assert search_genes("AT1G", None, {"server_search": False, "limit": 5}) \
+        is no_update
+    assert search_genes("", None, {"server_search": True, "limit": 5}) is no_update
+
+
 def _collect_ids(children):
     ids = []
     for child in children:
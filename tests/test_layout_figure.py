@@ -7,14 +7,15 @@ import plotly.graph_objects as go
 import pytest
 
 from app.data_loader import ExpressionDataManager
-from app.layout import update_expression_plot
+from app.layout import figure_cache, update_expression_plot
 
 
 @pytest.fixture(autouse=True)
 def reset_singleton():
     ExpressionDataManager._instance = None
-    ExpressionDataManager._expression_data = None
+    ExpressionDataManager._matrix = None
     ExpressionDataManager._annotation_data = None
+    figure_cache.clear()
 
 
 @pytest.fixture
@@ -49,6 +50,12 @@ def mock_data_manager(sample_expression_data):
             return []
 
     manager.get_isoforms_for_gene.side_effect = mock_get_isoforms
+
+    def mock_get_expression_block(isoforms):
+        return (sample_expression_data.xs("mean", level=1).loc[isoforms].to_numpy(),
+                sample_expression_data.xs("std", level=1).loc[isoforms].to_numpy())
+
+    manager.get_expression_block.side_effect = mock_get_expression_block
     return manager
 
 def test_empty_gene_selector_returns_empty_fig(mock_data_manager):
@@ -68,7 +75,7 @@ def test_successful_plot_generation_single_isoform(mock_data_manager):
     with patch('app.layout.ExpressionDataManager', return_value=mock_data_manager):
         result = update_expression_plot("GENE2")
 
-        mock_data_manager.load_quant_data.assert_called_once()
+        mock_data_manager.load_expression_matrix.assert_called_once()
         mock_data_manager.get_isoforms_for_gene.assert_called_once_with("GENE2")
         mock_data_manager.get_sample_groups.assert_called_once()
         mock_data_manager.get_groups_by_genotype.assert_called_once()
@@ -85,7 +92,7 @@ def test_successful_plot_generation_multiple_isoforms(mock_data_manager):
     with patch('app.layout.ExpressionDataManager', return_value=mock_data_manager):
         result = update_expression_plot("GENE1")
 
-        mock_data_manager.load_quant_data.assert_called_once()
+        mock_data_manager.load_expression_matrix.assert_called_once()
         mock_data_manager.get_isoforms_for_gene.assert_called_once_with("GENE1")
         mock_data_manager.get_sample_groups.assert_called_once()
         mock_data_manager.get_groups_by_genotype.assert_called_once()
@@ -122,3 +129,49 @@ def test_consistent_colors_across_isoforms(mock_data_manager):
 
         for isoform, colors in colors_by_isoform.items():
             assert len(colors) == 1
+
+def test_trace_values_match_expression_data(mock_data_manager, sample_expression_data):
+    with patch('app.layout.ExpressionDataManager', return_value=mock_data_manager):
+        result = update_expression_plot("GENE1")
+
+        wt_trace, ko_trace = result.data[0], result.data[1]
+        assert wt_trace.name == "GENE1.1"
+        np.testing.assert_allclose(
+            wt_trace.y,
+            sample_expression_data.loc[("GENE1.1", "mean"),
+                                       ['sample_WT_rep1', 'sample_WT_rep2']])
+        np.testing.assert_allclose(
+            ko_trace.error_y.array,
+            sample_expression_data.loc[("GENE1.1", "std"),
+                                       ['sample_KO_rep1', 'sample_KO_rep2']])
+
+        upper = (sample_expression_data.xs("mean", level=1)
+                 + sample_expression_data.xs("std", level=1)).loc[
+            ['GENE1.1', 'GENE1.2']].to_numpy().max()
+        assert result.layout.yaxis.range[1] == pytest.approx(upper * 1.1)
+
+
+def test_repeat_selection_served_from_cache(mock_data_manager):
+    mock_data_manager.fingerprint = "dataset-1"
+    with patch('app.layout.ExpressionDataManager', return_value=mock_data_manager):
+        first = update_expression_plot("GENE1")
+        second = update_expression_plot("GENE1")
+
+    mock_data_manager.load_expression_matrix.assert_called_once()
+    assert figure_cache.stats()["hits"] == 1
+    assert figure_cache.stats()["misses"] == 1
+    assert isinstance(second, dict)
+    assert go.Figure(second).layout.title.text == first.layout.title.text
+    assert [trace["name"] for trace in second["data"]] == \
+        [trace.name for trace in first.data]
+
+
+def test_cache_keyed_by_dataset_fingerprint(mock_data_manager):
+    with patch('app.layout.ExpressionDataManager', return_value=mock_data_manager):
+        mock_data_manager.fingerprint = "dataset-1"
+        update_expression_plot("GENE1")
+        mock_data_manager.fingerprint = "dataset-2"
+        result = update_expression_plot("GENE1")
+
+    assert isinstance(result, go.Figure)
+    assert mock_data_manager.load_expression_matrix.call_count == 2
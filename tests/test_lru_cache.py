@@ -0,0 +1,72 @@
+from app.lru_cache import LRUCache
+
+
+def test_get_missing_counts_miss():
+    cache = LRUCache()
+    assert cache.get("a") is None
+    assert cache.stats()["misses"] == 1
+
+
+def test_put_and_get_counts_hit():
+    cache = LRUCache()
+    cache.put("a", b"abc")
+    assert cache.get("a") == b"abc"
+    assert cache.stats() == {"entries": 1, "bytes": 3, "hits": 1, "misses": 0}
+
+
+def test_evicts_least_recently_used_by_count():
+    cache = LRUCache(max_entries=2)
+    cache.put("a", b"1")
+    cache.put("b", b"2")
+    cache.get("a")
+    cache.put("c", b"3")
+
+    assert "a" in cache
+    assert "b" not in cache
+    assert "c" in cache
+
+
+def test_evicts_by_byte_budget():
+    cache = LRUCache(max_entries=10, max_bytes=10)
+    cache.put("a", b"12345")
+    cache.put("b", b"12345")
+    cache.put("c", b"12345")
+
+    assert "a" not in cache
+    assert cache.stats()["bytes"] == 10
+
+
+def test_rejects_value_larger_than_budget():
+    cache = LRUCache(max_bytes=4)
+    cache.put("a", b"12345")
+    assert len(cache) == 0
+
+
+def test_replacing_entry_updates_bytes():
+    cache = LRUCache()
+    cache.put("a", b"12345")
+    cache.put("a", b"12")
+    assert cache.stats()["bytes"] == 2
+
+
+def test_configure_shrinks_cache():
+    cache = LRUCache(max_entries=3)
+    for key in "abc":
+        cache.put(key, b"x")
+    cache.configure(max_entries=1)
+    assert len(cache) == 1
+    assert "c" in cache
+
+
+def test_zero_entries_disables_cache():
+    cache = LRUCache(max_entries=0)
+    cache.put("a", b"x")
+    assert cache.get("a") is None
+
+
+def test_clear_resets_stats():
+    cache = LRUCache()
+    cache.put("a", b"x")
+    cache.get("a")
+    cache.clear()
+    assert cache.stats() == {"entries": 0, "bytes": 0, "hits": 0, "misses": 0}
@@ -0,0 +1,207 @@
+import multiprocessing
+import os
+
+import orjson
+import pytest
+from flask import Flask
+
+from app.data_loader import ExpressionDataManager
+from app.lru_cache import LRUCache
+from app.metrics import (
+    Counter,
+    Histogram,
+    StageTimer,
+    callback_errors,
+    callback_latency,
+    callback_payload,
+    instrumented,
+    loader_stage,
+    register_metrics,
+    registry,
+)
+
+QUANT_CONTENT = (
+    "Name\tLength\tEffectiveLength\tTPM\tNumReads\n"
+    "AT1G01010.1\t1749\t1430.305\t{tpm}\t24\n"
+    "AT1G01020.1\t1749\t1430.305\t3.5\t24\n"
+)
+
+
+@pytest.fixture(autouse=True)
+def reset_metrics():
+    ExpressionDataManager._instance = None
+    registry.clear()
+    yield
+    registry.clear()
+    registry.configure()
+
+
+def test_histogram_renders_cumulative_buckets():
+    histogram = Histogram("latency_seconds", "Latency", ("callback",),
+                          buckets=(0.1, 1.0))
+    histogram.observe(0.05, callback="plot")
+    histogram.observe(0.5, callback="plot")
+    histogram.observe(5.0, callback="plot")
+
+    lines = histogram.collect()
+
+    assert "# TYPE latency_seconds histogram" in lines
+    assert 'latency_seconds_bucket{callback="plot",le="0.1"} 1' in lines
+    assert 'latency_seconds_bucket{callback="plot",le="1.0"} 2' in lines
+    assert 'latency_seconds_bucket{callback="plot",le="+Inf"} 3' in lines
+    assert 'latency_seconds_sum{callback="plot"} 5.55' in lines
+    assert 'latency_seconds_count{callback="plot"} 3' in lines
+
+
+def test_histogram_bucket_bounds_are_inclusive():
+    histogram = Histogram("size_bytes", "Size", buckets=(10, 100))
+    histogram.observe(10)
+
+    assert 'size_bytes_bucket{le="10.0"} 1' in histogram.collect()
+
+
+def test_counter_tracks_labels_separately():
+    counter = Counter("errors_total", "Errors", ("callback",))
+    counter.inc(callback="a")
+    counter.inc(2, callback="b")
+
+    assert counter.value(callback="a") == 1
+    assert 'errors_total{callback="b"} 2.0' in counter.collect()
+
+
+def test_instrumented_records_latency_and_errors():
+    @instrumented("ok")
+    def ok():
+        return 1
+
+    @instrumented("failing")
+    def failing():
+        raise ValueError("boom")
+
+    assert ok() == 1
+    with pytest.raises(ValueError):
+        failing()
+
+    assert callback_latency.count(callback="ok") == 1
+    assert callback_latency.count(callback="failing") == 1
+    assert callback_errors.value(callback="ok") == 0
+    assert callback_errors.value(callback="failing") == 1
+
+
+def test_stage_timer_accumulates_per_stage():
+    timer = StageTimer()
+    for _ in range(3):
+        with timer.stage("read"):
+            pass
+    timer.observe()
+
+    assert list(timer.durations) == ["read"]
+    assert loader_stage.count(stage="read") == 1
+
+
+def test_metrics_route_exports_caches_and_callbacks():
+    cache = LRUCache()
+    cache.put("a", b"abc")
+    cache.get("a")
+    cache.get("b")
+    callback_latency.observe(0.02, callback="update_expression_plot")
+
+    server = Flask(__name__)
+    register_metrics(server, {"figure": cache})
+    response = server.test_client().get("/metrics")
+
+    assert response.status_code == 200
+    assert response.mimetype == "text/plain"
+    body = response.get_data(as_text=True)
+    assert 'htv_cache_hits_total{cache="figure"} 1.0' in body
+    assert 'htv_cache_misses_total{cache="figure"} 1.0' in body
+    assert 'htv_cache_bytes{cache="figure"} 3.0' in body
+    assert ('htv_callback_duration_seconds_count{callback="update_expression_plot"} 1'
+            in body)
+
+
+def test_plot_callback_records_payload_size(tmp_path):
+    from app.figures import figure_cache
+    from app.layout import update_expression_plot
+
+    for sample in ("Col0_1", "Col0_2"):
+        (tmp_path / sample).mkdir()
+        (tmp_path / sample / "quant.sf").write_text(QUANT_CONTENT.format(tpm=1.0))
+    ExpressionDataManager(quant_path=str(tmp_path))
+    figure_cache.clear()
+
+    update_expression_plot("AT1G01010")
+    update_expression_plot("AT1G01010")
+
+    assert callback_latency.count(callback="update_expression_plot") == 2
+    assert callback_payload.count(callback="update_expression_plot") == 2
+    figure_cache.clear()
+
+
+def test_streaming_load_records_loader_stages(tmp_path):
+    for sample in ("Col0_1", "Col0_2"):
+        (tmp_path / sample).mkdir()
+        (tmp_path / sample / "quant.sf").write_text(QUANT_CONTENT.format(tpm=1.0))
+
+    ExpressionDataManager(quant_path=str(tmp_path)).load_expression_matrix()
+
+    for stage in ("fingerprint", "read", "aggregate", "finalize"):
+        assert loader_stage.count(stage=stage) == 1
+
+
+def _write_worker_metrics():
+    callback_errors.inc(2, callback="update_expression_plot")
+    callback_latency.observe(0.02, callback="update_expression_plot")
+    registry.write()
+
+
+def test_multiprocess_metrics_are_merged_across_workers(tmp_path):
+    cache = LRUCache()
+    cache.put("a", b"abc")
+    server = Flask(__name__)
+    register_metrics(server, {"figure": cache}, directory=tmp_path)
+    worker = multiprocessing.get_context("fork").Process(target=_write_worker_metrics)
+    worker.start()
+    worker.join()
+    (tmp_path / f"{os.getppid()}.json").write_bytes(orjson.dumps({
+        "metrics": {"htv_callback_errors_total": [[["update_expression_plot"], 1]]},
+        "collectors": ["# HELP htv_cache_bytes Bytes held by the cache",
+                       "# TYPE htv_cache_bytes gauge",
+                       'htv_cache_bytes{cache="figure"} 7.0'],
+    }))
+    callback_latency.observe(0.5, callback="update_expression_plot")
+
+    body = server.test_client().get("/metrics").get_data(as_text=True)
+
+    assert 'htv_callback_errors_total{callback="update_expression_plot"} 3.0' in body
+    assert ('htv_callback_duration_seconds_count{callback="update_expression_plot"} 2'
+            in body)
+    assert f'htv_cache_bytes{{pid="{os.getpid()}",cache="figure"}} 3.0' in body
+    assert f'htv_cache_bytes{{pid="{os.getppid()}",cache="figure"}} 7.0' in body
+    assert f'pid="{worker.pid}"' not in body
+    assert body.count("# TYPE htv_cache_bytes gauge") == 1
+
+    registry.configure(tmp_path)
+    assert not (tmp_path / f"{worker.pid}.json").exists()
+    assert (tmp_path / f"{os.getpid()}.json").exists()
+
+
+def _serve_after_fork():
+    registry.start_writer()
+    loader_stage.observe(0.2, stage="read")
+    registry.write()
+
+
+def test_metrics_recorded_before_fork_are_counted_once(tmp_path):
+    registry.configure(tmp_path)
+    loader_stage.observe(1.0, stage="read")
+    context = multiprocessing.get_context("fork")
+    for _ in range(2):
+        worker = context.Process(target=_serve_after_fork)
+        worker.start()
+        worker.join()
+
+    body = registry.render()
+
+    assert 'htv_loader_stage_duration_seconds_count{stage="read"} 3' in body
+    assert 'htv_loader_stage_duration_seconds_sum{stage="read"} 1.4' in body
@@ -0,0 +1,170 @@
+import threading
+import time
+
+import pytest
+from flask import Flask, request
+
+from app.data_loader import ExpressionDataManager
+from app.figures import figure_cache
+from app.layout import update_expression_plot
+from app.profiling import (
+    PROFILE_COOKIE,
+    PROFILE_HEADER,
+    RequestProfiler,
+    ThreadSampler,
+    register_profiler,
+)
+from run import _parse_args
+
+PLOT_REQUEST = {
+    "output": "expression-plot.figure",
+    "outputs": {"id": "expression-plot", "property": "figure"},
+    "inputs": [{"id": "gene-selector", "property": "value", "value": "AT1G01010"}],
+    "changedPropIds": ["gene-selector.value"],
+    "state": [],
+}
+TOKEN = "secret"
+
+
+@pytest.fixture(autouse=True)
+def reset_singleton():
+    ExpressionDataManager._instance = None
+    figure_cache.clear()
+    yield
+    figure_cache.clear()
+
+
+@pytest.fixture
+def client(tmp_path):
+    ExpressionDataManager("example_data/example_annotation.csv",
+                          "example_data/example_quant/")
+    server = Flask(__name__)
+
+    @server.route("/", methods=["GET"])
+    def index():
+        return "index"
+
+    @server.route("/_dash-update-component", methods=["POST"])
+    def dispatch():
+        update_expression_plot(request.get_json()["inputs"][0]["value"])
+        return "{}"
+
+    register_profiler(server, tmp_path, token=TOKEN)
+    return server.test_client()
+
+
+def test_requests_are_not_profiled_by_default(client, tmp_path):
+    response = client.post("/_dash-update-component", json=PLOT_REQUEST)
+
+    assert response.status_code == 200
+    assert not list(tmp_path.glob("*.prof"))
+
+
+def test_header_profiles_callback(client, tmp_path):
+    response = client.post("/_dash-update-component", json=PLOT_REQUEST,
+                           headers={PROFILE_HEADER: TOKEN})
+
+    assert response.status_code == 200
+    profiles = list(tmp_path.glob("*.prof"))
+    assert len(profiles) == 1
+    assert "expression-plot-figure-AT1G01010" in profiles[0].name
+
+    summary = client.get(f"/profile?profile={TOKEN}").get_data(as_text=True)
+    assert "expression-plot.figure AT1G01010" in summary
+
+    report = client.get(f"/profile/{profiles[0].stem}")
+    assert "update_expression_plot" in report.get_data(as_text=True)
+    raw = client.get(f"/profile/{profiles[0].stem}?format=pstats")
+    assert raw.data == profiles[0].read_bytes()
+
+
+def test_query_parameter_sets_cookie_for_callbacks(client, tmp_path):
+    response = client.get(f"/?profile={TOKEN}")
+
+    assert PROFILE_COOKIE in response.headers["Set-Cookie"]
+    client.post("/_dash-update-component", json=PLOT_REQUEST)
+    assert len(list(tmp_path.glob("*.prof"))) == 2
+
+    client.get("/?profile=0")
+    client.post("/_dash-update-component", json=PLOT_REQUEST)
+    assert len(list(tmp_path.glob("*.prof"))) == 2
+
+
+def test_profiling_requires_the_token(client, tmp_path):
+    client.post("/_dash-update-component", json=PLOT_REQUEST,
+                headers={PROFILE_HEADER: "1"})
+    response = client.get("/?profile=1")
+
+    assert response.status_code == 200
+    assert client.get_cookie(PROFILE_COOKIE) is None
+    assert not list(tmp_path.glob("*.prof"))
+    assert client.get("/profile").status_code == 403
+    assert client.get("/profile/missing").status_code == 403
+
+
+def test_profiles_are_pruned(tmp_path):
+    server = Flask(__name__)
+    server.add_url_rule("/ping", "ping", lambda: "pong")
+    register_profiler(server, tmp_path, keep=2, token=TOKEN)
+    client = server.test_client()
+
+    for _ in range(4):
+        client.get("/ping", headers={PROFILE_HEADER: TOKEN})
+
+    assert len(list(tmp_path.glob("*.prof"))) == 2
+    assert len(list(tmp_path.glob("*.json"))) == 2
+
+
+def test_unknown_profile_returns_404(client):
+    response = client.get("/profile/missing", headers={PROFILE_HEADER: TOKEN})
+
+    assert response.status_code == 404
+
+
+def _busy_request(seconds):
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        pass
+
+
+def _other_thread(seconds):
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        pass
+
+
+def test_sampler_only_records_the_request_thread(tmp_path):
+    profiler = RequestProfiler(tmp_path, token=TOKEN, sampling=True)
+    other = threading.Thread(target=_other_thread, args=(0.3,))
+    other.start()
+
+    session = profiler.start()
+    assert isinstance(session[0], ThreadSampler)
+    _busy_request(0.2)
+    record = profiler.finish(session, "busy", "/busy")
+    other.join()
+
+    report = profiler.report(record["name"])
+    assert "_busy_request" in report
+    assert "_other_thread" not in report
+
+
+def test_profile_argument():
+    assert _parse_args(["--profile", "profiles"]).profile == "profiles"
+
+
+def test_routes_and_links_follow_the_prefix(tmp_path):
+    server = Flask(__name__)
+    server.add_url_rule("/app/ping", "ping", lambda: "pong")
+    register_profiler(server, tmp_path, token=TOKEN, prefix="/app/",
+                      url_prefix="/proxy/app/")
+    client = server.test_client()
+
+    client.get("/app/ping", headers={PROFILE_HEADER: TOKEN})
+    name = next(tmp_path.glob("*.prof")).stem
+    summary = client.get("/app/profile", headers={PROFILE_HEADER: TOKEN})
+
+    assert f"href='/proxy/app/profile/{name}'" in summary.get_data(as_text=True)
+    report = client.get(f"/app/profile/{name}", headers={PROFILE_HEADER: TOKEN})
+    assert report.status_code == 200
+    assert client.get("/profile", headers={PROFILE_HEADER: TOKEN}).status_code == 404
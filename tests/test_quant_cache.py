@@ -0,0 +1,130 @@
+import os
+from unittest.mock import patch
+
+import pandas as pd
+import pytest
+
+from app.data_loader import ExpressionDataManager
+from app.quant_cache import (
+    load_cached_expression,
+    quant_fingerprint,
+    store_cached_expression,
+)
+
+QUANT_CONTENT = (
+    "Name\tLength\tEffectiveLength\tTPM\tNumReads\n"
+    "AT1G01010.1\t1749\t1430.305\t{tpm}\t24\n"
+    "AT1G01010.2\t1749\t1430.305\t1.5\t24\n"
+)
+
+
+@pytest.fixture
+def quant_dir(tmp_path):
+    quant_path = tmp_path / "quant"
+    for i, sample in enumerate(["ko_LL18_1", "ko_LL18_2", "wt_LL18_1", "wt_LL18_2"]):
+        folder = quant_path / sample
+        folder.mkdir(parents=True)
+        (folder / "quant.sf").write_text(QUANT_CONTENT.format(tpm=i + 1))
+    return quant_path
+
+
+@pytest.fixture(autouse=True)
+def reset_singleton():
+    ExpressionDataManager._instance = None
+
+
+def test_fingerprint_is_stable(quant_dir):
+    fingerprint = quant_fingerprint(quant_dir, "a.csv")
+    assert quant_fingerprint(quant_dir, "a.csv") == fingerprint
+
+
+def test_fingerprint_changes_with_annotation_path(quant_dir):
+    fingerprint = quant_fingerprint(quant_dir, "a.csv")
+    assert quant_fingerprint(quant_dir, "b.csv") != fingerprint
+
+
+def test_fingerprint_changes_when_sample_modified(quant_dir):
+    before = quant_fingerprint(quant_dir)
+    quant_file = quant_dir / "ko_LL18_1" / "quant.sf"
+    quant_file.write_text(QUANT_CONTENT.format(tpm=42))
+    os.utime(quant_file, ns=(0, 0))
+    assert quant_fingerprint(quant_dir) != before
+
+
+def test_fingerprint_changes_when_sample_added(quant_dir):
+    before = quant_fingerprint(quant_dir)
+    folder = quant_dir / "wt_LL19_1"
+    folder.mkdir()
+    (folder / "quant.sf").write_text(QUANT_CONTENT.format(tpm=7))
+    assert quant_fingerprint(quant_dir) != before
+
+
+def test_store_and_load_round_trip(quant_dir, tmp_path):
+    df = ExpressionDataManager(None, str(quant_dir)).load_quant_data()
+    store_cached_expression(tmp_path / "cache", "abc", df)
+
+    pd.testing.assert_frame_equal(load_cached_expression(tmp_path / "cache", "abc"), df)
+
+
+def test_load_missing_entry_returns_none(tmp_path):
+    assert load_cached_expression(tmp_path, "missing") is None
+
+
+def test_store_removes_stale_entries(quant_dir, tmp_path):
+    df = ExpressionDataManager(None, str(quant_dir)).load_quant_data()
+    store_cached_expression(tmp_path, "data-old", df)
+    store_cached_expression(tmp_path, "data-new", df)
+
+    assert load_cached_expression(tmp_path, "data-old") is None
+    assert len(list(tmp_path.glob("expression_*.h5"))) == 1
+
+
+def test_fingerprint_keeps_variant_in_scope(quant_dir):
+    float64 = quant_fingerprint(quant_dir, "a.csv", "float64")
+    float32 = quant_fingerprint(quant_dir, "a.csv", "float32")
+    assert float64.partition("-")[0] != float32.partition("-")[0]
+
+    (quant_dir / "ko_LL18_1" / "quant.sf").write_text(QUANT_CONTENT.format(tpm=9))
+    changed = quant_fingerprint(quant_dir, "a.csv", "float64")
+    assert changed != float64
+    assert changed.partition("-")[0] == float64.partition("-")[0]
+
+
+def test_variants_sharing_a_cache_dir_keep_their_entries(quant_dir, tmp_path):
+    df = ExpressionDataManager(None, str(quant_dir)).load_quant_data()
+    float64 = quant_fingerprint(quant_dir, None, "float64")
+    float32 = quant_fingerprint(quant_dir, None, "float32")
+    store_cached_expression(tmp_path, float64, df)
+    store_cached_expression(tmp_path, float32, df.astype("float32"))
+    store_cached_expression(tmp_path, float64, df)
+
+    assert load_cached_expression(tmp_path, float32) is not None
+    assert len(list(tmp_path.glob("expression_*.h5"))) == 2
+
+
+def test_warm_start_skips_aggregation(quant_dir, tmp_path):
+    cache_dir = str(tmp_path / "cache")
+    cold = ExpressionDataManager(None, str(quant_dir), cache_dir=cache_dir)
+    expected = cold.load_quant_data()
+    ExpressionDataManager._instance = None
+
+    warm = ExpressionDataManager(None, str(quant_dir), cache_dir=cache_dir)
+    with patch.object(ExpressionDataManager, "_aggregate_quant_data") as aggregate:
+        df = warm.load_quant_data()
+
+    aggregate.assert_not_called()
+    pd.testing.assert_frame_equal(df, expected)
+
+
+def test_modified_sample_invalidates_cache(quant_dir, tmp_path):
+    cache_dir = str(tmp_path / "cache")
+    ExpressionDataManager(None, str(quant_dir), cache_dir=cache_dir).load_quant_data()
+    ExpressionDataManager._instance = None
+
+    quant_file = quant_dir / "ko_LL18_1" / "quant.sf"
+    quant_file.write_text(QUANT_CONTENT.format(tpm=11))
+    os.utime(quant_file, ns=(0, 0))
+
+    manager = ExpressionDataManager(None, str(quant_dir), cache_dir=cache_dir)
+    df = manager.load_quant_data()
+    assert df.loc[("AT1G01010.1", "mean"), "ko_LL18"] == 6.5
@@ -0,0 +1,155 @@
+import os
+import time
+from unittest.mock import Mock, patch
+
+import pandas as pd
+import pytest
+
+from app.data_loader import ExpressionDataManager
+from app.quant_watcher import QuantWatcher
+
+QUANT_HEADER = "Name\tLength\tEffectiveLength\tTPM\tNumReads\n"
+TRANSCRIPTS = ["AT1G01010.1", "AT1G01010.2", "AT1G01020.1"]
+
+
+def write_sample(root, name, tpm, transcripts=TRANSCRIPTS):
+    folder = root / name
+    folder.mkdir(exist_ok=True)
+    quant_file = folder / "quant.sf"
+    quant_file.write_text(QUANT_HEADER + "".join(
+        f"{transcript}\t1749\t1430.305\t{tpm + i * 0.5}\t24\n"
+        for i, transcript in enumerate(transcripts)))
+    os.utime(quant_file, ns=(time.time_ns(), time.time_ns()))
+
+
+@pytest.fixture
+def quant_dir(tmp_path):
+    quant_path = tmp_path / "quant"
+    quant_path.mkdir()
+    for i, sample in enumerate(["ko_LL18_1", "ko_LL18_2", "wt_LL18_1", "wt_LL18_2"]):
+        write_sample(quant_path, sample, i + 1)
+    return quant_path
+
+
+@pytest.fixture(autouse=True)
+def reset_singleton():
+    ExpressionDataManager._instance = None
+
+
+def full_rebuild(quant_dir):
+    ExpressionDataManager._instance = None
+    df = ExpressionDataManager(None, str(quant_dir)).load_quant_data()
+    ExpressionDataManager._instance = None
+    return df
+
+
+def test_added_sample_updates_only_its_group(quant_dir):
+    manager = ExpressionDataManager(None, str(quant_dir), watch=True)
+    before = manager.load_quant_data().copy()
+
+    write_sample(quant_dir, "wt_LL18_3", 9)
+    with patch.object(ExpressionDataManager, "_read_quant_files",
+                      wraps=manager._read_quant_files) as read:
+        changes = manager.reload_changed_samples()
+
+    assert changes == {"added": ["wt_LL18_3"], "removed": [], "modified": []}
+    assert [path.name for path in read.call_args.args[0]] == ["wt_LL18_3"]
+    after = manager.load_quant_data()
+    pd.testing.assert_series_equal(after["ko_LL18"], before["ko_LL18"])
+    pd.testing.assert_frame_equal(after, full_rebuild(quant_dir), check_exact=True)
+
+
+def test_modified_and_removed_samples_match_full_rebuild(quant_dir):
+    manager = ExpressionDataManager(None, str(quant_dir), watch=True)
+    manager.load_quant_data()
+
+    write_sample(quant_dir, "ko_LL18_1", 42)
+    (quant_dir / "wt_LL18_2" / "quant.sf").unlink()
+    (quant_dir / "wt_LL18_2").rmdir()
+    changes = manager.reload_changed_samples()
+
+    assert changes == {"added": [], "removed": ["wt_LL18_2"],
+                       "modified": ["ko_LL18_1"]}
+    pd.testing.assert_frame_equal(manager.load_quant_data(), full_rebuild(quant_dir),
+                                  check_exact=True)
+
+
+def test_new_group_adds_column(quant_dir):
+    manager = ExpressionDataManager(None, str(quant_dir), watch=True)
+    manager.load_quant_data()
+
+    write_sample(quant_dir, "ox_LL18_1", 5)
+    write_sample(quant_dir, "ox_LL18_2", 6)
+    manager.reload_changed_samples()
+
+    assert list(manager.get_sample_groups()) == ["ko_LL18", "ox_LL18", "wt_LL18"]
+    pd.testing.assert_frame_equal(manager.load_quant_data(), full_rebuild(quant_dir),
+                                  check_exact=True)
+
+
+def test_new_transcripts_trigger_full_rebuild(quant_dir):
+    manager = ExpressionDataManager(None, str(quant_dir), watch=True)
+    manager.load_quant_data()
+
+    write_sample(quant_dir, "wt_LL18_3", 9, TRANSCRIPTS + ["AT1G01030.1"])
+    manager.reload_changed_samples()
+
+    assert manager.get_isoforms_for_gene("AT1G01030") == ["AT1G01030.1", "AT1G01030"]
+    pd.testing.assert_frame_equal(manager.load_quant_data(), full_rebuild(quant_dir),
+                                  check_exact=True)
+
+
+def test_reload_swaps_matrix_and_fingerprint(quant_dir):
+    manager = ExpressionDataManager(None, str(quant_dir), watch=True)
+    old_frame = manager.load_quant_data()
+    old_values = old_frame.copy()
+    old_fingerprint = manager.fingerprint
+
+    assert manager.reload_changed_samples() == {}
+    assert manager.load_quant_data() is old_frame
+
+    write_sample(quant_dir, "ko_LL18_1", 42)
+    manager.reload_changed_samples()
+
+    assert manager.fingerprint != old_fingerprint
+    assert manager.load_quant_data() is not old_frame
+    pd.testing.assert_frame_equal(old_frame, old_values)
+
+
+def test_reload_without_retained_replicates_rebuilds(quant_dir):
+    manager = ExpressionDataManager(None, str(quant_dir))
+    manager.load_quant_data()
+
+    write_sample(quant_dir, "wt_LL18_3", 9)
+    manager.reload_changed_samples()
+
+    pd.testing.assert_frame_equal(manager.load_quant_data(), full_rebuild(quant_dir),
+                                  check_exact=True)
+
+
+def test_watcher_reloads_after_file_events(quant_dir):
+    manager = ExpressionDataManager(None, str(quant_dir), watch=True)
+    manager.load_quant_data()
+    fingerprint = manager.fingerprint
+    watcher = QuantWatcher(manager, debounce=0.1)
+    watcher.start()
+    try:
+        write_sample(quant_dir, "wt_LL18_3", 9)
+        deadline = time.monotonic() + 10
+        while manager.fingerprint == fingerprint:
+            assert time.monotonic() < deadline
+            time.sleep(0.05)
+    finally:
+        watcher.stop()
+
+    assert "wt_LL18_3" not in manager.get_sample_groups()
+    assert manager.load_quant_data()["wt_LL18"].notna().all()
+
+
+def test_watcher_logs_failed_reload():
+    manager = Mock()
+    manager.reload_changed_samples.side_effect = ValueError("broken sample")
+
+    with patch("app.quant_watcher.logging.exception") as log:
+        assert QuantWatcher(manager).reload() == {}
+    log.assert_called_once()
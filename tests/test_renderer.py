@@ -0,0 +1,165 @@
+import asyncio
+import sys
+import threading
+import types
+from unittest.mock import patch
+
+import plotly.graph_objects as go
+import pytest
+
+from app.renderer import RendererPool, RendererQueueFull
+
+
+class FakeKaleido:
+    instances = []
+
+    def __init__(self, n=1, timeout=None):
+        self.n = n
+        self.calls = []
+        self.opened = False
+        self.closed = False
+        self.release = None
+        FakeKaleido.instances.append(self)
+
+    async def open(self):
+        self.opened = True
+
+    async def close(self):
+        self.closed = True
+
+    async def calc_fig(self, fig, opts=None):
+        self.calls.append((fig, opts))
+        if self.release is not None:
+            while not self.release.is_set():
+                await asyncio.sleep(0.001)
+        return f"{opts['format']}:{opts['width']}x{opts['height']}".encode()
+
+
+@pytest.fixture
+def fake_kaleido():
+    FakeKaleido.instances = []
+    module = types.SimpleNamespace(Kaleido=FakeKaleido)
+    with patch.dict(sys.modules, {"kaleido": module}):
+        yield module
+
+
+@pytest.fixture
+def figure():
+    return go.Figure(go.Scatter(x=[1, 2], y=[3, 4]))
+
+
+def test_render_without_pool_falls_back_to_plotly(figure):
+    pool = RendererPool()
+    with patch("plotly.io.to_image", return_value=b"image") as to_image:
+        assert pool.render(figure, format="png", width=10, height=20, scale=2) \
+            == b"image"
+
+    to_image.assert_called_once_with(figure, format="png", width=10, height=20,
+                                     scale=2)
+    assert pool.stats()["rendered"] == 1
+
+
+def test_start_warms_every_tab(fake_kaleido):
+    pool = RendererPool(size=3)
+    pool.start()
+    try:
+        renderer = FakeKaleido.instances[0]
+        assert renderer.opened
+        assert renderer.n == 3
+        assert len(renderer.calls) == 3
+    finally:
+        pool.stop()
+    assert renderer.closed
+    assert not pool.running
+
+
+def test_render_uses_running_pool(fake_kaleido, figure):
+    pool = RendererPool(size=1)
+    pool.start(warm=False)
+    try:
+        image = pool.render(figure, format="svg", width=1000, height=400)
+    finally:
+        pool.stop()
+
+    assert image == b"svg:1000x400"
+    fig_dict, opts = FakeKaleido.instances[0].calls[0]
+    assert fig_dict["data"][0]["type"] == "scatter"
+    assert opts == {"format": "svg", "width": 1000, "height": 400, "scale": 1}
+
+
+def test_stats_report_latency_and_counts(fake_kaleido, figure):
+    pool = RendererPool(size=2, max_queue=1)
+    pool.start(warm=False)
+    try:
+        pool.render(figure, format="pdf", width=10, height=10)
+        pool.render(figure, format="pdf", width=10, height=10)
+        stats = pool.stats()
+    finally:
+        pool.stop()
+
+    assert stats["running"]
+    assert stats["rendered"] == 2
+    assert stats["in_flight"] == 0
+    assert stats["queued"] == 0
+    assert stats["latency_ms"]["max"] >= stats["latency_ms"]["p50"] >= 0
+
+
+def test_full_queue_rejects_requests(fake_kaleido, figure):
+    pool = RendererPool(size=1, max_queue=1)
+    pool.start(warm=False)
+    renderer = FakeKaleido.instances[0]
+    renderer.release = threading.Event()
+
+    def render():
+        pool.render(figure, format="png", width=10, height=10)
+
+    workers = [threading.Thread(target=render) for _ in range(2)]
+    try:
+        for worker in workers:
+            worker.start()
+        while pool.stats()["queued"] < 1:
+            pass
+        assert pool.stats()["in_flight"] == 1
+        with pytest.raises(RendererQueueFull):
+            render()
+    finally:
+        renderer.release.set()
+        for worker in workers:
+            worker.join()
+        pool.stop()
+
+    assert pool.stats()["rejected"] == 1
+    assert pool.stats()["rendered"] == 2
+
+
+def test_render_can_wait_for_free_slot(figure):
+    pool = RendererPool(size=1, max_queue=0)
+    release = threading.Event()
+
+    def slow_render(*args, **kwargs):
+        release.wait()
+        return b"image"
+
+    with patch("plotly.io.to_image", side_effect=slow_render):
+        worker = threading.Thread(
+            target=pool.render, args=(figure,),
+            kwargs=dict(format="png", width=10, height=10))
+        worker.start()
+        while pool.stats()["in_flight"] < 1:
+            pass
+        with pytest.raises(RendererQueueFull):
+            pool.render(figure, format="png", width=10, height=10, wait=0.01)
+        threading.Timer(0.05, release.set).start()
+        assert pool.render(figure, format="png", width=10, height=10,
+                           wait=5) == b"image"
+        worker.join()
+
+
+def test_configure_running_pool_raises(fake_kaleido):
+    pool = RendererPool()
+    pool.start(warm=False)
+    try:
+        with pytest.raises(RuntimeError):
+            pool.configure(size=4)
+    finally:
+        pool.stop()
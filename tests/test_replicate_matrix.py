@@ -0,0 +1,161 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.aggregation import StreamingAggregator
+from app.data_loader import ExpressionDataManager
+from app.figures import build_expression_figure, figure_cache
+from app.layout import update_expression_plot
+from app.replicate_matrix import ReplicateMatrix
+
+SAMPLES = {
+    "ko_LL18_1": {"AT1G01010.1": 1.0, "AT1G01010.2": 2.0, "AT1G01020.1": 5.0},
+    "ko_LL18_2": {"AT1G01010.1": 3.0, "AT1G01010.2": 4.0, "AT1G01020.1": 6.0},
+    "wt_LL18_1": {"AT1G01010.1": 10.0, "AT1G01020.1": 7.0},
+}
+
+
+@pytest.fixture(autouse=True)
+def reset_singleton():
+    ExpressionDataManager._instance = None
+    figure_cache.clear()
+    yield
+    figure_cache.clear()
+
+
+@pytest.fixture
+def quant_dir(tmp_path):
+    for sample, rows in SAMPLES.items():
+        (tmp_path / sample).mkdir()
+        lines = ["Name\tTPM"] + [f"{name}\t{tpm}" for name, tpm in rows.items()]
+        (tmp_path / sample / "quant.sf").write_text("\n".join(lines))
+    return tmp_path
+
+
+def expected_values():
+    frame = pd.DataFrame(SAMPLES)
+    genes = frame.index.str.split(".", n=1).str[0]
+    return pd.concat([frame, frame.groupby(genes).sum(min_count=0)])
+
+
+def test_aggregator_keeps_replicates_in_row_order():
+    aggregator = StreamingAggregator(np.float32, keep_replicates=True)
+    for sample, rows in SAMPLES.items():
+        aggregator.add_sample(sample, pd.Series(rows, name=sample))
+    matrix = aggregator.result()
+    replicates = aggregator.replicates()
+
+    assert replicates.rows.equals(matrix.rows)
+    assert list(replicates.samples) == list(SAMPLES)
+    assert replicates.values.dtype == np.float32
+    expected = expected_values().reindex(matrix.rows)
+    np.testing.assert_allclose(replicates.values, expected.to_numpy(), equal_nan=True)
+
+
+def test_from_replicates_matches_streaming():
+    frame = pd.DataFrame(SAMPLES)
+    rows = pd.Index(["AT1G01010.1", "AT1G01010.2", "AT1G01020.1",
+                     "AT1G01010", "AT1G01020"])
+    replicates = ReplicateMatrix.from_replicates(frame, rows)
+
+    np.testing.assert_allclose(replicates.block(["AT1G01010", "AT1G01010.2"]),
+                               [[3.0, 7.0, 10.0], [2.0, 4.0, np.nan]])
+    assert replicates.isoform_tpm("ko_LL18_2").to_dict() == {
+        "AT1G01010.1": 3.0, "AT1G01010.2": 4.0, "AT1G01020.1": 6.0}
+    with pytest.raises(KeyError):
+        replicates.block(["AT9G99999"])
+
+
+def test_spread_places_replicates_within_their_group():
+    replicates = ReplicateMatrix.from_replicates(
+        pd.DataFrame(SAMPLES), pd.Index(["AT1G01010.1"]))
+
+    assert list(replicates.groups) == ["ko_LL18", "ko_LL18", "wt_LL18"]
+    np.testing.assert_allclose(replicates.spread, [-0.25, 0.25, 0.0])
+
+
+def test_replicate_matrix_validates_shape():
+    with pytest.raises(ValueError):
+        ReplicateMatrix(pd.Index(["a"]), pd.Index(["s1", "s2"]), np.zeros((1, 3)))
+
+
+@pytest.mark.parametrize("watch", [False, True])
+def test_data_manager_keeps_replicates_when_enabled(quant_dir, watch):
+    manager = ExpressionDataManager(quant_path=str(quant_dir), watch=watch,
+                                    replicates=True)
+    manager.load_expression_matrix()
+
+    replicates = manager.replicate_matrix
+    assert list(replicates.samples) == list(SAMPLES)
+    np.testing.assert_allclose(replicates.block(["AT1G01010.1"]), [[1.0, 3.0, 10.0]])
+
+
+def test_replicates_are_cached_with_expression(quant_dir, tmp_path_factory,
+                                               monkeypatch):
+    cache_dir = tmp_path_factory.mktemp("cache")
+    ExpressionDataManager(quant_path=str(quant_dir), cache_dir=str(cache_dir),
+                          replicates=True).load_expression_matrix()
+    ExpressionDataManager._instance = None
+    manager = ExpressionDataManager(quant_path=str(quant_dir),
+                                    cache_dir=str(cache_dir), replicates=True)
+    monkeypatch.setattr(manager, "_aggregate_quant_data", pytest.fail)
+
+    manager.load_expression_matrix()
+
+    np.testing.assert_allclose(manager.replicate_matrix.block(["AT1G01020"]),
+                               [[5.0, 6.0, 7.0]])
+
+
+def test_replicates_follow_watched_changes(quant_dir):
+    manager = ExpressionDataManager(quant_path=str(quant_dir), watch=True,
+                                    replicates=True)
+    manager.load_expression_matrix()
+    new = quant_dir / "wt_LL18_2"
+    new.mkdir()
+    (new / "quant.sf").write_text("Name\tTPM\nAT1G01010.1\t12.0\nAT1G01020.1\t8.0")
+
+    manager.reload_changed_samples()
+
+    replicates = manager.replicate_matrix
+    assert list(replicates.samples) == list(SAMPLES) + ["wt_LL18_2"]
+    np.testing.assert_allclose(replicates.block(["AT1G01010"]),
+                               [[3.0, 7.0, 10.0, 12.0]])
+
+
+def test_replicates_are_not_kept_by_default(quant_dir):
+    manager = ExpressionDataManager(quant_path=str(quant_dir))
+    manager.load_expression_matrix()
+
+    assert manager.replicate_matrix is None
+    fig = build_expression_figure(manager, "AT1G01010", show_replicates=True)
+    assert all(trace.mode == "lines+markers" for trace in fig.data)
+
+
+def test_expression_figure_overlays_replicates(quant_dir):
+    manager = ExpressionDataManager(quant_path=str(quant_dir), replicates=True)
+    manager.load_expression_matrix()
+
+    fig = build_expression_figure(manager, "AT1G01010", show_replicates=True)
+
+    points = [trace for trace in fig.data if trace.mode == "markers"]
+    assert [trace.name for trace in points] == [
+        f"{label} replicates" for label in ("AT1G01010.1", "AT1G01010.2", "AT1G01010")
+        for _ in ("ko", "wt")]
+    assert list(points[0].text) == ["ko_LL18_1", "ko_LL18_2"]
+    assert list(points[1].text) == ["wt_LL18_1"]
+    assert list(points[0].y) == [1.0, 3.0]
+    assert list(points[5].y) == [10.0]
+    assert points[0].x[0] != points[0].x[1]
+    assert abs(points[0].x[0] - points[0].x[1]) < 0.5
+    assert points[0].marker.color == fig.data[0].line.color
+
+
+def test_expression_plot_caches_replicate_overlay_separately(quant_dir):
+    ExpressionDataManager(quant_path=str(quant_dir),
+                          replicates=True).load_expression_matrix()
+
+    plain = update_expression_plot("AT1G01010")
+    overlay = update_expression_plot("AT1G01010", True)
+
+    assert len(overlay.data) == len(plain.data) + 6
+    assert figure_cache.stats()["entries"] == 2
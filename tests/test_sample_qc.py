@@ -0,0 +1,186 @@
+import numpy as np
+import pandas as pd
+import pytest
+from dash import no_update
+
+from app.data_loader import ExpressionDataManager
+from app.figures import COLORS, figure_cache
+from app.layout import update_sample_qc
+from app.sample_qc import SampleQC, randomized_eigh
+
+GENES = [f"AT1G{i:05d}" for i in range(40)]
+ISOFORMS = [f"{gene}.{j}" for gene in GENES for j in (1, 2)]
+
+
+@pytest.fixture(autouse=True)
+def reset_singleton():
+    ExpressionDataManager._instance = None
+    figure_cache.clear()
+    yield
+    figure_cache.clear()
+
+
+@pytest.fixture
+def replicates():
+    rng = np.random.default_rng(1)
+    return rng.gamma(0.5, 20.0, size=(8, len(ISOFORMS)))
+
+
+def gene_matrix(replicates):
+    return np.log1p(replicates.reshape(len(replicates), len(GENES), 2).sum(axis=2))
+
+
+def build_qc(replicates, names=None) -> SampleQC:
+    sample_qc = SampleQC(components=3)
+    for i, values in enumerate(replicates):
+        name = names[i] if names else f"s{i}"
+        sample_qc.add_sample(name, pd.Series(values, index=ISOFORMS))
+    return sample_qc
+
+
+def test_correlation_matches_numpy(replicates):
+    sample_qc = build_qc(replicates)
+
+    np.testing.assert_allclose(sample_qc.correlation(),
+                               np.corrcoef(gene_matrix(replicates)), atol=1e-5)
+
+
+def test_pca_matches_svd(replicates):
+    scores, explained = build_qc(replicates).pca()
+
+    centered = gene_matrix(replicates)
+    centered = centered - centered.mean(axis=0)
+    u, s, _ = np.linalg.svd(centered, full_matrices=False)
+    np.testing.assert_allclose(np.abs(scores), np.abs(u[:, :3] * s[:3]), atol=1e-3)
+    np.testing.assert_allclose(explained, (s ** 2 / (s ** 2).sum())[:3], atol=1e-5)
+
+
+def test_incremental_updates_match_full_rebuild(replicates):
+    sample_qc = build_qc(replicates[:5])
+    sample_qc.correlation()
+    sample_qc.remove_samples(["s1"])
+    for i in (5, 6, 7):
+        sample_qc.add_sample(f"s{i}", pd.Series(replicates[i], index=ISOFORMS))
+    sample_qc.add_sample("s2", pd.Series(replicates[2] * 2, index=ISOFORMS))
+
+    expected = gene_matrix(replicates)[[0, 2, 3, 4, 5, 6, 7]]
+    expected[1] = gene_matrix(replicates[[2]] * 2)[0]
+    assert sample_qc.samples == ["s0", "s2", "s3", "s4", "s5", "s6", "s7"]
+    np.testing.assert_allclose(sample_qc.correlation(), np.corrcoef(expected),
+                               atol=1e-5)
+
+
+def test_samples_with_new_genes_extend_matrix():
+    sample_qc = SampleQC()
+    sample_qc.add_sample("a", pd.Series([1.0, 2.0], index=["AT1.1", "AT2.1"]))
+    sample_qc.add_sample("b", pd.Series([1.0, 4.0, 8.0],
+                                        index=["AT1.1", "AT2.1", "AT3.1"]))
+
+    assert sample_qc.n_genes == 3
+    expected = np.log1p([[1.0, 2.0, 0.0], [1.0, 4.0, 8.0]])
+    np.testing.assert_allclose(sample_qc.correlation(), np.corrcoef(expected),
+                               atol=1e-6)
+
+
+def test_result_is_cached_until_samples_change(replicates):
+    sample_qc = build_qc(replicates)
+    result = sample_qc.result()
+
+    assert sample_qc.result() is result
+    sample_qc.remove_samples(["s0"])
+    assert sample_qc.result()["samples"] == [f"s{i}" for i in range(1, 8)]
+
+
+def test_randomized_eigh_finds_leading_eigenpairs():
+    rng = np.random.default_rng(2)
+    basis, _ = np.linalg.qr(rng.standard_normal((60, 60)))
+    eigenvalues = np.concatenate([[50.0, 20.0, 10.0], rng.uniform(0, 1, 57)])
+    matrix = basis @ np.diag(eigenvalues) @ basis.T
+
+    values, vectors = randomized_eigh(matrix, 3)
+
+    np.testing.assert_allclose(values, [50.0, 20.0, 10.0], rtol=1e-6)
+    np.testing.assert_allclose(np.abs(vectors.T @ basis[:, :3]), np.eye(3), atol=1e-4)
+
+
+def test_data_manager_updates_qc_incrementally(tmp_path, replicates):
+    names = [f"{genotype}_LL18_{i}" for genotype in ("ko", "wt") for i in (1, 2, 3)]
+    for name, values in zip(names, replicates):
+        (tmp_path / name).mkdir()
+        pd.DataFrame({"Name": ISOFORMS, "TPM": values}).to_csv(
+            tmp_path / name / "quant.sf", sep="\t", index=False)
+    manager = ExpressionDataManager(quant_path=str(tmp_path), watch=True)
+    manager.load_expression_matrix()
+    sample_qc = manager.get_sample_qc()
+    assert sorted(sample_qc.samples) == names
+
+    new = tmp_path / "wt_LL18_4"
+    new.mkdir()
+    pd.DataFrame({"Name": ISOFORMS, "TPM": replicates[6]}).to_csv(
+        new / "quant.sf", sep="\t", index=False)
+    manager.reload_changed_samples()
+
+    assert manager.get_sample_qc() is sample_qc
+    assert "wt_LL18_4" in sample_qc.samples
+    order = [sample_qc.samples.index(name) for name in names + ["wt_LL18_4"]]
+    np.testing.assert_allclose(sample_qc.correlation()[np.ix_(order, order)],
+                               np.corrcoef(gene_matrix(replicates[:7])), atol=1e-5)
+
+
+def test_qc_callback_builds_figures_for_qc_tab(tmp_path, replicates):
+    for i, values in enumerate(replicates[:4]):
+        name = f"{'ko' if i < 2 else 'wt'}_LL18_{i}"
+        (tmp_path / name).mkdir()
+        pd.DataFrame({"Name": ISOFORMS, "TPM": values}).to_csv(
+            tmp_path / name / "quant.sf", sep="\t", index=False)
+    ExpressionDataManager(quant_path=str(tmp_path)).load_expression_matrix()
+
+    correlation, pca = update_sample_qc("qc")
+    cached_correlation, cached_pca = update_sample_qc("qc")
+
+    assert correlation.data[0].type == "heatmap"
+    assert [trace.name for trace in pca.data] == ["ko", "wt"]
+    assert [trace.marker.color for trace in pca.data] == COLORS[:2]
+    assert cached_pca["layout"]["xaxis"]["title"]["text"].startswith("PC1")
+    assert figure_cache.stats()["hits"] == 1
+    assert update_sample_qc("heatmap") == (no_update, no_update)
+
+
+def write_samples(path, replicates):
+    names = [f"{genotype}_LL18_{i}" for genotype in ("ko", "wt") for i in (1, 2, 3)]
+    for name, values in zip(names, replicates):
+        (path / name).mkdir()
+        pd.DataFrame({"Name": ISOFORMS, "TPM": values}).to_csv(
+            path / name / "quant.sf", sep="\t", index=False)
+    return names
+
+
+def test_qc_is_built_when_first_requested(tmp_path, replicates):
+    names = write_samples(tmp_path, replicates)
+    manager = ExpressionDataManager(quant_path=str(tmp_path))
+    manager.load_expression_matrix()
+
+    assert manager._sample_qc is None
+    sample_qc = manager.get_sample_qc()
+
+    assert sample_qc.samples == names
+    np.testing.assert_allclose(sample_qc.correlation(),
+                               np.corrcoef(gene_matrix(replicates[:6])), atol=1e-5)
+
+
+def test_qc_is_restored_from_cache(tmp_path_factory, replicates, monkeypatch):
+    quant_dir = tmp_path_factory.mktemp("quant")
+    cache_dir = tmp_path_factory.mktemp("cache")
+    names = write_samples(quant_dir, replicates)
+    ExpressionDataManager(quant_path=str(quant_dir),
+                          cache_dir=str(cache_dir)).get_sample_qc()
+    ExpressionDataManager._instance = None
+    manager = ExpressionDataManager(quant_path=str(quant_dir), cache_dir=str(cache_dir))
+    monkeypatch.setattr(manager, "_iter_quant_files", pytest.fail)
+    manager.load_expression_matrix()
+
+    sample_qc = manager.get_sample_qc()
+
+    assert sample_qc.samples == names
+    np.testing.assert_allclose(sample_qc.correlation(),
+                               np.corrcoef(gene_matrix(replicates[:6])), atol=1e-5)
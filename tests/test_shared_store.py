@@ -0,0 +1,94 @@
+from unittest.mock import patch
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.data_loader import ExpressionDataManager
+from app.expression_matrix import ExpressionMatrix
+from app.shared_store import load_shared_matrix, store_shared_matrix
+
+QUANT_CONTENT = (
+    "Name\tLength\tEffectiveLength\tTPM\tNumReads\n"
+    "AT1G01010.1\t1749\t1430.305\t{tpm}\t24\n"
+    "AT1G01010.2\t1749\t1430.305\t1.5\t24\n"
+)
+
+
+@pytest.fixture
+def quant_dir(tmp_path):
+    quant_path = tmp_path / "quant"
+    for i, sample in enumerate(["ko_LL18_1", "ko_LL18_2", "wt_LL18_1", "wt_LL18_2"]):
+        folder = quant_path / sample
+        folder.mkdir(parents=True)
+        (folder / "quant.sf").write_text(QUANT_CONTENT.format(tpm=i + 1))
+    return quant_path
+
+
+@pytest.fixture
+def matrix():
+    return ExpressionMatrix(pd.Index(["AT1G01010", "AT1G01010.1"]),
+                            pd.Index(["ko_LL18", "wt_LL18"]),
+                            np.arange(8, dtype=np.float64).reshape(2, 2, 2),
+                            np.array([3, 2]))
+
+
+@pytest.fixture(autouse=True)
+def reset_singleton():
+    ExpressionDataManager._instance = None
+
+
+def test_store_and_attach_round_trip(tmp_path, matrix):
+    store_shared_matrix(tmp_path, "abc", matrix)
+    attached = load_shared_matrix(tmp_path, "abc")
+
+    assert isinstance(attached.values, np.memmap)
+    pd.testing.assert_frame_equal(attached.frame, matrix.frame)
+
+
+def test_attach_misses_for_other_fingerprint(tmp_path, matrix):
+    store_shared_matrix(tmp_path, "abc", matrix)
+    assert load_shared_matrix(tmp_path, "def") is None
+
+
+def test_attach_misses_for_matrix_without_counts(tmp_path, matrix):
+    matrix.counts = None
+    store_shared_matrix(tmp_path, "abc", matrix)
+    assert load_shared_matrix(tmp_path, "abc") is None
+
+
+def test_attach_ignores_corrupt_index(tmp_path, matrix):
+    store_shared_matrix(tmp_path, "abc", matrix)
+    next(tmp_path.glob("matrix_*.json")).write_text("{")
+    assert load_shared_matrix(tmp_path, "abc") is None
+
+
+def test_store_removes_stale_matrices(tmp_path, matrix):
+    store_shared_matrix(tmp_path, "data-abc", matrix)
+    store_shared_matrix(tmp_path, "data-def", matrix)
+    store_shared_matrix(tmp_path, "other-abc", matrix)
+
+    assert len(list(tmp_path.glob("matrix_*"))) == 4
+    assert load_shared_matrix(tmp_path, "data-abc") is None
+    assert load_shared_matrix(tmp_path, "other-abc") is not None
+
+
+def test_second_worker_attaches_without_aggregation(quant_dir, tmp_path):
+    store = tmp_path / "store"
+    first = ExpressionDataManager(None, str(quant_dir), shared_store=str(store))
+    expected = first.load_quant_data().copy()
+    ExpressionDataManager._instance = None
+
+    second = ExpressionDataManager(None, str(quant_dir), shared_store=str(store))
+    with patch.object(ExpressionDataManager, "_aggregate_quant_data") as aggregate:
+        df = second.load_quant_data()
+
+    aggregate.assert_not_called()
+    assert isinstance(second.expression_matrix.values, np.memmap)
+    pd.testing.assert_frame_equal(df, expected)
+    assert second.get_isoforms_for_gene("AT1G01010") == [
+        "AT1G01010.1", "AT1G01010.2", "AT1G01010"]
+    samples = first.get_sample_qc().samples
+    with patch.object(ExpressionDataManager, "_iter_quant_files") as read:
+        assert second.get_sample_qc().samples == samples
+    read.assert_not_called()
@@ -0,0 +1,50 @@
+import pytest
+from flask import Flask
+
+from app.data_loader import ExpressionDataManager
+from app.gunicorn_app import GunicornApplication, gunicorn_options
+from run import _parse_args
+from wsgi import create_server
+
+
+@pytest.fixture(autouse=True)
+def reset_singleton():
+    ExpressionDataManager._instance = None
+
+
+def test_create_server_preloads_data():
+    server = create_server(annotation_path="example_data/example_annotation.csv",
+                           expression_path="example_data/example_quant/")
+
+    assert isinstance(server, Flask)
+    assert ExpressionDataManager().expression_matrix is not None
+    assert server.test_client().get("/_dash-layout").status_code == 200
+
+
+def test_create_server_reads_environment(monkeypatch, tmp_path):
+    monkeypatch.setenv("HTV_ANNOTATION", "example_data/example_annotation.csv")
+    monkeypatch.setenv("HTV_EXPRESSION", "example_data/example_quant/")
+    monkeypatch.setenv("HTV_SHARED_STORE", str(tmp_path))
+
+    create_server()
+
+    assert list(tmp_path.glob("matrix_*.npy"))
+
+
+def test_gunicorn_application_preloads_with_threads():
+    app = GunicornApplication(Flask(__name__),
+                              gunicorn_options("0.0.0.0", 9000, workers=3, threads=4,
+                                               post_fork=lambda: None))
+
+    assert app.cfg.bind == ["0.0.0.0:9000"]
+    assert app.cfg.workers == 3
+    assert app.cfg.threads == 4
+    assert app.cfg.preload_app
+    assert app.cfg.worker_class_str == "gthread"
+
+
+def test_serve_arguments():
+    args = _parse_args(["--workers", "4", "--threads", "8"])
+
+    assert args.command == "serve"
+    assert (args.workers, args.threads) == (4, 8)
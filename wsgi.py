@@ -0,0 +1,40 @@
+import os
+
+from app.compression import DEFAULT_LEVEL
+from run import create_app
+
+
+def _env_flag(name: str) -> bool:
+    return os.environ.get(name, "").lower() in ("1", "true", "yes")
+
+
+def create_server(**overrides):
+    config = {
+        "annotation_path": os.environ.get("HTV_ANNOTATION",
+                                          "example_data/example_annotation.csv"),
+        "expression_path": os.environ.get("HTV_EXPRESSION",
+                                          "example_data/example_quant/"),
+        "load_workers": int(os.environ.get("HTV_LOAD_WORKERS", 1)),
+        "cache_dir": os.environ.get("HTV_CACHE_DIR"),
+        "shared_store": os.environ.get("HTV_SHARED_STORE"),
+        "gene_store": os.environ.get("HTV_GENE_STORE"),
+        "profile_dir": os.environ.get("HTV_PROFILE_DIR"),
+        "profile_token": os.environ.get("HTV_PROFILE_TOKEN"),
+        "metrics_dir": os.environ.get("HTV_METRICS_DIR"),
+        "compact": _env_flag("HTV_COMPACT"),
+        "server_search": _env_flag("HTV_SERVER_SEARCH"),
+        "watch": _env_flag("HTV_WATCH"),
+        "replicates": _env_flag("HTV_REPLICATES"),
+        "compression_level": int(os.environ.get("HTV_COMPRESSION_LEVEL",
+                                                DEFAULT_LEVEL)),
+    }
+    config.update(overrides)
+    return create_app(**config).server
+
+
+def __getattr__(name):
+    if name == "server":
+        global server
+        server = create_server()
+        return server
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")